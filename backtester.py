@@ -0,0 +1,446 @@
+import heapq
+import logging
+import time
+
+from concurrent.futures import Future
+from itertools import count
+
+from depth_book import LocalOrderBook
+from interface_book import OrderBook, VenueOrderBook
+from interface_order import OrderEvent, OrderStatus, ExecutionType, Side, NewOrderSingle, OrderType
+from market_data_capture import (
+    CaptureReader,
+    CHANNEL_DEPTH,
+    CHANNEL_SNAPSHOT,
+    CHANNEL_TRADE,
+    CHANNEL_MARK_PRICE,
+)
+from message_decoder import MessageDecoder
+from position_tracker import Position, PositionTracker
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+
+# A strategy order resting in the simulated book.
+# queue_ahead is the recorded size queued in front of it at its price and level_size the last
+# recorded size of that level, the book data never contains our own orders.
+class _BacktestOrder:
+    __slots__ = (
+        "client_order_id",
+        "side",
+        "price",
+        "quantity",
+        "filled",
+        "queue_ahead",
+        "level_size",
+    )
+
+    def __init__(self, client_order_id: str, side: Side, price: float, quantity: float):
+        self.client_order_id = client_order_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled = 0.0
+        self.queue_ahead = 0.0
+        self.level_size = 0.0
+
+    def leaves_qty(self) -> float:
+        return round(self.quantity - self.filled, 8)
+
+
+# Event driven backtest of a strategy written against BinanceFutureGateway.
+# The backtester stands in for the gateway: the strategy registers its on_orderbook/on_execution
+# callbacks and sends orders with submit_limit_order/submit_cancel_order and their batch versions
+# as it would live, while run() replays a market_data_capture log of depth diffs, snapshots and
+# aggTrades on the exchange event clock. Requests reach the exchange latency_ms after they are sent
+# and their responses and execution events come back latency_ms later.
+#
+# Fill model for resting orders: an order joins the back of the recorded queue at its price.
+# Trades at the price consume the queue ahead of it before filling it, recorded size decreases not
+# explained by trades are cancels and shrink the queue ahead pro rata, and trades through the price
+# or the other side of the book reaching it fill the order completely. GTX orders that would
+# cross on arrival are rejected. Without aggTrade records only the last two apply.
+class Backtester:
+    def __init__(
+        self,
+        symbol: str,
+        latency_ms=5,
+        maker_fee=0.0002,
+        name="Binance",
+        decoder: MessageDecoder = None,
+    ):
+        self._symbol = symbol
+        self._latency_ms = latency_ms
+        self._maker_fee = maker_fee
+        self._exchange_name = name
+        self._decoder = decoder or MessageDecoder()
+
+        self._book = LocalOrderBook(symbol)
+        self._venue_book = VenueOrderBook(name, OrderBook.with_depth(symbol, 5))
+        # diffs received before the first snapshot
+        self._pending_diffs = []
+
+        self._depth_callbacks = []
+        self._execution_callbacks = []
+
+        # exchange clock in ms, the event time of the message being replayed
+        self._now = 0
+        # (due ms, sequence, function, args) of requests and responses in flight
+        self._scheduled = []
+        self._sequence = count()
+        self._order_ids = count(1)
+        self._orders = {}
+
+        self._positions = PositionTracker()
+        self.position = 0.0
+        self.cash = 0.0
+        self.fees = 0.0
+        self.max_position = 0.0
+        self.min_position = 0.0
+        self.stats = {
+            "messages": 0,
+            # REST requests, as the gateway would split the batches
+            "requests_sent": 0,
+            "orders_sent": 0,
+            "orders_accepted": 0,
+            "orders_rejected": 0,
+            "orders_filled": 0,
+            "cancels_sent": 0,
+            "cancels_rejected": 0,
+            "fills": 0,
+            "filled_quantity": 0.0,
+            "traded_notional": 0.0,
+            "callback_errors": 0,
+        }
+
+    """
+        Gateway interface used by the strategies
+    """
+
+    def connect(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def register_depth_callback(self, dep_callback, symbol=None, conflate=False):
+        self._depth_callbacks.append(dep_callback)
+
+    def register_execution_callback(self, ex_callback, symbol=None):
+        self._execution_callbacks.append(ex_callback)
+
+    def get_position(self, symbol=None) -> Position:
+        return self._positions.get_position(symbol or self._symbol)
+
+    def get_order_book(self, symbol=None) -> OrderBook:
+        _book = OrderBook.with_depth(self._symbol, 5)
+        self._book.write_top(_book)
+        return _book
+
+    def submit_limit_order(self, side: Side, price, quantity, tif="IOC", symbol=None, client_order_id=None) -> Future:
+        if tif != "GTX":
+            raise ValueError(f"Backtester only simulates post only (GTX) orders, got {tif}")
+        _future = Future()
+        _client_order_id = client_order_id or "bt-{}".format(next(self._order_ids))
+        self.stats["orders_sent"] += 1
+        self.stats["requests_sent"] += 1
+        self._schedule(
+            self._latency_ms,
+            self._on_new_order,
+            (_future, _client_order_id, side, float(price), float(quantity), tif),
+        )
+        return _future
+
+    def submit_cancel_order(self, symbol, order_id) -> Future:
+        _future = Future()
+        self.stats["cancels_sent"] += 1
+        self.stats["requests_sent"] += 1
+        self._schedule(self._latency_ms, self._on_cancel_order, (_future, order_id))
+        return _future
+
+    # every order of a batch reaches the exchange at the same time, results are per order
+    def submit_batch_orders(self, orders: [NewOrderSingle], tif="GTC") -> Future:
+        _orders = []
+        for o in orders:
+            if not (o.post_only or o.type == OrderType.PostOnly or tif == "GTX"):
+                raise ValueError(f"Backtester only simulates post only (GTX) orders, got {tif}")
+            _orders.append(
+                (
+                    o.client_order_id or "bt-{}".format(next(self._order_ids)),
+                    o.side,
+                    float(o.price),
+                    float(o.quantity),
+                )
+            )
+        _future = Future()
+        self.stats["orders_sent"] += len(_orders)
+        # the gateway sends up to 5 orders per request
+        self.stats["requests_sent"] += -(-len(_orders) // 5)
+        self._schedule(self._latency_ms, self._on_batch_orders, (_future, _orders))
+        return _future
+
+    def submit_cancel_batch_orders(self, symbol, order_ids) -> Future:
+        _future = Future()
+        self.stats["cancels_sent"] += len(order_ids)
+        self.stats["requests_sent"] += -(-len(order_ids) // 10)
+        self._schedule(self._latency_ms, self._on_cancel_batch, (_future, list(order_ids)))
+        return _future
+
+    """
+        Replay
+    """
+
+    def run(self, paths) -> dict:
+        _reader = paths if isinstance(paths, CaptureReader) else CaptureReader(paths)
+        _loads = self._decoder.loads
+        _decode_depth = self._decoder.decode_depth_update
+        _decode_trade = self._decoder.decode_agg_trade
+        _symbol = self._symbol
+        _start = time.perf_counter()
+        for (_, _channel, _frame) in _reader:
+            _message = _loads(_frame)
+            if _message.get("s") != _symbol:
+                continue
+            self.stats["messages"] += 1
+            if _channel == CHANNEL_DEPTH:
+                _depth = _decode_depth(_message)
+                self._advance(_depth.event_time)
+                self._on_depth(_depth)
+            elif _channel == CHANNEL_TRADE:
+                _trade = _decode_trade(_message)
+                self._advance(_trade.event_time)
+                self._on_trade(_trade)
+            elif _channel == CHANNEL_SNAPSHOT:
+                self._on_snapshot(_message)
+            elif _channel == CHANNEL_MARK_PRICE:
+                self._positions.on_mark_price(_symbol, float(_message["p"]))
+        # deliver what is still in flight at the end of the data
+        self._advance(float("inf"))
+        self.stats["elapsed_s"] = time.perf_counter() - _start
+        return self.result()
+
+    def _schedule(self, delay_ms, function, args):
+        heapq.heappush(self._scheduled, (self._now + delay_ms, next(self._sequence), function, args))
+
+    # run the requests and responses due up to the given exchange time
+    def _advance(self, now):
+        _scheduled = self._scheduled
+        while _scheduled and _scheduled[0][0] <= now:
+            _due, _, _function, _args = heapq.heappop(_scheduled)
+            self._now = _due
+            _function(*_args)
+        if now != float("inf"):
+            self._now = now
+
+    def _on_snapshot(self, snapshot):
+        _book = self._book
+        _book.apply_snapshot(snapshot)
+        _pending = [d for d in self._pending_diffs if d.final_update_id >= _book.last_update_id]
+        self._pending_diffs = []
+        for _depth in _pending:
+            self._on_depth(_depth)
+
+    def _on_depth(self, depth):
+        _book = self._book
+        if not _book.apply_update(depth):
+            # before the first snapshot, or a gap in the recording until the next one
+            self._pending_diffs.append(depth)
+            return
+        for _order in list(self._orders.values()):
+            self._update_queue(_order)
+
+        if self._depth_callbacks and _book.get_best_bid() is not None and _book.get_best_ask() is not None:
+            _book.write_top(self._venue_book.book)
+            for _d_callback in self._depth_callbacks:
+                self._call(_d_callback, self._venue_book)
+
+    def _on_trade(self, trade):
+        for _order in list(self._orders.values()):
+            # a buyer maker trade was sold into the bids
+            if (_order.side == Side.BUY) != trade.is_buyer_maker:
+                continue
+            if _order.side == Side.BUY:
+                _through = trade.price < _order.price
+                _at = trade.price == _order.price
+            else:
+                _through = trade.price > _order.price
+                _at = trade.price == _order.price
+            if _through:
+                self._fill(_order, _order.leaves_qty())
+            elif _at:
+                _size = trade.quantity
+                # the traded size is no longer in the level, it is not counted as a cancel later
+                _order.level_size = max(0.0, _order.level_size - _size)
+                if _size > _order.queue_ahead:
+                    self._fill(_order, min(_order.leaves_qty(), round(_size - _order.queue_ahead, 8)))
+                    _order.queue_ahead = 0.0
+                else:
+                    _order.queue_ahead -= _size
+
+    def _update_queue(self, order: _BacktestOrder):
+        _book = self._book
+        if order.side == Side.BUY:
+            _best_ask = _book.get_best_ask()
+            if _best_ask is not None and _best_ask <= order.price:
+                self._fill(order, order.leaves_qty())
+                return
+            _size = _book.get_bid_size(order.price)
+        else:
+            _best_bid = _book.get_best_bid()
+            if _best_bid is not None and _best_bid >= order.price:
+                self._fill(order, order.leaves_qty())
+                return
+            _size = _book.get_ask_size(order.price)
+        _cancelled = order.level_size - _size
+        if _cancelled > 0 and order.level_size > 0:
+            order.queue_ahead -= _cancelled * order.queue_ahead / order.level_size
+        order.queue_ahead = max(0.0, min(order.queue_ahead, _size))
+        order.level_size = _size
+
+    """
+        Simulated exchange side of the order requests
+    """
+
+    def _on_new_order(self, future, client_order_id, side, price, quantity, tif):
+        _accepted = self._accept_order(client_order_id, side, price, quantity)
+        self._schedule(self._latency_ms, future.set_result, (_accepted,))
+
+    def _on_batch_orders(self, future, orders):
+        _results = [self._accept_order(*o) for o in orders]
+        self._schedule(self._latency_ms, future.set_result, (_results,))
+
+    def _on_cancel_order(self, future, client_order_id):
+        _cancelled = self._cancel(client_order_id)
+        self._schedule(self._latency_ms, future.set_result, (_cancelled,))
+
+    def _on_cancel_batch(self, future, client_order_ids):
+        _results = [self._cancel(i) for i in client_order_ids]
+        self._schedule(self._latency_ms, future.set_result, (_results,))
+
+    def _accept_order(self, client_order_id, side, price, quantity) -> bool:
+        _book = self._book
+        if side == Side.BUY:
+            _best_ask = _book.get_best_ask()
+            _crosses = _best_ask is not None and price >= _best_ask
+            _level = _book.get_bid_size(price)
+        else:
+            _best_bid = _book.get_best_bid()
+            _crosses = _best_bid is not None and price <= _best_bid
+            _level = _book.get_ask_size(price)
+        if _crosses:
+            self.stats["orders_rejected"] += 1
+            return False
+
+        _order = _BacktestOrder(client_order_id, side, price, quantity)
+        _order.queue_ahead = _level
+        _order.level_size = _level
+        self._orders[client_order_id] = _order
+        self.stats["orders_accepted"] += 1
+        self._send_event(_order, ExecutionType.NEW, OrderStatus.NEW)
+        return True
+
+    def _cancel(self, client_order_id) -> bool:
+        _order = self._orders.pop(client_order_id, None)
+        if _order is None:
+            self.stats["cancels_rejected"] += 1
+            return False
+        self._send_event(_order, ExecutionType.CANCELED, OrderStatus.CANCELED)
+        return True
+
+    def _fill(self, order: _BacktestOrder, quantity: float):
+        if quantity <= 0:
+            return
+        order.filled = round(order.filled + quantity, 8)
+        _notional = order.price * quantity
+        _fee = _notional * self._maker_fee
+        if order.side == Side.BUY:
+            self.position += quantity
+            self.cash -= _notional + _fee
+        else:
+            self.position -= quantity
+            self.cash += _notional - _fee
+        self.position = round(self.position, 8)
+        self._positions.on_fill(self._symbol, order.side, order.price, quantity, _fee)
+        self.fees += _fee
+        self.max_position = max(self.max_position, self.position)
+        self.min_position = min(self.min_position, self.position)
+        _stats = self.stats
+        _stats["fills"] += 1
+        _stats["filled_quantity"] += quantity
+        _stats["traded_notional"] += _notional
+
+        if order.leaves_qty() <= 0:
+            del self._orders[order.client_order_id]
+            _stats["orders_filled"] += 1
+            _status = OrderStatus.FILLED
+        else:
+            _status = OrderStatus.PARTIALLY_FILLED
+        self._send_event(order, ExecutionType.TRADE, _status, order.price, quantity)
+
+    def _send_event(self, order: _BacktestOrder, execution_type, status, price=0, quantity=0):
+        _order_event = OrderEvent(self._symbol, order.client_order_id, execution_type, order.side, status)
+        # the time the simulated exchange handled it, delivery adds the latency
+        _order_event.event_time = self._now
+        if execution_type == ExecutionType.TRADE:
+            _order_event.fill_time = self._now
+        _order_event.last_filled_price = price
+        _order_event.last_filled_quantity = quantity
+        self._schedule(self._latency_ms, self._deliver_event, (_order_event,))
+
+    def _deliver_event(self, order_event: OrderEvent):
+        for _ex_callback in self._execution_callbacks:
+            self._call(_ex_callback, order_event)
+
+    # strategy errors are counted and logged, a live gateway would not stop on them either
+    def _call(self, callback, argument):
+        try:
+            callback(argument)
+        except Exception as e:
+            self.stats["callback_errors"] += 1
+            logging.info(f"[Error] Strategy callback error: {e}..")
+
+    """
+        Results
+    """
+
+    def mid_price(self) -> float:
+        _bid, _ask = self._book.get_best_bid(), self._book.get_best_ask()
+        if _bid is None or _ask is None:
+            return 0.0
+        return (_bid + _ask) / 2
+
+    # PnL marked to the last mid, net of fees, with fill rates and inventory
+    def result(self) -> dict:
+        _stats = self.stats
+        _accepted = _stats["orders_accepted"]
+        return dict(
+            _stats,
+            pnl=self.cash + self.position * self.mid_price(),
+            fees=self.fees,
+            position=self.position,
+            max_position=self.max_position,
+            min_position=self.min_position,
+            fill_rate=_stats["orders_filled"] / _accepted if _accepted else 0.0,
+            reject_rate=_stats["orders_rejected"] / _stats["orders_sent"] if _stats["orders_sent"] else 0.0,
+        )
+
+    def report(self) -> str:
+        return "\n".join("{:<18} {}".format(k, v) for (k, v) in self.result().items())
+
+
+# Backtest the market making strategy on a market_data_capture directory
+if __name__ == "__main__":
+    import sys
+
+    from market_making_strat import PricingStrategy
+
+    logging.getLogger().setLevel(logging.WARNING)
+    backtester = Backtester("BTCUSDT", latency_ms=5)
+    strategy = PricingStrategy("BTCUSDT", 0.01, 0.1, backtester)
+    backtester.register_depth_callback(strategy.on_orderbook)
+    strategy.start()
+    backtester.run(sys.argv[1])
+    print(backtester.report())
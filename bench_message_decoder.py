@@ -0,0 +1,191 @@
+import json
+import time
+
+from interface_order import OrderEvent, OrderStatus, ExecutionType, Side
+from message_decoder import MessageDecoder, orjson
+
+# Messages per second of generic dict decoding, as the gateway and the realtime scripts did it,
+# against the schema specific MessageDecoder. Both sides decode the same fields, from already
+# parsed dicts (python-binance sockets) and from raw frames (plain websockets).
+
+ORDER_TRADE_UPDATE = {
+    "e": "ORDER_TRADE_UPDATE", "E": 1568879465651, "T": 1568879465650,
+    "o": {
+        "s": "BTCUSDT", "c": "TEST", "S": "SELL", "o": "LIMIT", "f": "GTX", "q": "0.010", "p": "27100.10",
+        "ap": "27100.10", "sp": "0", "x": "TRADE", "X": "PARTIALLY_FILLED", "i": 8886774, "l": "0.004",
+        "z": "0.004", "L": "27100.10", "N": "USDT", "n": "0.02", "T": 1568879465650, "t": 1234, "b": "0",
+        "a": "0", "m": True, "R": False, "wt": "CONTRACT_PRICE", "ot": "LIMIT", "ps": "BOTH", "cp": False,
+        "rp": "0", "pP": False, "si": 0, "ss": 0,
+    },
+}
+
+ACCOUNT_UPDATE = {
+    "e": "ACCOUNT_UPDATE", "E": 1564745798939, "T": 1564745798938,
+    "a": {
+        "m": "ORDER",
+        "B": [{"a": "USDT", "wb": "122624.12345678", "cw": "100.12345678", "bc": "50.12345678"}],
+        "P": [{"s": "BTCUSDT", "pa": "0.004", "ep": "27100.10", "bep": "27100.2", "cr": "200", "up": "0.2",
+               "mt": "cross", "iw": "0", "ps": "BOTH"}],
+    },
+}
+
+DEPTH_UPDATE = {
+    "e": "depthUpdate", "E": 123456789, "T": 123456788, "s": "BTCUSDT", "U": 157, "u": 160, "pu": 149,
+    "b": [["27100.10", "1.201"], ["27099.90", "0.052"], ["27098.00", "0"]],
+    "a": [["27100.20", "0.300"], ["27101.30", "4.200"]],
+}
+
+KLINE = {
+    "e": "kline", "E": 1638747660000, "s": "BTCUSDT",
+    "k": {"t": 1638747660000, "T": 1638747719999, "s": "BTCUSDT", "i": "1m", "f": 100, "L": 200,
+          "o": "27100.10", "c": "27110.00", "h": "27115.50", "l": "27099.00", "v": "101.23", "n": 100,
+          "x": False, "q": "2741234.12", "V": "50.1", "Q": "1357000.10", "B": "0"},
+}
+
+AGG_TRADE = {
+    "e": "aggTrade", "E": 123456789, "s": "BTCUSDT", "a": 5933014, "p": "27100.10", "q": "0.120",
+    "f": 100, "l": 105, "T": 123456785, "m": True,
+}
+
+
+# generic decoding of the same fields: dict access, float() per field and Enum[name] lookups
+def legacy_order_trade_update(message):
+    _o = message["o"]
+    return {
+        "event_time": message["E"],
+        "transaction_time": message["T"],
+        "symbol": _o["s"],
+        "client_order_id": _o["c"],
+        "order_id": _o["i"],
+        "side": Side[_o["S"]],
+        "price": float(_o["p"]),
+        "quantity": float(_o["q"]),
+        "execution_type": ExecutionType[_o["x"]],
+        "order_status": OrderStatus[_o["X"]],
+        "last_filled_price": float(_o["L"]),
+        "last_filled_quantity": float(_o["l"]),
+        "cumulative_filled_quantity": float(_o["z"]),
+        "trade_id": _o.get("t"),
+        "commission": float(_o.get("n", 0)),
+        "realized_profit": float(_o.get("rp", 0)),
+        "is_maker": _o.get("m", False),
+    }
+
+
+def legacy_account_update(message):
+    _a = message["a"]
+    return {
+        "event_time": message["E"],
+        "transaction_time": message["T"],
+        "reason": _a.get("m"),
+        "balances": [
+            {"asset": b["a"], "wallet_balance": float(b["wb"]), "cross_wallet_balance": float(b["cw"]),
+             "balance_change": float(b.get("bc", 0))}
+            for b in _a.get("B", ())
+        ],
+        "positions": [
+            {"symbol": p["s"], "position_amount": float(p["pa"]), "entry_price": float(p["ep"]),
+             "accumulated_realized": float(p["cr"]), "unrealized_pnl": float(p["up"]), "position_side": p["ps"]}
+            for p in _a.get("P", ())
+        ],
+    }
+
+
+def legacy_depth_update(message):
+    return {
+        "event_time": message["E"],
+        "transaction_time": message.get("T"),
+        "symbol": message["s"],
+        "first_update_id": message["U"],
+        "final_update_id": message["u"],
+        "prev_final_update_id": message.get("pu"),
+        "bids": [(float(p), float(s)) for (p, s) in message["b"]],
+        "asks": [(float(p), float(s)) for (p, s) in message["a"]],
+    }
+
+
+def legacy_kline(message):
+    _kdata = message["k"]
+    return {
+        "event_time": message["E"],
+        "symbol": message["s"],
+        "interval": _kdata["i"],
+        "start_time": int(_kdata["t"]),
+        "open": float(_kdata["o"]),
+        "high": float(_kdata["h"]),
+        "low": float(_kdata["l"]),
+        "close": float(_kdata["c"]),
+        "volume": float(_kdata["v"]),
+        "closed": _kdata["x"],
+    }
+
+
+def legacy_agg_trade(message):
+    return {
+        "event_time": message["E"],
+        "trade_time": message["T"],
+        "symbol": message["s"],
+        "agg_trade_id": message["a"],
+        "price": float(message["p"]),
+        "quantity": float(message["q"]),
+        "is_buyer_maker": message["m"],
+    }
+
+
+# the gateway's previous ORDER_TRADE_UPDATE handling, straight to an OrderEvent
+def legacy_order_event(message):
+    _trade_data = message["o"]
+    _order_event = OrderEvent(
+        _trade_data["s"],
+        _trade_data["c"],
+        ExecutionType[_trade_data["x"]],
+        Side[_trade_data["S"]],
+        OrderStatus[_trade_data["X"]],
+    )
+    if _trade_data["x"] == "TRADE":
+        _order_event.last_filled_price = float(_trade_data["L"])
+        _order_event.last_filled_quantity = float(_trade_data["l"])
+    return _order_event
+
+
+def rate(func, message, seconds=0.5) -> float:
+    _n = 0
+    _start = time.perf_counter()
+    _deadline = _start + seconds
+    while True:
+        for _ in range(1000):
+            func(message)
+        _n += 1000
+        _now = time.perf_counter()
+        if _now >= _deadline:
+            return _n / (_now - _start)
+
+
+def main():
+    _decoder = MessageDecoder()
+    _cases = [
+        ("ORDER_TRADE_UPDATE", ORDER_TRADE_UPDATE, legacy_order_trade_update, _decoder.decode_order_trade_update),
+        ("-> OrderEvent", ORDER_TRADE_UPDATE, legacy_order_event,
+         lambda m: _decoder.decode_order_trade_update(m).to_order_event()),
+        ("ACCOUNT_UPDATE", ACCOUNT_UPDATE, legacy_account_update, _decoder.decode_account_update),
+        ("depthUpdate", DEPTH_UPDATE, legacy_depth_update, _decoder.decode_depth_update),
+        ("kline", KLINE, legacy_kline, _decoder.decode_kline),
+        ("aggTrade", AGG_TRADE, legacy_agg_trade, _decoder.decode_agg_trade),
+    ]
+    print("raw frame decoding with {}".format("orjson" if orjson else "json (orjson not installed)"))
+    print("{:<20} {:>14} {:>14} {:>14} {:>14}".format("message", "dict before", "dict after", "raw before", "raw after"))
+    for (_name, _message, _legacy, _decode) in _cases:
+        _raw = json.dumps(_message)
+        print(
+            "{:<20} {:>14,.0f} {:>14,.0f} {:>14,.0f} {:>14,.0f}".format(
+                _name,
+                rate(_legacy, _message),
+                rate(_decode, _message),
+                rate(lambda r: _legacy(json.loads(r)), _raw),
+                rate(lambda r: _decode(_decoder.loads(r)), _raw),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,187 +1,1007 @@
+import aiohttp
 import asyncio
+import json
 import logging
-import schedule
 import time
 
+from itertools import count
 from threading import Thread
 
-from binance import Client, AsyncClient, BinanceSocketManager
-from binance.depthcache import FuturesDepthCacheManager
-from interface_order import OrderEvent, OrderStatus, ExecutionType, Side
-from interface_book import OrderBook, PriceLevel, VenueOrderBook
+from binance import AsyncClient, BinanceSocketManager
+from depth_book import LocalOrderBook
+from depth_dispatcher import ConflatingDispatcher
+from interface_order import (
+    ExecutionType,
+    Side,
+    NewOrderSingle,
+    OrderType,
+    InstrumentDetails,
+    TradeBatch,
+)
+from interface_book import OrderBook, VenueOrderBook, BestBidOffer
+from latency_tracker import LatencyTracker
+from market_data_capture import (
+    CaptureReader,
+    CaptureWriter,
+    CHANNEL_DEPTH,
+    CHANNEL_USER,
+    CHANNEL_SNAPSHOT,
+    CHANNEL_TRADE,
+    CHANNEL_MARK_PRICE,
+    CHANNEL_BOOK_TICKER,
+)
+from message_decoder import MessageDecoder
+from position_tracker import Position, PositionTracker
+from pre_trade_risk import PreTradeRisk, PreTradeRejected, instruments_from_exchange_info
+from rate_limiter import RateLimiter, CANCEL, REQUEST, NEW_ORDER
 
 logging.basicConfig(
     format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
     level=logging.INFO,
 )
 
+# error code of a cancel the exchange refuses because it no longer has the order: filled,
+# cancelled, expired or never placed
+UNKNOWN_ORDER_CODE = -2011
 
+
+# Futures gateway for one symbol, or for a list of symbols multiplexed over a single
+# combined depth stream, a single user data stream and a single event loop thread
 class BinanceFutureGateway:
     def __init__(
-        self, symbol: str, api_key=None, api_secret=None, name="Binance", testnet=True
+        self,
+        symbol,
+        api_key=None,
+        api_secret=None,
+        name="Binance",
+        testnet=True,
+        decoder: MessageDecoder = None,
+        trace_latency=True,
+        rest_url=None,
+        stream_url=None,
+        capture_dir=None,
     ):
-        self._symbol = symbol
+        self._symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        # default symbol for single symbol usage
+        self._symbol = self._symbols[0]
         self._api_key = api_key
         self._api_secret = api_secret
         self._exchange_name = name
         self.testnet = testnet
+        # alternative endpoints, e.g. the local exchange_simulator
+        # rest_url="http://127.0.0.1:8765/fapi", stream_url="ws://127.0.0.1:8765/"
+        self._rest_url = rest_url
+        self._stream_url = stream_url
+
+        # schema specific decoding of stream messages into typed structs
+        self._decoder = decoder or MessageDecoder()
 
-        # Client and Async client
-        self._client = None
+        # Async client, every REST request goes through it and the rate limiter
         self._async_client = None
-        self._dcm = None
         self._dws = None
+        self._bws = None
         self._listen_key = None
-
-        # Depth cache
-        self._depth_cache = None
+        self._http_pool_size = 20
+        # Binance expires listen keys after 60 minutes without a keepalive
+        self._keepalive_interval = 30 * 60
+
+        # tasks running on the gateway loop
+        self._tasks = []
+
+        # in flight async order requests, referenced until done
+        self._pending_requests = set()
+        # REST requests of the loop wait here for room in the exchange rate limits
+        self._rate_limiter = RateLimiter()
+
+        # positions and balances from fills and mark prices, reconciled with REST off the hot path
+        self._positions = PositionTracker()
+        self._reconcile_interval = 60
+
+        # instrument rules loaded once from exchangeInfo and the inline pre-trade checks using them,
+        # orders are rejected until the rules are loaded
+        self._instruments = {}
+        self._risk = PreTradeRisk(self._positions)
+        self._instruments_retry_delay = 5
+
+        # client order ids sent by the gateway
+        self._order_id_prefix = "gw{}-".format(int(time.time()))
+        self._order_ids = count(1)
+
+        # tick-to-trade latency per symbol and stage, timed with perf_counter_ns
+        self._latency = LatencyTracker() if trace_latency else None
+        # symbol -> receive time of its last depth or bbo update delivered, the tick orders react to
+        self._tick_ns = {}
+        # client order id -> (tick_ns, send_ns) of orders waiting for their exchange ack
+        self._traced_orders = {}
+
+        # raw depth, snapshot and user data messages appended to a binary log, see market_data_capture
+        self._capture = CaptureWriter(capture_dir) if capture_dir else None
+        # set while replay() feeds a capture through the handlers instead of the sockets
+        self._replaying = False
+
+        # Local depth books, maintained from the diff stream
+        self._depth_books = {s: LocalOrderBook(s) for s in self._symbols}
+        # symbol -> diffs received while its snapshot is in flight
+        self._resync_buffers = {}
+        self._reconnect_delay = 1
+        self._resync_retry_delay = 0.25
+        # perf_counter_ns of the depth socket failure, 0 while connected
+        self._disconnected_ns = 0
+        self._depth_sync_stats = {
+            "reconnects": 0,
+            "reconnect_downtime_ms": 0.0,
+            "last_reconnect_downtime_ms": 0.0,
+            "gaps": 0,
+            "snapshot_fetches": 0,
+            "replayed_diffs": 0,
+            "last_resync_ms": 0.0,
+        }
+        self._book_levels = 5
+        # books handed to depth callbacks, refreshed in place on every update
+        self._venue_books = {s: self._new_venue_book(s) for s in self._symbols}
 
         # dedicated loop and thread to run all async concurrent tasks
         self._loop = asyncio.new_event_loop()
         self._thread = Thread(target=self.run_async_tasks, daemon=True, name=name)
 
-        # callbacks
-        self._depth_callbacks = []
-        self._execution_callbacks = []
+        # callbacks, per symbol
+        self._depth_callbacks = {s: [] for s in self._symbols}
+        self._execution_callbacks = {s: [] for s in self._symbols}
+        self._bbo_callbacks = {s: [] for s in self._symbols}
+        self._trade_callbacks = {s: [] for s in self._symbols}
+        self._batched_trade_callbacks = {s: [] for s in self._symbols}
+        # trades received per symbol since the last hand over to the batched callbacks, handed over
+        # once the depth socket has no frame waiting
+        self._trade_batches = {s: TradeBatch(s) for s in self._symbols}
+        self._trades_pending = False
+        # symbol -> latest BestBidOffer of the bookTicker stream
+        self._bbos = {}
+
+        # depth callbacks running on their own threads, always handed the latest book
+        self._depth_dispatcher = ConflatingDispatcher(
+            name + "-depth", self._new_venue_book
+        )
+
+    """
+        Start the gateway loop thread and return immediately. Client setup, sockets and the
+        listen key keepalive all run as tasks on the gateway's own loop.
+    """
 
     def connect(self):
         logging.info("Initializing connection..")
-
-        self._loop.run_until_complete(self._setting_async_client())
-
         logging.info("starting event loop thread..")
         self._thread.start()
 
-        self._client = Client(self._api_key, self._api_secret, testnet=self.testnet)
+    """
+        Stop all tasks, close the listen key and the client session and stop the loop thread
+    """
 
-        schedule.every(15).seconds.do(self.extend_listen_key)
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+    def stop(self):
+        logging.info("Stopping gateway..")
+        if self._on_loop_thread():
+            self._loop.create_task(self._shutdown()).add_done_callback(
+                lambda _: self._loop.stop()
+            )
+            return
+        if self._thread.is_alive():
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(
+                    timeout=10
+                )
+            except Exception as e:
+                logging.info(f"[Error] Gateway shutdown error: {e}..")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+        self._depth_dispatcher.stop()
+
+    async def _shutdown(self):
+        for _task in self._tasks:
+            _task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._async_client:
+            if self._listen_key:
+                try:
+                    await self._async_client.futures_stream_close(self._listen_key)
+                except Exception as e:
+                    logging.info(f"Failed to close listen key: {e}")
+                self._listen_key = None
+            await self._async_client.close_connection()
+        if self._capture:
+            self._capture.close()
 
     async def _setting_async_client(self):
         logging.info("Configuring depth websocket AsyncClient..")
-        self._async_client = await AsyncClient.create(
-            self._api_key, self._api_secret, testnet=self.testnet
+        # keep a warm pool of connections so order requests skip the TCP/TLS handshake
+        _connector = aiohttp.TCPConnector(
+            limit=self._http_pool_size, keepalive_timeout=60, ttl_dns_cache=300
+        )
+        # constructed directly, AsyncClient.create would block startup on ping and server time calls
+        self._async_client = AsyncClient(
+            self._api_key,
+            self._api_secret,
+            testnet=self.testnet,
+            session_params={"connector": _connector},
         )
+        self._override_rest_url(self._async_client)
+        self._hook_rate_limits(self._async_client)
+
+    def _override_rest_url(self, client):
+        if self._rest_url:
+            client.FUTURES_URL = self._rest_url
+            client.FUTURES_TESTNET_URL = self._rest_url
+
+    def _socket_manager(self) -> BinanceSocketManager:
+        _bsm = BinanceSocketManager(self._async_client)
+        if self._stream_url:
+            _bsm.FSTREAM_URL = self._stream_url
+            _bsm.FSTREAM_TESTNET_URL = self._stream_url
+        return _bsm
 
     def extend_listen_key(self):
+        return self._submit(self._keepalive_listen_key())
+
+    async def _keepalive_listen_key(self):
         logging.info("Extending listen key..")
-        self._client.futures_stream_keepalive(self._listen_key)
+        try:
+            await self._async_client.futures_stream_keepalive(self._listen_key)
+        except Exception as e:
+            logging.info(f"Failed to extend listen key: {e}")
+
+    async def _keepalive_listen_key_forever(self):
+        while True:
+            await asyncio.sleep(self._keepalive_interval)
+            if self._listen_key:
+                await self._keepalive_listen_key()
 
     def run_async_tasks(self):
-        self._loop.create_task(self._listen_depth_forever())
-        self._loop.create_task(self._listen_execution_forever())
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._setting_async_client())
+        self._tasks = [
+            self._loop.create_task(self._listen_depth_forever()),
+            self._loop.create_task(self._listen_execution_forever()),
+            self._loop.create_task(self._keepalive_listen_key_forever()),
+            self._loop.create_task(self._reconcile_positions_forever()),
+            self._loop.create_task(self._load_instruments()),
+        ]
+        if any(self._bbo_callbacks.values()):
+            self._tasks.append(self._loop.create_task(self._listen_book_ticker_forever()))
         self._loop.run_forever()
 
     async def _listen_depth_forever(self):
         logging.info("Subscribing to depth events..")
         while True:
-            if not self._dws:
-                logging.info("depth socket not connected, connecting..")
-                self._dcm = FuturesDepthCacheManager(
-                    self._async_client, symbol=self._symbol
-                )
-            async with self._dcm as self._dws:
+            try:
+                if not self._dws:
+                    logging.info("depth socket not connected, connecting..")
+                    # resubscribe on the existing client session, books resync on the first gap
+                    _streams = [s.lower() + "@depth@100ms" for s in self._symbols] + [
+                        s.lower() + "@markPrice@1s" for s in self._symbols
+                    ]
+                    if self._has_trade_callbacks():
+                        _streams += [s.lower() + "@aggTrade" for s in self._symbols]
+                    self._dws = self._socket_manager().futures_multiplex_socket(_streams)
+                async with self._dws as ws:
+                    while True:
+                        _message = await ws.recv()
+                        _recv_ns = time.perf_counter_ns()
+                        # wall clock receive time, compared with the exchange event time
+                        _recv_time_ns = time.time_ns()
+                        if _message.get("e") == "error":
+                            raise Exception(_message.get("m"))
+                        if self._disconnected_ns:
+                            self._record_reconnect(_recv_ns)
+
+                        _data = _message["data"]
+                        _event = _data["e"]
+                        if _event == "aggTrade":
+                            if self._capture:
+                                self._capture.write(CHANNEL_TRADE, _data, _recv_time_ns)
+                            self._on_agg_trade(_data)
+                        elif _event == "markPriceUpdate":
+                            if self._capture:
+                                self._capture.write(CHANNEL_MARK_PRICE, _data, _recv_time_ns)
+                            self._on_mark_price(_data)
+                        else:
+                            if self._capture:
+                                self._capture.write(CHANNEL_DEPTH, _data, _recv_time_ns)
+                            self._on_depth_message(_data, _recv_ns, _recv_time_ns)
+                        if self._trades_pending and self._socket_drained(ws):
+                            self._flush_trades()
+            except Exception as e:
+                logging.info(f"[Error] Depth processing error: {e}..")
+                self._dws = None
+                if self._trades_pending:
+                    self._flush_trades()
+                if not self._disconnected_ns:
+                    self._disconnected_ns = time.perf_counter_ns()
+                await asyncio.sleep(self._reconnect_delay)
+
+    # bookTicker on a connection of its own, so best price changes never queue behind depth diffs
+    async def _listen_book_ticker_forever(self):
+        logging.info("Subscribing to book ticker events..")
+        while True:
+            try:
+                if not self._bws:
+                    self._bws = self._socket_manager().futures_multiplex_socket(
+                        [s.lower() + "@bookTicker" for s in self._symbols]
+                    )
+                async with self._bws as ws:
+                    while True:
+                        _message = await ws.recv()
+                        _recv_ns = time.perf_counter_ns()
+                        _recv_time_ns = time.time_ns()
+                        if _message.get("e") == "error":
+                            raise Exception(_message.get("m"))
+                        _data = _message["data"]
+                        if self._capture:
+                            self._capture.write(CHANNEL_BOOK_TICKER, _data, _recv_time_ns)
+                        self._on_book_ticker(_data, _recv_ns, _recv_time_ns)
+            except Exception as e:
+                logging.info(f"[Error] Book ticker processing error: {e}..")
+                self._bws = None
+                await asyncio.sleep(self._reconnect_delay)
+
+    # recv_time_ns is the wall clock receive time, 0 when replaying
+    def _on_book_ticker(self, message, recv_ns, recv_time_ns=0):
+        _bbo = self._decoder.decode_book_ticker(message)
+        _symbol = _bbo.symbol
+        _last = self._bbos.get(_symbol)
+        if _last is not None and _bbo.update_id < _last.update_id:
+            # older than the one delivered, e.g. across a reconnect
+            return
+        self._bbos[_symbol] = _bbo
+        _callbacks = self._bbo_callbacks[_symbol]
+        if not _callbacks:
+            return
+        self._tick_ns[_symbol] = recv_ns
+        for _b_callback in _callbacks:
+            _b_callback(_bbo)
+        if self._latency:
+            if recv_time_ns:
+                self._latency.record(_symbol, "bbo_feed", recv_time_ns - _bbo.event_time * 1000000)
+            self._latency.record(_symbol, "bbo_callback", time.perf_counter_ns() - recv_ns)
+
+    def _has_trade_callbacks(self) -> bool:
+        return any(self._trade_callbacks.values()) or any(self._batched_trade_callbacks.values())
+
+    def _on_agg_trade(self, message):
+        _update = self._decoder.decode_agg_trade(message)
+        _symbol = _update.symbol
+        _callbacks = self._trade_callbacks[_symbol]
+        if _callbacks:
+            _trade = _update.to_trade(time.time())
+            for _t_callback in _callbacks:
+                _t_callback(_trade)
+        if self._batched_trade_callbacks[_symbol]:
+            self._trade_batches[_symbol].append(
+                _update.trade_time, _update.price, _update.quantity, not _update.is_buyer_maker
+            )
+            if self._replaying:
+                self._flush_trades()
+            else:
+                self._trades_pending = True
+
+    # True once every frame received by the socket is processed. recv() of python-binance waits on
+    # an asyncio queue and yields to the loop even with frames queued, so a flush scheduled on the
+    # loop would run after every single message.
+    @staticmethod
+    def _socket_drained(ws) -> bool:
+        _queue = getattr(ws, "_queue", None)
+        return _queue is None or _queue.empty()
+
+    def _flush_trades(self):
+        self._trades_pending = False
+        _received_time = time.time()
+        for (_symbol, _batch) in self._trade_batches.items():
+            if not len(_batch):
+                continue
+            _batch.received_time = _received_time
+            for _t_callback in self._batched_trade_callbacks[_symbol]:
                 try:
-                    self._depth_cache = await self._dws.recv()
+                    _t_callback(_batch)
+                except Exception as e:
+                    logging.info(f"[Error] Trade callback error: {e}..")
+            _batch.clear()
+
+    # latest best bid and offer, None before the first bookTicker event
+    def get_bbo(self, symbol=None) -> BestBidOffer:
+        return self._bbos.get(symbol or self._symbol)
+
+    # recv_time_ns is the wall clock receive time, 0 when replaying
+    def _on_depth_message(self, message, recv_ns, recv_time_ns=0):
+        _depth = self._decoder.decode_depth_update(message)
+        _symbol = _depth.symbol
+        _buffer = self._resync_buffers.get(_symbol)
+        if _buffer is not None:
+            # snapshot in flight, replayed on top of it once it arrives
+            _buffer.append(_depth)
+            return
+        _book = self._depth_books[_symbol]
+        if not _book.apply_update(_depth):
+            # no snapshot yet or a sequence gap
+            self._start_resync(_symbol, _depth)
+            return
+
+        _callbacks = self._depth_callbacks[_symbol]
+        _conflated = self._depth_dispatcher.has_subscribers(_symbol)
+        if _callbacks or _conflated:
+            # one book per symbol, overwritten in place and shared by every callback
+            _venue_book = self._venue_books[_symbol]
+            _book.write_top(_venue_book.book)
+            self._tick_ns[_symbol] = recv_ns
+            if self._latency:
+                _book_ns = time.perf_counter_ns()
+            if _conflated:
+                self._depth_dispatcher.publish(_symbol, _venue_book)
+            for _d_callback in _callbacks:
+                _d_callback(_venue_book)
+
+            if self._latency:
+                _latency = self._latency
+                if recv_time_ns:
+                    # exchange event time is wall clock, so feed latency includes clock offset
+                    _latency.record(_symbol, "feed", recv_time_ns - _depth.event_time * 1000000)
+                _latency.record(_symbol, "book", _book_ns - recv_ns)
+                _latency.record(
+                    _symbol, "callback", time.perf_counter_ns() - _book_ns
+                )
 
-                    if self._depth_callbacks:
-                        for _d_callback in self._depth_callbacks:
-                            _d_callback(VenueOrderBook(self._exchange_name, self.get_order_book()))
+    def _record_reconnect(self, recv_ns):
+        _downtime_ms = (recv_ns - self._disconnected_ns) / 1e6
+        self._disconnected_ns = 0
+        _stats = self._depth_sync_stats
+        _stats["reconnects"] += 1
+        _stats["last_reconnect_downtime_ms"] = _downtime_ms
+        _stats["reconnect_downtime_ms"] += _downtime_ms
+        logging.info(f"Depth socket reconnected after {_downtime_ms:.1f}ms..")
+
+    def _start_resync(self, symbol, depth):
+        if self._depth_books[symbol].is_synced():
+            self._depth_sync_stats["gaps"] += 1
+            logging.info(f"Depth sequence gap for {symbol}, resyncing..")
+        self._resync_buffers[symbol] = [depth]
+        if not self._replaying:
+            # a replay resyncs from the snapshots recorded in the capture
+            self._loop.create_task(self._resync_depth_book(symbol))
 
-                except Exception as e:
-                    logging.info(f"[Error] Depth processing error: {e}..")
-                    self._dws = None
-                    await self._setting_async_client()
+    """
+        Fetch a depth snapshot for the symbol and replay the diffs buffered meanwhile on top of it.
+        A snapshot older than the buffered diffs is fetched again.
+    """
 
-    def get_order_book(self) -> OrderBook:
-        _bids = [
-            PriceLevel(price=p, size=s) for (p, s) in self._depth_cache.get_bids()[:5]
-        ]
-        _asks = [
-            PriceLevel(price=p, size=s) for (p, s) in self._depth_cache.get_asks()[:5]
-        ]
-        return OrderBook(
-            timestamp=self._depth_cache.update_time,
-            contract_name=self._symbol,
-            bids=_bids,
-            asks=_asks,
+    async def _resync_depth_book(self, symbol):
+        _start_ns = time.perf_counter_ns()
+        while True:
+            try:
+                logging.info(f"Fetching depth snapshot for {symbol}..")
+                await self._rate_limiter.acquire(20, 0, REQUEST)
+                _snapshot = await self._async_client.futures_order_book(
+                    symbol=symbol, limit=1000
+                )
+                self._depth_sync_stats["snapshot_fetches"] += 1
+            except Exception as e:
+                self._on_request_error(e)
+                logging.info(f"[Error] Depth snapshot error for {symbol}: {e}..")
+                await asyncio.sleep(self._reconnect_delay)
+                continue
+
+            if self._capture:
+                self._capture.write(CHANNEL_SNAPSHOT, dict(_snapshot, s=symbol))
+            if self._apply_snapshot(symbol, _snapshot):
+                break
+            await asyncio.sleep(self._resync_retry_delay)
+
+        _resync_ms = (time.perf_counter_ns() - _start_ns) / 1e6
+        self._depth_sync_stats["last_resync_ms"] = _resync_ms
+        logging.info(f"Depth book {symbol} synced in {_resync_ms:.1f}ms..")
+
+    # apply the snapshot and the buffered diffs, True if the book is synced
+    def _apply_snapshot(self, symbol, snapshot) -> bool:
+        _book = self._depth_books[symbol]
+        _buffer = self._resync_buffers.get(symbol, [])
+        _book.apply_snapshot(snapshot)
+        # diffs already covered by the snapshot are not needed for a retry either
+        _buffer[:] = [d for d in _buffer if d.final_update_id >= _book.last_update_id]
+        if not all(_book.apply_update(d) for d in _buffer):
+            return False
+        self._depth_sync_stats["replayed_diffs"] += len(_buffer)
+        self._resync_buffers.pop(symbol, None)
+        return True
+
+    # reconnect and resync counters of the depth feed
+    def get_depth_sync_stats(self) -> dict:
+        return dict(
+            self._depth_sync_stats, resyncs_in_progress=len(self._resync_buffers)
+        )
+
+    # a snapshot of the current top of book, safe to keep
+    def get_order_book(self, symbol=None) -> OrderBook:
+        _symbol = symbol or self._symbol
+        _book = OrderBook.with_depth(_symbol, self._book_levels)
+        self._depth_books[_symbol].write_top(_book)
+        return _book
+
+    def _new_venue_book(self, symbol) -> VenueOrderBook:
+        return VenueOrderBook(
+            self._exchange_name, OrderBook.with_depth(symbol, self._book_levels)
         )
 
     async def _listen_execution_forever(self):
         logging.info("Subscribing to user data stream..")
-        self._listen_key = BinanceSocketManager(self._async_client)
-        url = self._listen_key.futures_user_socket()
-
-        async with url as ws:
-            while True:
-                _message = await ws.recv()
-                # print(_message)
-                _event = _message["e"]
-                if _event == "ORDER_TRADE_UPDATE":
-                    _trade_data = _message["o"]
-                    _order_id = _trade_data["c"]
-                    _symbol = _trade_data["s"]
-                    _ex_type = _trade_data["x"]
-                    _order_status = _trade_data["X"]
-                    _side = _trade_data["S"]
-                    _last_filled_px = float(_trade_data["L"])
-                    _last_filled_qty = float(_trade_data["l"])
-
-                    # create an order event
-                    _order_event = OrderEvent(
-                        _symbol,
-                        _order_id,
-                        ExecutionType[_ex_type],
-                        Side[_side],
-                        OrderStatus[_order_status],
+        while True:
+            try:
+                if not self._listen_key:
+                    self._listen_key = (
+                        await self._async_client.futures_stream_get_listen_key()
                     )
-                    if _ex_type == "TRADE":
-                        _order_event.last_filled_price = _last_filled_px
-                        _order_event.last_filled_quantity = _last_filled_qty
+                # one listen key and user stream shared by every symbol of the gateway
+                _socket = self._socket_manager().futures_multiplex_socket(
+                    [self._listen_key]
+                )
+                async with _socket as ws:
+                    while True:
+                        _message = await ws.recv()
+                        _recv_time_ns = time.time_ns()
+                        if _message.get("e") == "error":
+                            raise Exception(_message.get("m"))
+                        _data = _message["data"]
+                        if _data["e"] == "listenKeyExpired":
+                            logging.info("Listen key expired, renewing..")
+                            self._listen_key = None
+                            break
+                        if self._capture:
+                            self._capture.write(CHANNEL_USER, _data, _recv_time_ns)
+                        self._on_user_message(_data)
+            except Exception as e:
+                logging.info(f"[Error] User data stream error: {e}..")
+                await asyncio.sleep(self._reconnect_delay)
+
+    def _on_user_message(self, message):
+        _event = message["e"]
+        if _event == "ORDER_TRADE_UPDATE":
+            _update = self._decoder.decode_order_trade_update(message)
+            if self._traced_orders:
+                self._trace_ack(_update)
+            if _update.execution_type is ExecutionType.TRADE:
+                # position first, so callbacks already see the fill in it
+                self._positions.on_fill(
+                    _update.symbol,
+                    _update.side,
+                    _update.last_filled_price,
+                    _update.last_filled_quantity,
+                    _update.commission,
+                    _update.commission_asset,
+                )
+            _order_event = _update.to_order_event()
+            for _ex_callback in self._execution_callbacks.get(_update.symbol, ()):
+                _ex_callback(_order_event)
+
+        if _event == "ACCOUNT_UPDATE":
+            _account = self._decoder.decode_account_update(message)
+            self._positions.on_account_update(_account)
+            for _position in _account.positions:
+                logging.info(
+                    f"Open position: {_position.symbol} {_position.position_amount}"
+                )
+
+    def _on_mark_price(self, message):
+        _mark = self._decoder.decode_mark_price(message)
+        self._positions.on_mark_price(_mark.symbol, _mark.mark_price)
 
-                    if self._execution_callbacks:
-                        for _ex_callback in self._execution_callbacks:
-                            _ex_callback(_order_event)
+    """
+        Positions and balances, safe to read from any thread
+    """
 
-                if _event == 'ACCOUNT_UPDATE':
-                    _position = _message['a']['P'][0]['pa']
-                    logging.info(f"Open position: {_position}")
+    def get_position(self, symbol=None) -> Position:
+        return self._positions.get_position(symbol or self._symbol)
+
+    def get_balance(self, asset="USDT") -> float:
+        return self._positions.get_balance(asset)
+
+    async def _reconcile_positions_forever(self):
+        while True:
+            await self._reconcile_positions()
+            await asyncio.sleep(self._reconcile_interval)
+
+    async def _reconcile_positions(self):
+        try:
+            _requested_at = time.time()
+            await self._rate_limiter.acquire(5, 0, REQUEST)
+            _position_risk = await self._async_client.futures_position_information()
+            await self._rate_limiter.acquire(5, 0, REQUEST)
+            _balances = await self._async_client.futures_account_balance()
+            self._positions.reconcile(_position_risk, _balances, _requested_at)
+        except Exception as e:
+            self._on_request_error(e)
+            logging.info(f"[Error] Position reconciliation error: {e}..")
 
     """
-        Place limit order
+        Instrument rules and pre-trade risk limits
     """
 
-    def place_limit_order(self, side: Side, price, quantity, tif="IOC") -> bool:
+    async def _load_instruments(self):
+        while True:
+            try:
+                await self._rate_limiter.acquire(1, 0, REQUEST)
+                _exchange_info = await self._async_client.futures_exchange_info()
+                self._instruments = instruments_from_exchange_info(_exchange_info, self._symbols)
+                self._risk.load_instruments(self._instruments)
+                logging.info(f"Loaded instrument rules of {list(self._instruments)}..")
+                return
+            except Exception as e:
+                self._on_request_error(e)
+                logging.info(f"[Error] Loading instrument rules error: {e}..")
+                await asyncio.sleep(self._instruments_retry_delay)
+
+    def get_instrument(self, symbol=None) -> InstrumentDetails:
+        return self._instruments.get(symbol or self._symbol)
+
+    # max absolute position in contracts, max notional per order, max distance of order prices
+    # from the book mid as a fraction of the mid. None disables a limit.
+    def set_risk_limits(self, max_position=None, max_order_notional=None, price_band=None, symbol=None):
+        self._risk.set_limits(symbol or self._symbol, max_position, max_order_notional, price_band)
+
+    def get_risk_stats(self) -> dict:
+        return dict(self._risk.stats)
+
+    # rounded (price, quantity) of an order passing the pre-trade checks, None if rejected
+    def _check_risk(self, symbol, side: Side, price, quantity):
+        _book = self._depth_books.get(symbol)
+        _mid = None
+        if _book is not None:
+            _bid = _book.get_best_bid()
+            _ask = _book.get_best_ask()
+            if _bid is not None and _ask is not None:
+                _mid = (_bid + _ask) / 2
         try:
-            self._client.futures_create_order(
-                symbol=self._symbol,
+            return self._risk.check(symbol, side, price, quantity, _mid)
+        except PreTradeRejected as e:
+            logging.info(f"Order rejected by pre-trade risk: {symbol} {side.name} {quantity}@{price}, {e}")
+            return None
+
+    """
+        Feed captured messages through the depth and user data handlers, on the calling thread
+        and with the gateway not connected. speed=None replays as fast as possible, 1.0 at the
+        recorded pace, 2.0 twice as fast. Orders sent by callbacks during a replay are not routed.
+        Returns the number of messages replayed.
+    """
+
+    def replay(self, paths, speed=None) -> int:
+        _reader = paths if isinstance(paths, CaptureReader) else CaptureReader(paths)
+        _loads = self._decoder.loads
+        _count = 0
+        _first_ns = None
+        self._replaying = True
+        try:
+            for (_recv_ns, _channel, _frame) in _reader:
+                if speed:
+                    if _first_ns is None:
+                        _first_ns = _recv_ns
+                        _start = time.perf_counter()
+                    _delay = (_recv_ns - _first_ns) / 1e9 / speed - (time.perf_counter() - _start)
+                    if _delay > 0:
+                        time.sleep(_delay)
+                _message = _loads(_frame)
+                if _channel == CHANNEL_DEPTH:
+                    self._on_depth_message(_message, time.perf_counter_ns())
+                elif _channel == CHANNEL_USER:
+                    self._on_user_message(_message)
+                elif _channel == CHANNEL_SNAPSHOT:
+                    self._apply_snapshot(_message["s"], _message)
+                elif _channel == CHANNEL_MARK_PRICE:
+                    self._on_mark_price(_message)
+                elif _channel == CHANNEL_TRADE:
+                    self._on_agg_trade(_message)
+                elif _channel == CHANNEL_BOOK_TICKER:
+                    self._on_book_ticker(_message, time.perf_counter_ns())
+                _count += 1
+        finally:
+            self._replaying = False
+        return _count
+
+    """
+        Blocking order entry, the async versions run on the gateway loop so the requests go
+        through the rate limiter like any other. The gateway must be connected. Not for the loop
+        thread, e.g. gateway callbacks, which would wait on themselves: use submit_* there.
+    """
+
+    def place_limit_order(
+        self, side: Side, price, quantity, tif="IOC", symbol=None
+    ) -> bool:
+        if self._on_loop_thread():
+            logging.info("[Error] place_limit_order called on the gateway loop, use submit_limit_order..")
+            return False
+        return self.submit_limit_order(side, price, quantity, tif, symbol).result()
+
+    def cancel_order(self, symbol, order_id) -> bool:
+        if self._on_loop_thread():
+            logging.info("[Error] cancel_order called on the gateway loop, use submit_cancel_order..")
+            return False
+        return self.submit_cancel_order(symbol, order_id).result()
+
+    """
+        Async order entry, sent through the AsyncClient's pooled session on the gateway loop
+    """
+
+    async def place_limit_order_async(
+        self, side: Side, price, quantity, tif="IOC", symbol=None, client_order_id=None
+    ) -> bool:
+        _symbol = symbol or self._symbol
+        _checked = self._check_risk(_symbol, side, price, quantity)
+        if _checked is None:
+            return False
+        _client_order_id = client_order_id or self._next_client_order_id()
+        # waiting for room in the rate limits is not part of the traced send latency
+        await self._rate_limiter.acquire(1, 1, NEW_ORDER)
+        if self._latency:
+            _send_ns = time.perf_counter_ns()
+            _tick_ns = self._tick_ns.get(_symbol, 0)
+            if _tick_ns:
+                self._latency.record(_symbol, "tick_to_send", _send_ns - _tick_ns)
+            self._traced_orders[_client_order_id] = (_tick_ns, _send_ns)
+        try:
+            await self._async_client.futures_create_order(
+                symbol=_symbol,
                 side=side.name,
                 type="LIMIT",
-                price=price,
-                quantity=quantity,
+                price=_checked[0],
+                quantity=_checked[1],
                 timeInForce=tif,
+                newClientOrderId=_client_order_id,
             )
+            if self._latency:
+                self._latency.record(
+                    _symbol, "send_to_response", time.perf_counter_ns() - _send_ns
+                )
             return True
         except Exception as e:
+            self._traced_orders.pop(_client_order_id, None)
+            self._on_request_error(e)
             logging.info(f"Failed to place order: {e}")
             return False
 
+    # True if cancelled, False if the exchange no longer has the order, None if the request failed
+    # otherwise and the order may still be live
+    async def cancel_order_async(self, symbol, order_id) -> bool:
+        try:
+            await self._rate_limiter.acquire(1, 0, CANCEL)
+            await self._async_client.futures_cancel_order(
+                symbol=symbol, origClientOrderId=order_id
+            )
+            return True
+        except Exception as e:
+            self._on_request_error(e)
+            logging.info(f"Failed to cancel order: {order_id}, {e}")
+            return False if getattr(e, "code", None) == UNKNOWN_ORDER_CODE else None
+
     """
-        Cancel Order
+        Batch order entry. Binance takes up to 5 new orders or 10 cancels per request,
+        larger batches are split and the chunks sent concurrently. Results are per order.
     """
 
-    def cancel_order(self, symbol, order_id) -> bool:
+    async def place_batch_orders_async(self, orders: [NewOrderSingle], tif="GTC") -> [bool]:
+        _chunks = [orders[i:i + 5] for i in range(0, len(orders), 5)]
+        _results = await asyncio.gather(*[self._place_batch(c, tif) for c in _chunks])
+        return [r for _chunk_results in _results for r in _chunk_results]
+
+    async def _place_batch(self, orders: [NewOrderSingle], tif) -> [bool]:
+        # orders rejected by the pre-trade checks are left out of the request
+        _batch = []
+        _sent = []
+        for _i, o in enumerate(orders):
+            _checked = self._check_risk(o.symbol, o.side, o.price, o.quantity)
+            if _checked is None:
+                continue
+            _sent.append(_i)
+            _batch.append(
+                {
+                    "symbol": o.symbol,
+                    "side": o.side.name,
+                    "type": "LIMIT",
+                    "price": str(_checked[0]),
+                    "quantity": str(_checked[1]),
+                    "timeInForce": "GTX" if o.post_only or o.type == OrderType.PostOnly else tif,
+                    "newClientOrderId": o.client_order_id or self._next_client_order_id(),
+                }
+            )
+        _results = [False] * len(orders)
+        if not _batch:
+            return _results
         try:
-            self._client.futures_cancel_order(symbol=symbol, origClientOrderId=order_id)
-            return True
+            await self._rate_limiter.acquire(5, len(_batch), NEW_ORDER)
+            _responses = await self._async_client.futures_place_batch_order(
+                batchOrders=_batch
+            )
         except Exception as e:
-            logging.info(f"Failed to cancel order: {order_id}, {e}")
+            self._on_request_error(e)
+            logging.info(f"Failed to place batch orders: {e}")
+            return _results
+        for _i, _result in zip(_sent, self._batch_results(_responses, "place order")):
+            _results[_i] = _result
+        return _results
+
+    async def cancel_batch_orders_async(self, symbol, order_ids) -> [bool]:
+        _chunks = [order_ids[i:i + 10] for i in range(0, len(order_ids), 10)]
+        _results = await asyncio.gather(*[self._cancel_batch(symbol, c) for c in _chunks])
+        return [r for _chunk_results in _results for r in _chunk_results]
+
+    # per order results as in cancel_order_async
+    async def _cancel_batch(self, symbol, order_ids) -> [bool]:
+        try:
+            await self._rate_limiter.acquire(1, 0, CANCEL)
+            _responses = await self._async_client.futures_cancel_orders(
+                symbol=symbol,
+                origClientOrderIdList=json.dumps(order_ids, separators=(",", ":")),
+            )
+        except Exception as e:
+            self._on_request_error(e)
+            logging.info(f"Failed to cancel orders: {order_ids}, {e}")
+            return [None] * len(order_ids)
+        return self._batch_results(_responses, "cancel order", UNKNOWN_ORDER_CODE)
+
+    # usage headers of every REST response, read in the handler each response goes through. The
+    # client keeps only the last response, which concurrent requests on the loop overwrite
+    def _hook_rate_limits(self, client):
+        _handle_response = client._handle_response
+
+        async def _handle_response_with_limits(response):
+            self._rate_limiter.update(response.headers)
+            return await _handle_response(response)
+
+        client._handle_response = _handle_response_with_limits
+
+    def _on_request_error(self, e):
+        # BinanceAPIException carries the HTTP status and response
+        if getattr(e, "status_code", None) in (418, 429):
+            _retry_after = e.response.headers.get("Retry-After")
+            self._rate_limiter.ban(float(_retry_after) if _retry_after else 60)
+
+    def get_rate_limit_stats(self) -> dict:
+        return self._rate_limiter.get_stats()
+
+    # failed entries are False, or None if refused_code is given and they failed with another code
+    @staticmethod
+    def _batch_results(responses, action, refused_code=None) -> [bool]:
+        # failed entries of a batch come back as {"code": .., "msg": ..} in place of the order
+        _results = []
+        for _response in responses:
+            if "code" in _response and "orderId" not in _response:
+                logging.info(f"Failed to {action}: {_response.get('msg')}")
+                if refused_code is None or _response["code"] == refused_code:
+                    _results.append(False)
+                else:
+                    _results.append(None)
+            else:
+                _results.append(True)
+        return _results
+
+    """
+        Cancel/replace a quote. Futures have no cancel-replace endpoint, so the cancel and the
+        new order are sent concurrently over the pooled connections: one round trip of latency.
+        Returns (cancelled, placed).
+    """
+
+    async def cancel_replace_order_async(
+        self, symbol, order_id, side: Side, price, quantity, tif="GTX"
+    ) -> (bool, bool):
+        return tuple(
+            await asyncio.gather(
+                self.cancel_order_async(symbol, order_id),
+                self.place_limit_order_async(side, price, quantity, tif, symbol),
+            )
+        )
+
+    """
+        Fire and forget order entry, safe to call from callbacks or any other thread.
+        Returns a future resolving to the same bool as the blocking versions.
+    """
+
+    def submit_limit_order(
+        self, side: Side, price, quantity, tif="IOC", symbol=None, client_order_id=None
+    ):
+        return self._submit(
+            self.place_limit_order_async(
+                side, price, quantity, tif, symbol, client_order_id
+            )
+        )
+
+    def submit_cancel_order(self, symbol, order_id):
+        return self._submit(self.cancel_order_async(symbol, order_id))
+
+    def submit_batch_orders(self, orders: [NewOrderSingle], tif="GTC"):
+        return self._submit(self.place_batch_orders_async(orders, tif))
+
+    def submit_cancel_batch_orders(self, symbol, order_ids):
+        return self._submit(self.cancel_batch_orders_async(symbol, order_ids))
+
+    def submit_cancel_replace_order(
+        self, symbol, order_id, side: Side, price, quantity, tif="GTX"
+    ):
+        return self._submit(
+            self.cancel_replace_order_async(symbol, order_id, side, price, quantity, tif)
+        )
+
+    def _submit(self, coro):
+        if self._on_loop_thread():
+            _future = self._loop.create_task(coro)
+        else:
+            _future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        self._pending_requests.add(_future)
+        _future.add_done_callback(self._pending_requests.discard)
+        return _future
+
+    def _next_client_order_id(self) -> str:
+        return self._order_id_prefix + str(next(self._order_ids))
+
+    # the order was acknowledged on the user data stream, close its latency trace
+    def _trace_ack(self, update):
+        _trace = self._traced_orders.pop(update.client_order_id, None)
+        if _trace is None:
+            return
+        _tick_ns, _send_ns = _trace
+        _now = time.perf_counter_ns()
+        self._latency.record(update.symbol, "send_to_ack", _now - _send_ns)
+        if _tick_ns:
+            self._latency.record(update.symbol, "tick_to_ack", _now - _tick_ns)
+
+    """
+        Latency percentiles in microseconds, per symbol and stage:
+        feed (exchange event time to receive, includes clock offset), book (receive to book built),
+        callback (depth callbacks), tick_to_send (depth receive to order request sent),
+        send_to_response (REST round trip), send_to_ack and tick_to_ack (to the ORDER_TRADE_UPDATE ack)
+    """
+
+    def get_latency_percentiles(self) -> dict:
+        return self._latency.percentiles() if self._latency else {}
+
+    def dump_latency(self) -> str:
+        _dump = self._latency.dump() if self._latency else ""
+        logging.info("Latency percentiles (us):\n" + _dump)
+        return _dump
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
             return False
 
-    def register_depth_callback(self, dep_callback):
-        self._depth_callbacks.append(dep_callback)
+    """
+        Register callbacks for the given symbol, or for every symbol of the gateway if None.
+        Depth callbacks get a book that is overwritten on the next update, copy it to keep it.
+        A conflated depth callback runs on its own thread and only ever sees the latest book,
+        intermediate books are dropped while it is busy.
+    """
 
-    def register_execution_callback(self, ex_callback):
-        self._execution_callbacks.append(ex_callback)
+    def register_depth_callback(self, dep_callback, symbol=None, conflate=False):
+        for _symbol in [symbol] if symbol else self._symbols:
+            if conflate:
+                self._depth_dispatcher.register(dep_callback, _symbol)
+            else:
+                self._depth_callbacks[_symbol].append(dep_callback)
+
+    # delivered and dropped book counts of the conflated depth callbacks
+    def get_depth_dispatch_stats(self) -> dict:
+        return self._depth_dispatcher.stats()
+
+    def register_execution_callback(self, ex_callback, symbol=None):
+        for _symbol in [symbol] if symbol else self._symbols:
+            self._execution_callbacks[_symbol].append(ex_callback)
+
+    # Best bid and offer callbacks, called with a BestBidOffer on every bookTicker event. The
+    # bookTicker stream is only subscribed if one is registered before connect(). Depth callbacks
+    # keep getting the full books.
+    def register_bbo_callback(self, bbo_callback, symbol=None):
+        for _symbol in [symbol] if symbol else self._symbols:
+            self._bbo_callbacks[_symbol].append(bbo_callback)
+
+    # Public trade callbacks, called with an interface_order.Trade per aggTrade event, or with
+    # batched=True with a TradeBatch of the symbol's trades each time the frames already received
+    # on the socket are processed, so a burst of trades comes in one call. The aggTrade stream is
+    # only subscribed if one is registered before connect().
+    def register_trade_callback(self, trade_callback, symbol=None, batched=False):
+        for _symbol in [symbol] if symbol else self._symbols:
+            if batched:
+                self._batched_trade_callbacks[_symbol].append(trade_callback)
+            else:
+                self._trade_callbacks[_symbol].append(trade_callback)
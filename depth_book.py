@@ -0,0 +1,154 @@
+from bisect import bisect_left
+
+
+# A locally maintained L2 order book, kept in sync from a snapshot plus the futures depthUpdate diff stream.
+# Each side is an ascending array of keys with a parallel array of sizes and the best level at the end,
+# so most updates touch the cheap end of the arrays and top-N reads are a reversed slice.
+class LocalOrderBook:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.last_update_id = None
+        self.update_time = None
+
+        # bids are keyed by price, asks by negated price, so the best level is always last
+        self._bid_keys = []
+        self._bid_sizes = []
+        self._ask_keys = []
+        self._ask_sizes = []
+
+        # set once the first diff after a snapshot has been bridged
+        self._bridged = False
+
+    def __str__(self):
+        return "LocalOrderBook [symbol={}, last_update_id={}, bids={}, asks={}]".format(
+            self.symbol, self.last_update_id, len(self._bid_keys), len(self._ask_keys)
+        )
+
+    def is_synced(self) -> bool:
+        return self._bridged
+
+    def reset(self):
+        self.last_update_id = None
+        self.update_time = None
+        self._bridged = False
+        self._bid_keys.clear()
+        self._bid_sizes.clear()
+        self._ask_keys.clear()
+        self._ask_sizes.clear()
+
+    """
+        Load a REST depth snapshot, i.e. the payload of GET /fapi/v1/depth
+    """
+
+    def apply_snapshot(self, snapshot: dict):
+        self.reset()
+        _bids = sorted((float(p), float(s)) for (p, s) in snapshot["bids"])
+        _asks = sorted((-float(p), float(s)) for (p, s) in snapshot["asks"])
+        for _key, _size in _bids:
+            if _size:
+                self._bid_keys.append(_key)
+                self._bid_sizes.append(_size)
+        for _key, _size in _asks:
+            if _size:
+                self._ask_keys.append(_key)
+                self._ask_sizes.append(_size)
+        self.last_update_id = snapshot["lastUpdateId"]
+        self.update_time = snapshot.get("E", snapshot.get("T"))
+
+    """
+        Apply a message_decoder.DepthUpdate diff. Returns False when the diff cannot be applied
+        (no snapshot yet or a sequence gap), in which case the book must be resynced.
+    """
+
+    def apply_update(self, update) -> bool:
+        if self.last_update_id is None:
+            return False
+
+        _last_id = update.final_update_id
+        if _last_id < self.last_update_id:
+            # already contained in the snapshot
+            return True
+
+        if not self._bridged:
+            # the first diff after a snapshot must straddle the snapshot id, or start right after it
+            if (
+                update.first_update_id > self.last_update_id
+                and update.prev_final_update_id != self.last_update_id
+            ):
+                return False
+            self._bridged = True
+        elif update.prev_final_update_id != self.last_update_id:
+            return False
+
+        for (p, s) in update.bids:
+            self._set_level(self._bid_keys, self._bid_sizes, p, s)
+        for (p, s) in update.asks:
+            self._set_level(self._ask_keys, self._ask_sizes, -p, s)
+
+        self.last_update_id = _last_id
+        self.update_time = update.event_time
+        return True
+
+    @staticmethod
+    def _set_level(keys: list, sizes: list, key: float, size: float):
+        _i = bisect_left(keys, key)
+        if _i < len(keys) and keys[_i] == key:
+            if size == 0:
+                del keys[_i]
+                del sizes[_i]
+            else:
+                sizes[_i] = size
+        elif size != 0:
+            keys.insert(_i, key)
+            sizes.insert(_i, size)
+
+    # top n bid levels as (price, size), best first
+    def get_bids(self, n: int) -> list:
+        return list(zip(self._bid_keys[-1:-n - 1:-1], self._bid_sizes[-1:-n - 1:-1]))
+
+    # top n ask levels as (price, size), best first
+    def get_asks(self, n: int) -> list:
+        return [
+            (-k, s)
+            for (k, s) in zip(self._ask_keys[-1:-n - 1:-1], self._ask_sizes[-1:-n - 1:-1])
+        ]
+
+    # write the top levels into a preallocated interface_book.OrderBook, without allocating
+    def write_top(self, book):
+        _capacity = book.capacity()
+        _bid_prices, _bid_sizes = book.bid_prices, book.bid_sizes
+        _keys, _sizes = self._bid_keys, self._bid_sizes
+        _n = min(_capacity, len(_keys))
+        for _i in range(1, _n + 1):
+            _bid_prices[_i - 1] = _keys[-_i]
+            _bid_sizes[_i - 1] = _sizes[-_i]
+        book.bid_depth = _n
+
+        _ask_prices, _ask_sizes = book.ask_prices, book.ask_sizes
+        _keys, _sizes = self._ask_keys, self._ask_sizes
+        _n = min(_capacity, len(_keys))
+        for _i in range(1, _n + 1):
+            _ask_prices[_i - 1] = -_keys[-_i]
+            _ask_sizes[_i - 1] = _sizes[-_i]
+        book.ask_depth = _n
+        book.timestamp = self.update_time
+
+    # resting size at a price, 0 if there is no such level
+    def get_bid_size(self, price: float) -> float:
+        return self._level_size(self._bid_keys, self._bid_sizes, price)
+
+    def get_ask_size(self, price: float) -> float:
+        return self._level_size(self._ask_keys, self._ask_sizes, -price)
+
+    @staticmethod
+    def _level_size(keys: list, sizes: list, key: float) -> float:
+        _i = bisect_left(keys, key)
+        if _i < len(keys) and keys[_i] == key:
+            return sizes[_i]
+        return 0.0
+
+    def get_best_bid(self):
+        return self._bid_keys[-1] if self._bid_keys else None
+
+    def get_best_ask(self):
+        return -self._ask_keys[-1] if self._ask_keys else None
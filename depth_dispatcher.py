@@ -0,0 +1,102 @@
+import logging
+
+from threading import Condition, Thread
+
+
+# A subscriber with its own delivery thread, holding at most one pending value per key (e.g. symbol).
+# Publishing never waits on the callback: a value not yet picked up is replaced by the newer one
+# and counted as dropped, so a slow consumer always sees the latest book instead of a backlog.
+# Values are copied into a triple buffer per key (written, ready, being delivered) created by
+# factory(key), so the publisher may reuse its own value and nothing is allocated per publish.
+class ConflatingSubscriber:
+    def __init__(self, callback, name: str, factory):
+        self._callback = callback
+        self._factory = factory
+        self._cond = Condition()
+        self._buffers = {}
+        self._pending = set()
+        self._running = True
+        self.delivered = 0
+        self.dropped = 0
+        self._thread = Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    def publish(self, key, value):
+        _buffers = self._buffers.get(key)
+        if _buffers is None:
+            _buffers = [self._factory(key), self._factory(key), self._factory(key)]
+            self._buffers[key] = _buffers
+        # only the publisher touches the write buffer
+        _buffers[0].copy_from(value)
+        with self._cond:
+            _buffers[0], _buffers[1] = _buffers[1], _buffers[0]
+            if key in self._pending:
+                self.dropped += 1
+            else:
+                self._pending.add(key)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                _batch = []
+                for _key in self._pending:
+                    _buffers = self._buffers[_key]
+                    _buffers[1], _buffers[2] = _buffers[2], _buffers[1]
+                    _batch.append(_buffers[2])
+                self._pending.clear()
+
+            for _value in _batch:
+                try:
+                    self._callback(_value)
+                except Exception as e:
+                    logging.info(f"[Error] Conflated callback error: {e}..")
+                self.delivered += 1
+
+
+# Fans published values out to conflating subscribers, one delivery thread per callback
+class ConflatingDispatcher:
+    def __init__(self, name: str, factory):
+        self._name = name
+        self._factory = factory
+        self._subscribers = {}
+        self._by_key = {}
+
+    def register(self, callback, key):
+        _subscriber = self._subscribers.get(callback)
+        if _subscriber is None:
+            _subscriber = ConflatingSubscriber(
+                callback, "{}-{}".format(self._name, len(self._subscribers)), self._factory
+            )
+            self._subscribers[callback] = _subscriber
+        self._by_key.setdefault(key, []).append(_subscriber)
+
+    def has_subscribers(self, key) -> bool:
+        return key in self._by_key
+
+    def publish(self, key, value):
+        for _subscriber in self._by_key.get(key, ()):
+            _subscriber.publish(key, value)
+
+    def stop(self):
+        for _subscriber in self._subscribers.values():
+            _subscriber.stop()
+
+    # delivered and dropped (conflated) counts per callback
+    def stats(self) -> dict:
+        return {
+            getattr(c, "__qualname__", str(c)): {
+                "delivered": s.delivered,
+                "dropped": s.dropped,
+            }
+            for (c, s) in self._subscribers.items()
+        }
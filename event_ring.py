@@ -0,0 +1,405 @@
+import logging
+import threading
+import time
+
+from collections import deque
+from functools import partial
+from threading import Event, Thread
+
+from interface_book import BestBidOffer, OrderBook, VenueOrderBook
+from interface_order import OrderEvent, Side, NewOrderSingle
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+# event kinds
+DEPTH = 0
+EXECUTION = 1
+# (function, argument) to call on the consumer thread
+CALL = 2
+BBO = 3
+
+# backpressure policies of book events when the ring is full
+BLOCK = "block"
+DROP = "drop"
+
+
+# Bounded single producer, single consumer ring of (kind, value) events.
+# Slots are preallocated and indexed by ever increasing head and tail counters, each written by one
+# side only, so publishing and consuming take no lock: under the GIL a slot is fully written before
+# the producer's tail store makes it visible. Books are copied into a book owned by the slot, the
+# producer may reuse its own. The consumer handles an event in place and only then frees its slot.
+# A consumer with nothing to do spins briefly, then sleeps on an event the producer only sets when
+# the consumer is asleep.
+# The producer never waits on the consumer for long. publish() events are never dropped: once the
+# ring is full they go to an unbounded overflow queue, which the consumer drains once the ring is
+# empty. Until it is drained new events follow them there and books are dropped, so events are
+# consumed in publishing order. publish_book() waits at most block_timeout_s for room.
+class EventRing:
+    def __init__(self, capacity=4096, spin=200, block_timeout_s=0.005):
+        # power of two, slot index is a mask of the counter
+        self._capacity = 1 << max(0, capacity - 1).bit_length()
+        self._mask = self._capacity - 1
+        self._kinds = [0] * self._capacity
+        self._values = [None] * self._capacity
+        self._books = [None] * self._capacity
+        # next slot to consume, written by the consumer only
+        self._head = 0
+        # next slot to publish, written by the producer only
+        self._tail = 0
+        self._spin = spin
+        self._block_timeout_s = block_timeout_s
+        # events published while the ring was full, appended by the producer, popped by the consumer
+        self._overflow = deque()
+        self._sleeping = False
+        self._wakeup = Event()
+        self._closed = False
+        self.stats = {
+            "published": 0,
+            "consumed": 0,
+            "dropped": 0,
+            "producer_waits": 0,
+            "overflowed": 0,
+            "batches": 0,
+            "max_depth": 0,
+        }
+
+    def capacity(self) -> int:
+        return self._capacity
+
+    # events published and not consumed yet
+    def depth(self) -> int:
+        return self._tail - self._head + len(self._overflow)
+
+    # never blocks nor drops, the event overflows when the ring is full
+    def publish(self, kind, value):
+        if self._overflow or self._tail - self._head >= self._capacity:
+            self._overflow.append((kind, value))
+            self.stats["overflowed"] += 1
+            self._commit_overflow()
+            return
+        _slot = self._tail & self._mask
+        self._kinds[_slot] = kind
+        self._values[_slot] = value
+        self._commit()
+
+    # copy of a VenueOrderBook into the slot's own book. False if the book is dropped: the ring
+    # stayed full for block_timeout_s, or right away if block is False, or events overflowed.
+    def publish_book(self, kind, venue_book: VenueOrderBook, block=True) -> bool:
+        _slot = self._claim(block)
+        if _slot < 0:
+            return False
+        _book = self._books[_slot]
+        if _book is None or _book.book.capacity() != venue_book.book.capacity():
+            _book = VenueOrderBook(
+                venue_book.exchange_name,
+                OrderBook.with_depth(venue_book.book.contract_name, venue_book.book.capacity()),
+            )
+            self._books[_slot] = _book
+        _book.copy_from(venue_book)
+        self._kinds[_slot] = kind
+        self._values[_slot] = _book
+        self._commit()
+        return True
+
+    def _claim(self, block) -> int:
+        _tail = self._tail
+        if self._overflow:
+            self.stats["dropped"] += 1
+            return -1
+        if _tail - self._head >= self._capacity:
+            if not block:
+                self.stats["dropped"] += 1
+                return -1
+            self.stats["producer_waits"] += 1
+            _deadline = time.monotonic() + self._block_timeout_s
+            while _tail - self._head >= self._capacity and not self._closed:
+                if time.monotonic() >= _deadline:
+                    self.stats["dropped"] += 1
+                    return -1
+                time.sleep(0)
+        return _tail & self._mask
+
+    def _commit(self):
+        self._tail += 1
+        _stats = self.stats
+        _stats["published"] += 1
+        _depth = self._tail - self._head
+        if _depth > _stats["max_depth"]:
+            _stats["max_depth"] = _depth
+        if self._sleeping:
+            self._wakeup.set()
+
+    def _commit_overflow(self):
+        self.stats["published"] += 1
+        if self._sleeping:
+            self._wakeup.set()
+
+    # handle up to max_batch events with handler(kind, value), returns the number handled
+    def consume(self, handler, max_batch=64) -> int:
+        _head = self._head
+        _end = min(self._tail, _head + max_batch)
+        if _end == _head:
+            if self._overflow:
+                return self._consume_overflow(handler, max_batch)
+            return 0
+        _kinds = self._kinds
+        _values = self._values
+        _mask = self._mask
+        for _i in range(_head, _end):
+            _slot = _i & _mask
+            try:
+                handler(_kinds[_slot], _values[_slot])
+            finally:
+                _values[_slot] = None
+                self._head = _i + 1
+        self.stats["consumed"] += _end - _head
+        self.stats["batches"] += 1
+        return _end - _head
+
+    # the ring is empty and stays so while the overflow is not, these are the oldest events
+    def _consume_overflow(self, handler, max_batch) -> int:
+        _overflow = self._overflow
+        _count = 0
+        while _overflow and _count < max_batch:
+            (_kind, _value) = _overflow[0]
+            try:
+                handler(_kind, _value)
+            finally:
+                # popped once handled, the producer keeps off the ring until the last one is
+                _overflow.popleft()
+                _count += 1
+        self.stats["consumed"] += _count
+        self.stats["batches"] += 1
+        return _count
+
+    # block the consumer until events are published, the ring is closed or timeout_s has passed
+    def wait(self, timeout_s=0.1):
+        for _ in range(self._spin):
+            if self._tail != self._head or self._overflow or self._closed:
+                return
+        self._wakeup.clear()
+        self._sleeping = True
+        # re-check, an event published before the flag was seen would not wake us up
+        if self._tail == self._head and not self._overflow and not self._closed:
+            self._wakeup.wait(timeout_s)
+        self._sleeping = False
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+
+    def get_stats(self) -> dict:
+        _stats = self.stats
+        return dict(
+            _stats,
+            capacity=self._capacity,
+            depth=self.depth(),
+            avg_batch=_stats["consumed"] / _stats["batches"] if _stats["batches"] else 0.0,
+        )
+
+
+# Runs strategies on a dedicated thread, fed by the gateway through an EventRing, and stands in for
+# the gateway towards them: strategies and their OrderManager are built with it in place of the
+# gateway and keep their on_orderbook/on_execution callbacks unchanged.
+# The gateway loop thread only copies books and execution events into the ring, so strategy work
+# no longer delays the sockets. Order request futures complete on the loop thread, their done
+# callbacks are sent through the ring as well so all strategy and order manager state is only
+# ever touched by the strategy thread.
+# Books are dropped when the ring is full with the DROP policy, the loop waits a few milliseconds
+# for room with BLOCK and drops them after that. Execution events and order responses are never
+# dropped and never wait, see EventRing, so a slow or stuck strategy never stalls the sockets.
+# Best bid/offer updates are immutable and small, they go through the ring uncopied and are never
+# dropped either. The gateway only subscribes to them once a strategy registers a bbo callback.
+class EventRingGateway:
+    def __init__(
+        self, gateway, name="strategy", capacity=4096, policy=BLOCK, batch_size=64, block_timeout_s=0.005
+    ):
+        self._gateway = gateway
+        self._ring = EventRing(capacity, block_timeout_s=block_timeout_s)
+        self._block_books = policy == BLOCK
+        self._batch_size = batch_size
+        # symbol -> callbacks, None for every symbol
+        self._depth_callbacks = {}
+        self._execution_callbacks = {}
+        self._bbo_callbacks = {}
+        self._running = False
+        self._thread_id = None
+        self._thread = Thread(target=self._run, daemon=True, name=name)
+        self.callback_errors = 0
+
+        gateway.register_depth_callback(self._publish_depth)
+        gateway.register_execution_callback(self._publish_execution)
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._ring.close()
+        if self._thread.is_alive() and self._thread.ident != threading.get_ident():
+            self._thread.join(timeout=10)
+
+    def get_stats(self) -> dict:
+        return dict(self._ring.get_stats(), callback_errors=self.callback_errors)
+
+    """
+        Producer side, on the gateway loop thread
+    """
+
+    def _publish_depth(self, venue_book: VenueOrderBook):
+        if self._depth_callbacks:
+            self._ring.publish_book(DEPTH, venue_book, self._block_books)
+
+    def _publish_execution(self, order_event: OrderEvent):
+        self._ring.publish(EXECUTION, order_event)
+
+    def _publish_bbo(self, bbo: BestBidOffer):
+        self._ring.publish(BBO, bbo)
+
+    # done callback of a request future, run on the consumer thread if it is already there
+    def _publish_done(self, callback, future):
+        if threading.get_ident() == self._thread_id:
+            callback(future)
+        else:
+            self._ring.publish(CALL, (callback, future))
+
+    """
+        Consumer side, on the strategy thread
+    """
+
+    def _run(self):
+        self._thread_id = threading.get_ident()
+        _ring = self._ring
+        _dispatch = self._dispatch
+        while self._running:
+            if not _ring.consume(_dispatch, self._batch_size):
+                _ring.wait()
+
+    def _dispatch(self, kind, value):
+        if kind == DEPTH:
+            _callbacks = self._depth_callbacks
+            _symbol = value.book.contract_name
+        elif kind == EXECUTION:
+            _callbacks = self._execution_callbacks
+            _symbol = value.contract_name
+        elif kind == BBO:
+            _callbacks = self._bbo_callbacks
+            _symbol = value.symbol
+        else:
+            self._call(value[0], value[1])
+            return
+        for _callback in _callbacks.get(_symbol, ()):
+            self._call(_callback, value)
+        for _callback in _callbacks.get(None, ()):
+            self._call(_callback, value)
+
+    # strategy errors are counted and logged, the strategy thread goes on
+    def _call(self, callback, argument):
+        try:
+            callback(argument)
+        except Exception as e:
+            self.callback_errors += 1
+            logging.info(f"[Error] Strategy callback error: {e}..")
+
+    """
+        Gateway interface used by the strategies
+    """
+
+    def register_depth_callback(self, dep_callback, symbol=None, conflate=False):
+        self._depth_callbacks.setdefault(symbol, []).append(dep_callback)
+
+    def register_execution_callback(self, ex_callback, symbol=None):
+        self._execution_callbacks.setdefault(symbol, []).append(ex_callback)
+
+    # must be registered before the gateway connects, like on the gateway itself
+    def register_bbo_callback(self, bbo_callback, symbol=None):
+        if not self._bbo_callbacks:
+            self._gateway.register_bbo_callback(self._publish_bbo)
+        self._bbo_callbacks.setdefault(symbol, []).append(bbo_callback)
+
+    def get_order_book(self, symbol=None) -> OrderBook:
+        return self._gateway.get_order_book(symbol)
+
+    def get_bbo(self, symbol=None) -> BestBidOffer:
+        return self._gateway.get_bbo(symbol)
+
+    def get_position(self, symbol=None):
+        return self._gateway.get_position(symbol)
+
+    def get_balance(self, asset="USDT") -> float:
+        return self._gateway.get_balance(asset)
+
+    def submit_limit_order(self, side: Side, price, quantity, tif="IOC", symbol=None, client_order_id=None):
+        return _RingFuture(
+            self, self._gateway.submit_limit_order(side, price, quantity, tif, symbol, client_order_id)
+        )
+
+    def submit_cancel_order(self, symbol, order_id):
+        return _RingFuture(self, self._gateway.submit_cancel_order(symbol, order_id))
+
+    def submit_batch_orders(self, orders: [NewOrderSingle], tif="GTC"):
+        return _RingFuture(self, self._gateway.submit_batch_orders(orders, tif))
+
+    def submit_cancel_batch_orders(self, symbol, order_ids):
+        return _RingFuture(self, self._gateway.submit_cancel_batch_orders(symbol, order_ids))
+
+    def submit_cancel_replace_order(self, symbol, order_id, side: Side, price, quantity, tif="GTX"):
+        return _RingFuture(
+            self, self._gateway.submit_cancel_replace_order(symbol, order_id, side, price, quantity, tif)
+        )
+
+
+# Request future whose done callbacks run on the strategy thread. result() blocks the strategy
+# thread until the gateway loop completes the request, events queue up meanwhile.
+class _RingFuture:
+    __slots__ = ("_ring_gateway", "_future")
+
+    def __init__(self, ring_gateway: EventRingGateway, future):
+        self._ring_gateway = ring_gateway
+        self._future = future
+
+    def add_done_callback(self, callback):
+        self._future.add_done_callback(partial(self._ring_gateway._publish_done, callback))
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self, timeout=None):
+        return self._future.result(timeout) if timeout is not None else self._future.result()
+
+
+# Run the market making strategy on its own thread, fed through an event ring
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import load_dotenv
+
+    from binance_gateway import BinanceFutureGateway
+    from market_making_strat import PricingStrategy
+
+    dotenv_path = r"Z:\vault\.my_secret"
+    load_dotenv(dotenv_path=dotenv_path)
+
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "BTCUSDT"
+    binance_gateway = BinanceFutureGateway(symbol, os.getenv("BINANCE_KEY"), os.getenv("BINANCE_SECRET"))
+    ring_gateway = EventRingGateway(binance_gateway, policy=DROP)
+
+    strategy = PricingStrategy(symbol, 0.01, 0.1, ring_gateway)
+    ring_gateway.register_depth_callback(strategy.on_orderbook)
+
+    ring_gateway.start()
+    binance_gateway.connect()
+    strategy.start()
+
+    try:
+        while True:
+            time.sleep(10)
+            logging.info(f"Event ring: {ring_gateway.get_stats()}")
+    except KeyboardInterrupt:
+        binance_gateway.stop()
+        ring_gateway.stop()
@@ -0,0 +1,731 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+
+from itertools import count
+
+from aiohttp import web, WSMsgType
+
+from matching_engine import MatchingEngine, SimOrder, SimFill
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+# owner of the orders sent over REST, the simulator has a single account
+ACCOUNT = "account"
+
+POST_ONLY_REJECTED = {
+    "code": -5022,
+    "msg": "Due to the order could not be executed as maker, the Post Only order will be rejected.",
+}
+UNKNOWN_ORDER = {"code": -2011, "msg": "Unknown order sent."}
+INVALID_SYMBOL = {"code": -1121, "msg": "Invalid symbol."}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+# Positions and wallet balance of the simulated account
+class SimAccount:
+    def __init__(self, balance=10000.0, maker_fee=0.0002, taker_fee=0.0004):
+        self.wallet_balance = balance
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        # symbol -> [position amount, entry price, accumulated realized pnl]
+        self.positions = {}
+
+    # returns (realized pnl, commission) of the fill
+    def apply_fill(self, symbol: str, side: str, price: float, quantity: float, is_maker: bool):
+        _position = self.positions.setdefault(symbol, [0.0, 0.0, 0.0])
+        _amount, _entry, _ = _position
+        _signed = quantity if side == "BUY" else -quantity
+        _realized = 0.0
+        _new_amount = round(_amount + _signed, 8)
+        if _amount == 0 or (_amount > 0) == (_signed > 0):
+            _entry = (_entry * abs(_amount) + price * quantity) / abs(_new_amount)
+        else:
+            _closed = min(quantity, abs(_amount))
+            _realized = _closed * (price - _entry) * (1 if _amount > 0 else -1)
+            if _new_amount == 0:
+                _entry = 0.0
+            elif (_new_amount > 0) != (_amount > 0):
+                _entry = price
+        _commission = price * quantity * (self.maker_fee if is_maker else self.taker_fee)
+        _position[0] = _new_amount
+        _position[1] = _entry
+        _position[2] += _realized
+        self.wallet_balance += _realized - _commission
+        return _realized, _commission
+
+
+# A websocket subscriber. Messages are queued with their due time and sent in order by a
+# dedicated task, which is how the configured websocket latency is injected.
+class _StreamConnection:
+    def __init__(self, ws: web.WebSocketResponse, combined: bool, latency: float):
+        self.ws = ws
+        self.combined = combined
+        self._latency = latency
+        self._queue = asyncio.Queue()
+        self._sender = asyncio.get_running_loop().create_task(self._send_forever())
+
+    def send(self, stream: str, payload: dict):
+        _message = {"stream": stream, "data": payload} if self.combined else payload
+        self._queue.put_nowait((time.monotonic() + self._latency, json.dumps(_message)))
+
+    async def _send_forever(self):
+        while True:
+            _due, _text = await self._queue.get()
+            _delay = _due - time.monotonic()
+            if _delay > 0:
+                await asyncio.sleep(_delay)
+            try:
+                await self.ws.send_str(_text)
+            except Exception:
+                return
+
+    def close(self):
+        self._sender.cancel()
+
+
+# A local stand-in for the Binance USD-M futures API, for offline testing and load testing of
+# BinanceFutureGateway and the strategies. It serves the REST order, batch order, depth,
+# exchangeInfo and listenKey endpoints under /fapi, and depth, aggTrade, bookTicker and user data
+# streams under /ws/<stream> and /stream?streams=..., backed by a price-time priority matching
+# engine per symbol. Background liquidity is generated at activity_rate actions per second.
+# rest_latency is the round trip added to REST calls, ws_latency the delay added to every stream message.
+#
+# Point the gateway at it with
+#   BinanceFutureGateway(symbol, "key", "secret", rest_url="http://127.0.0.1:8765/fapi",
+#                        stream_url="ws://127.0.0.1:8765/")
+class BinanceFuturesSimulator:
+    def __init__(
+        self,
+        symbols,
+        host="127.0.0.1",
+        port=8765,
+        rest_latency=0.0,
+        ws_latency=0.0,
+        start_price=30000.0,
+        tick_size=0.1,
+        step_size=0.001,
+        activity_rate=50.0,
+        depth_interval=0.1,
+        seed=None,
+    ):
+        self._symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self._host = host
+        self._port = port
+        self.rest_latency = rest_latency
+        self.ws_latency = ws_latency
+        self._tick_size = tick_size
+        self._step_size = step_size
+        self._price_decimals = max(0, -int(math.floor(math.log10(tick_size))))
+        self._activity_rate = activity_rate
+        self._depth_interval = depth_interval
+        self._random = random.Random(seed)
+
+        self._engines = {s: MatchingEngine(s) for s in self._symbols}
+        self._mid = {s: start_price for s in self._symbols}
+        self._bbo = {s: (None, 0, None, 0) for s in self._symbols}
+        self._account = SimAccount()
+        self._listen_keys = set()
+        self._client_order_ids = count(1)
+        self._background_ids = count(1)
+
+        # stream name -> connections subscribed to it
+        self._subscribers = {}
+        self._tasks = []
+        self._runner = None
+        self.message_count = 0
+
+        self._app = web.Application()
+        self._app.add_routes(
+            [
+                web.get("/fapi/v1/ping", self._handle_ping),
+                web.get("/fapi/v1/time", self._handle_time),
+                web.get("/fapi/v1/depth", self._handle_depth),
+                web.get("/fapi/v1/exchangeInfo", self._handle_exchange_info),
+                web.get("/fapi/v2/positionRisk", self._handle_position_risk),
+                web.get("/fapi/v3/positionRisk", self._handle_position_risk),
+                web.get("/fapi/v2/balance", self._handle_balance),
+                web.get("/fapi/v3/balance", self._handle_balance),
+                web.post("/fapi/v1/order", self._handle_new_order),
+                web.delete("/fapi/v1/order", self._handle_cancel_order),
+                web.post("/fapi/v1/batchOrders", self._handle_batch_orders),
+                web.delete("/fapi/v1/batchOrders", self._handle_cancel_batch_orders),
+                web.post("/fapi/v1/listenKey", self._handle_new_listen_key),
+                web.put("/fapi/v1/listenKey", self._handle_keepalive_listen_key),
+                web.delete("/fapi/v1/listenKey", self._handle_close_listen_key),
+                web.get("/ws/{stream}", self._handle_raw_stream),
+                web.get("/stream", self._handle_combined_stream),
+            ]
+        )
+
+    async def start(self):
+        for _symbol in self._symbols:
+            self._seed_book(_symbol)
+        self._runner = web.AppRunner(self._app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        _loop = asyncio.get_running_loop()
+        self._tasks = [_loop.create_task(self._run_activity(s)) for s in self._symbols]
+        if self._depth_interval:
+            self._tasks.append(_loop.create_task(self._flush_depth_forever()))
+        self._tasks.append(_loop.create_task(self._publish_mark_price_forever()))
+        logging.info(f"Simulator listening on {self._host}:{self._port} for {self._symbols}..")
+
+    async def stop(self):
+        for _task in self._tasks:
+            _task.cancel()
+        for _connections in self._subscribers.values():
+            for _connection in _connections:
+                _connection.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def run_forever(self):
+        await self.start()
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await self.stop()
+
+    """
+        Background market activity
+    """
+
+    def _round_price(self, price: float) -> float:
+        return round(round(price / self._tick_size) * self._tick_size, self._price_decimals)
+
+    def _seed_book(self, symbol):
+        _engine = self._engines[symbol]
+        _mid = self._mid[symbol]
+        for _level in range(1, 51):
+            for _side, _sign in (("BUY", -1), ("SELL", 1)):
+                _engine.submit(
+                    SimOrder(
+                        "bg{}".format(next(self._background_ids)),
+                        symbol,
+                        _side,
+                        self._round_price(_mid + _sign * _level * self._tick_size),
+                        round(self._random.uniform(0.001, 2.0), 3),
+                    ),
+                    _now_ms(),
+                )
+        _engine.take_depth_update(_now_ms())
+
+    async def _run_activity(self, symbol):
+        _interval = 1.0 / self._activity_rate
+        _next = time.monotonic()
+        while True:
+            _next += _interval
+            _delay = _next - time.monotonic()
+            if _delay > 0:
+                await asyncio.sleep(_delay)
+            elif _delay < -1:
+                # fell behind, do not try to catch up a backlog
+                _next = time.monotonic()
+            self._background_action(symbol)
+
+    def _background_action(self, symbol):
+        _engine = self._engines[symbol]
+        _random = self._random
+        _mid = self._mid[symbol] * math.exp(_random.gauss(0, 0.00005))
+        self._mid[symbol] = _mid
+        _now = _now_ms()
+        _resting = _engine.background_orders()
+        _action = _random.random()
+
+        if _action < 0.1:
+            # aggressive order sweeping the top of the other side
+            _side = "BUY" if _random.random() < 0.5 else "SELL"
+            _price = _mid * (1.001 if _side == "BUY" else 0.999)
+            _order = SimOrder(
+                "bg{}".format(next(self._background_ids)),
+                symbol,
+                _side,
+                self._round_price(_price),
+                round(_random.uniform(0.001, 1.0), 3),
+                "IOC",
+            )
+            self._on_fills(symbol, _engine.submit(_order, _now), _now)
+        elif _action < 0.45 and len(_resting) > 20 or len(_resting) > 400:
+            _order = _random.choice(_resting)
+            _engine.cancel(None, _order.client_order_id, _now)
+        else:
+            _side = "BUY" if _random.random() < 0.5 else "SELL"
+            _distance = 1 + int(_random.expovariate(0.2))
+            _best = _engine.best_bid() if _side == "BUY" else _engine.best_ask()
+            _reference = _mid if _best is None else _best
+            _sign = -1 if _side == "BUY" else 1
+            _price = self._round_price(_reference + _sign * (_distance - 1) * self._tick_size)
+            if _engine.would_cross(_side, _price):
+                _price = self._round_price(_price + _sign * self._tick_size)
+            _order = SimOrder(
+                "bg{}".format(next(self._background_ids)),
+                symbol,
+                _side,
+                _price,
+                round(_random.uniform(0.001, 2.0), 3),
+            )
+            self._on_fills(symbol, _engine.submit(_order, _now), _now)
+
+        self._after_book_change(symbol, _now)
+
+    def _after_book_change(self, symbol, now):
+        if not self._depth_interval:
+            self._flush_depth(symbol, now)
+        _engine = self._engines[symbol]
+        _bid = _engine.best_bid()
+        _ask = _engine.best_ask()
+        # like the exchange, a change of the best sizes is published too
+        _bbo = (_bid, _engine._bid_sizes.get(_bid, 0), _ask, _engine._ask_sizes.get(_ask, 0))
+        if _bbo != self._bbo[symbol]:
+            self._bbo[symbol] = _bbo
+            self._publish_book_ticker(symbol, now)
+
+    async def _flush_depth_forever(self):
+        while True:
+            await asyncio.sleep(self._depth_interval)
+            _now = _now_ms()
+            for _symbol in self._symbols:
+                self._flush_depth(_symbol, _now)
+
+    async def _publish_mark_price_forever(self):
+        while True:
+            await asyncio.sleep(1)
+            _now = _now_ms()
+            for _symbol in self._symbols:
+                _mark = str(self._mid[_symbol])
+                self._publish(
+                    _symbol.lower() + "@markPrice@1s",
+                    {
+                        "e": "markPriceUpdate",
+                        "E": _now,
+                        "s": _symbol,
+                        "p": _mark,
+                        "i": _mark,
+                        "P": _mark,
+                        "r": "0.0001",
+                        "T": _now - _now % 28800000 + 28800000,
+                    },
+                )
+
+    def _flush_depth(self, symbol, now):
+        _update = self._engines[symbol].take_depth_update(now)
+        if _update:
+            _stream = symbol.lower() + "@depth"
+            self._publish(_stream, _update)
+            self._publish(_stream + "@100ms", _update)
+
+    """
+        Stream publishing
+    """
+
+    def _publish(self, stream: str, payload: dict):
+        for _connection in self._subscribers.get(stream, ()):
+            _connection.send(stream, payload)
+            self.message_count += 1
+
+    def _publish_user(self, payload: dict):
+        for _listen_key in self._listen_keys:
+            self._publish(_listen_key, payload)
+
+    def _publish_book_ticker(self, symbol, now):
+        _engine = self._engines[symbol]
+        _bid, _bid_size, _ask, _ask_size = self._bbo[symbol]
+        self._publish(
+            symbol.lower() + "@bookTicker",
+            {
+                "e": "bookTicker",
+                "u": _engine.update_id,
+                "E": now,
+                "T": now,
+                "s": symbol,
+                "b": str(_bid or 0),
+                "B": str(_bid_size),
+                "a": str(_ask or 0),
+                "A": str(_ask_size),
+            },
+        )
+
+    def _on_fills(self, symbol, fills: [SimFill], now):
+        for _fill in fills or ():
+            self._publish(
+                symbol.lower() + "@aggTrade",
+                {
+                    "e": "aggTrade",
+                    "E": now,
+                    "s": symbol,
+                    "a": _fill.trade_id,
+                    "p": str(_fill.price),
+                    "q": str(_fill.quantity),
+                    "f": _fill.trade_id,
+                    "l": _fill.trade_id,
+                    "T": now,
+                    "m": _fill.maker.side == "BUY",
+                },
+            )
+            for _order, _is_maker in ((_fill.maker, True), (_fill.taker, False)):
+                if _order.owner == ACCOUNT:
+                    _realized, _commission = self._account.apply_fill(
+                        symbol, _order.side, _fill.price, _fill.quantity, _is_maker
+                    )
+                    self._publish_order_update(
+                        _order, "TRADE", now, _fill, _is_maker, _realized, _commission
+                    )
+                    self._publish_account_update(symbol, now)
+
+    def _publish_order_update(
+        self, order: SimOrder, execution_type, now, fill: SimFill = None, is_maker=False, realized=0.0, commission=0.0
+    ):
+        self._publish_user(
+            {
+                "e": "ORDER_TRADE_UPDATE",
+                "E": now,
+                "T": now,
+                "o": {
+                    "s": order.symbol,
+                    "c": order.client_order_id,
+                    "S": order.side,
+                    "o": "LIMIT",
+                    "f": order.tif,
+                    "q": str(order.quantity),
+                    "p": str(order.price),
+                    "ap": str(fill.price if fill else 0),
+                    "sp": "0",
+                    "x": execution_type,
+                    "X": order.status,
+                    "i": order.order_id,
+                    "l": str(fill.quantity if fill else 0),
+                    "z": str(order.filled),
+                    "L": str(fill.price if fill else 0),
+                    "N": "USDT",
+                    "n": str(commission),
+                    "T": now,
+                    "t": fill.trade_id if fill else 0,
+                    "b": "0",
+                    "a": "0",
+                    "m": is_maker,
+                    "R": False,
+                    "wt": "CONTRACT_PRICE",
+                    "ot": "LIMIT",
+                    "ps": "BOTH",
+                    "cp": False,
+                    "rp": str(realized),
+                    "pP": False,
+                    "si": 0,
+                    "ss": 0,
+                },
+            }
+        )
+
+    def _publish_account_update(self, symbol, now):
+        _amount, _entry, _realized = self._account.positions[symbol]
+        _mark = self._mid[symbol]
+        self._publish_user(
+            {
+                "e": "ACCOUNT_UPDATE",
+                "E": now,
+                "T": now,
+                "a": {
+                    "m": "ORDER",
+                    "B": [
+                        {
+                            "a": "USDT",
+                            "wb": str(self._account.wallet_balance),
+                            "cw": str(self._account.wallet_balance),
+                            "bc": "0",
+                        }
+                    ],
+                    "P": [
+                        {
+                            "s": symbol,
+                            "pa": str(_amount),
+                            "ep": str(_entry),
+                            "bep": str(_entry),
+                            "cr": str(_realized),
+                            "up": str(_amount * (_mark - _entry)),
+                            "mt": "cross",
+                            "iw": "0",
+                            "ps": "BOTH",
+                        }
+                    ],
+                },
+            }
+        )
+
+    """
+        Order handling shared by the single and batch endpoints, returns (http status, body)
+    """
+
+    def _new_order(self, params: dict):
+        _symbol = params.get("symbol")
+        _engine = self._engines.get(_symbol)
+        if _engine is None:
+            return 400, INVALID_SYMBOL
+        _side = params["side"]
+        _type = params.get("type", "LIMIT")
+        if _type == "MARKET":
+            _price = math.inf if _side == "BUY" else 0.0
+            _tif = "IOC"
+        else:
+            _price = float(params["price"])
+            _tif = params.get("timeInForce", "GTC")
+        _client_order_id = params.get("newClientOrderId") or "sim{}".format(
+            next(self._client_order_ids)
+        )
+        _order = SimOrder(
+            _client_order_id, _symbol, _side, _price, float(params["quantity"]), _tif, ACCOUNT
+        )
+        _now = _now_ms()
+        _fills = _engine.submit(_order, _now)
+        if _fills is None:
+            self._publish_order_update(_order, "EXPIRED", _now)
+            return 400, POST_ONLY_REJECTED
+
+        _status = _order.status
+        _order.status = "NEW"
+        self._publish_order_update(_order, "NEW", _now)
+        _order.status = _status
+        self._on_fills(_symbol, _fills, _now)
+        if _order.status == "EXPIRED":
+            self._publish_order_update(_order, "EXPIRED", _now)
+        self._after_book_change(_symbol, _now)
+        return 200, self._order_response(_order, _now)
+
+    def _cancel_order(self, symbol, client_order_id=None, order_id=None):
+        _engine = self._engines.get(symbol)
+        if _engine is None:
+            return 400, INVALID_SYMBOL
+        if client_order_id is None and order_id is not None:
+            client_order_id = next(
+                (o.client_order_id for (owner, _), o in _engine._orders.items()
+                 if owner == ACCOUNT and o.order_id == int(order_id)),
+                None,
+            )
+        _now = _now_ms()
+        _order = _engine.cancel(ACCOUNT, client_order_id, _now)
+        if _order is None:
+            return 400, UNKNOWN_ORDER
+        self._publish_order_update(_order, "CANCELED", _now)
+        self._after_book_change(symbol, _now)
+        return 200, self._order_response(_order, _now)
+
+    @staticmethod
+    def _order_response(order: SimOrder, now) -> dict:
+        return {
+            "orderId": order.order_id,
+            "symbol": order.symbol,
+            "status": order.status,
+            "clientOrderId": order.client_order_id,
+            "price": str(order.price),
+            "avgPrice": "0",
+            "origQty": str(order.quantity),
+            "executedQty": str(order.filled),
+            "cumQuote": "0",
+            "timeInForce": order.tif,
+            "type": "LIMIT",
+            "reduceOnly": False,
+            "closePosition": False,
+            "side": order.side,
+            "positionSide": "BOTH",
+            "stopPrice": "0",
+            "workingType": "CONTRACT_PRICE",
+            "priceProtect": False,
+            "origType": "LIMIT",
+            "updateTime": now,
+        }
+
+    """
+        REST handlers
+    """
+
+    async def _params(self, request: web.Request) -> dict:
+        _params = dict(request.query)
+        if request.can_read_body:
+            _params.update(await request.post())
+        return _params
+
+    async def _respond(self, status, body):
+        # the request leg of the round trip has already been waited for
+        if self.rest_latency:
+            await asyncio.sleep(self.rest_latency / 2)
+        return web.json_response(body, status=status)
+
+    async def _request_leg(self):
+        if self.rest_latency:
+            await asyncio.sleep(self.rest_latency / 2)
+
+    async def _handle_ping(self, request):
+        return await self._respond(200, {})
+
+    async def _handle_time(self, request):
+        return await self._respond(200, {"serverTime": _now_ms()})
+
+    async def _handle_depth(self, request):
+        await self._request_leg()
+        _params = await self._params(request)
+        _engine = self._engines.get(_params.get("symbol"))
+        if _engine is None:
+            return await self._respond(400, INVALID_SYMBOL)
+        return await self._respond(200, _engine.snapshot(int(_params.get("limit", 500)), _now_ms()))
+
+    async def _handle_exchange_info(self, request):
+        await self._request_leg()
+        return await self._respond(
+            200,
+            {
+                "timezone": "UTC",
+                "serverTime": _now_ms(),
+                "symbols": [
+                    {
+                        "symbol": s,
+                        "status": "TRADING",
+                        "contractType": "PERPETUAL",
+                        "pricePrecision": self._price_decimals,
+                        "quantityPrecision": 3,
+                        "filters": [
+                            {
+                                "filterType": "PRICE_FILTER",
+                                "minPrice": str(self._tick_size),
+                                "maxPrice": "1000000",
+                                "tickSize": str(self._tick_size),
+                            },
+                            {
+                                "filterType": "LOT_SIZE",
+                                "minQty": str(self._step_size),
+                                "maxQty": "1000",
+                                "stepSize": str(self._step_size),
+                            },
+                            {"filterType": "MIN_NOTIONAL", "notional": "5"},
+                        ],
+                    }
+                    for s in self._symbols
+                ],
+            },
+        )
+
+    async def _handle_position_risk(self, request):
+        await self._request_leg()
+        _positions = []
+        for _symbol in self._symbols:
+            _amount, _entry, _ = self._account.positions.get(_symbol, (0.0, 0.0, 0.0))
+            _mark = self._mid[_symbol]
+            _positions.append(
+                {
+                    "symbol": _symbol,
+                    "positionAmt": str(_amount),
+                    "entryPrice": str(_entry),
+                    "markPrice": str(_mark),
+                    "unRealizedProfit": str(_amount * (_mark - _entry)),
+                    "positionSide": "BOTH",
+                    "updateTime": _now_ms(),
+                }
+            )
+        return await self._respond(200, _positions)
+
+    async def _handle_balance(self, request):
+        await self._request_leg()
+        _balance = str(self._account.wallet_balance)
+        return await self._respond(
+            200,
+            [
+                {
+                    "asset": "USDT",
+                    "balance": _balance,
+                    "crossWalletBalance": _balance,
+                    "availableBalance": _balance,
+                    "updateTime": _now_ms(),
+                }
+            ],
+        )
+
+    async def _handle_new_order(self, request):
+        await self._request_leg()
+        return await self._respond(*self._new_order(await self._params(request)))
+
+    async def _handle_cancel_order(self, request):
+        await self._request_leg()
+        _params = await self._params(request)
+        return await self._respond(
+            *self._cancel_order(
+                _params.get("symbol"),
+                _params.get("origClientOrderId"),
+                _params.get("orderId"),
+            )
+        )
+
+    async def _handle_batch_orders(self, request):
+        await self._request_leg()
+        _params = await self._params(request)
+        _results = []
+        for _order_params in json.loads(_params["batchOrders"]):
+            _status, _body = self._new_order(_order_params)
+            _results.append(_body)
+        return await self._respond(200, _results)
+
+    async def _handle_cancel_batch_orders(self, request):
+        await self._request_leg()
+        _params = await self._params(request)
+        _results = []
+        for _client_order_id in json.loads(_params["origClientOrderIdList"]):
+            _status, _body = self._cancel_order(_params.get("symbol"), _client_order_id)
+            _results.append(_body)
+        return await self._respond(200, _results)
+
+    async def _handle_new_listen_key(self, request):
+        await self._request_leg()
+        _listen_key = "simListenKey{}".format(len(self._listen_keys) + 1)
+        self._listen_keys.add(_listen_key)
+        return await self._respond(200, {"listenKey": _listen_key})
+
+    async def _handle_keepalive_listen_key(self, request):
+        await self._request_leg()
+        return await self._respond(200, {})
+
+    async def _handle_close_listen_key(self, request):
+        await self._request_leg()
+        _params = await self._params(request)
+        self._listen_keys.discard(_params.get("listenKey"))
+        return await self._respond(200, {})
+
+    """
+        Websocket handlers
+    """
+
+    async def _handle_raw_stream(self, request):
+        return await self._serve_streams(request, [request.match_info["stream"]], False)
+
+    async def _handle_combined_stream(self, request):
+        return await self._serve_streams(request, request.query["streams"].split("/"), True)
+
+    async def _serve_streams(self, request, streams, combined):
+        _ws = web.WebSocketResponse()
+        await _ws.prepare(request)
+        _connection = _StreamConnection(_ws, combined, self.ws_latency)
+        for _stream in streams:
+            self._subscribers.setdefault(_stream, set()).add(_connection)
+        try:
+            async for _message in _ws:
+                if _message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            for _stream in streams:
+                self._subscribers.get(_stream, set()).discard(_connection)
+            _connection.close()
+        return _ws
+
+
+if __name__ == "__main__":
+    simulator = BinanceFuturesSimulator(
+        ["BTCUSDT"], rest_latency=0.002, ws_latency=0.001, activity_rate=1000
+    )
+    asyncio.run(simulator.run_forever())
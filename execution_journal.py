@@ -0,0 +1,247 @@
+import logging
+import sqlite3
+import time
+
+from array import array
+from threading import Event, Lock, Thread
+
+from interface_order import OrderEvent, ExecutionType, OrderStatus, Side
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    recv_time REAL NOT NULL,
+    symbol TEXT NOT NULL,
+    order_id TEXT NOT NULL,
+    execution_type TEXT NOT NULL,
+    side TEXT NOT NULL,
+    status TEXT NOT NULL,
+    fill_price REAL NOT NULL,
+    fill_qty REAL NOT NULL,
+    exchange_time INTEGER
+);
+CREATE INDEX IF NOT EXISTS executions_order_id ON executions (order_id);
+CREATE INDEX IF NOT EXISTS executions_symbol_time ON executions (symbol, recv_time);
+"""
+
+_INSERT = (
+    "INSERT INTO executions (recv_time, symbol, order_id, execution_type, side, status, fill_price,"
+    " fill_qty, exchange_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+# One batch of journal rows, a column per field. Enums are kept as their values, strings as
+# references, so a row costs a few appends.
+class _Columns:
+    __slots__ = (
+        "recv_times",
+        "symbols",
+        "order_ids",
+        "execution_types",
+        "sides",
+        "statuses",
+        "fill_prices",
+        "fill_qtys",
+        "exchange_times",
+    )
+
+    def __init__(self):
+        self.recv_times = array("d")
+        self.symbols = []
+        self.order_ids = []
+        self.execution_types = array("b")
+        self.sides = array("b")
+        self.statuses = array("b")
+        self.fill_prices = array("d")
+        self.fill_qtys = array("d")
+        # exchange event time in ms, 0 when unknown
+        self.exchange_times = array("q")
+
+    def __len__(self):
+        return len(self.recv_times)
+
+    def rows(self):
+        return zip(
+            self.recv_times,
+            self.symbols,
+            self.order_ids,
+            (ExecutionType(v).name for v in self.execution_types),
+            (Side(v).name for v in self.sides),
+            (OrderStatus(v).name for v in self.statuses),
+            self.fill_prices,
+            self.fill_qtys,
+            (t or None for t in self.exchange_times),
+        )
+
+
+# Append-only journal of order events and fills, registered as an execution callback:
+#     journal = ExecutionJournal("executions.db")
+#     gateway.register_execution_callback(journal.record)
+# record() appends the event to in-memory columns, and a background thread writes them to SQLite in
+# one transaction every flush_interval seconds, or sooner once flush_size rows are waiting.
+# Rows are keyed by client order id and carry the local receive time, the exchange time of the event
+# when the gateway knows it and, for fills, the last fill price and quantity. Query the file with
+# JournalQuery.
+class ExecutionJournal:
+    def __init__(self, path: str, flush_interval=1.0, flush_size=10000):
+        self._path = path
+        self._flush_interval = flush_interval
+        self._flush_size = flush_size
+        self._columns = _Columns()
+        # swapping the columns and appending a row exclude each other, nothing else is locked
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._running = True
+        self.recorded = 0
+        self.flushed = 0
+        # the connection belongs to the writer thread, create the schema before anything is recorded
+        _connection = sqlite3.connect(path)
+        _connection.executescript(_SCHEMA)
+        _connection.close()
+        self._thread = Thread(target=self._run, daemon=True, name="journal")
+        self._thread.start()
+
+    # execution callback
+    def record(self, order_event: OrderEvent):
+        _recv_time = time.time()
+        _fill = order_event.execution_type == ExecutionType.TRADE
+        with self._lock:
+            _c = self._columns
+            _c.recv_times.append(_recv_time)
+            _c.symbols.append(order_event.contract_name)
+            _c.order_ids.append(order_event.order_id)
+            _c.execution_types.append(order_event.execution_type.value)
+            _c.sides.append(order_event.side.value)
+            _c.statuses.append(order_event.status.value)
+            _c.fill_prices.append(order_event.last_filled_price if _fill else 0.0)
+            _c.fill_qtys.append(order_event.last_filled_quantity if _fill else 0.0)
+            _c.exchange_times.append(order_event.event_time or order_event.fill_time or 0)
+            _pending = len(_c)
+        self.recorded += 1
+        if _pending >= self._flush_size:
+            self._wakeup.set()
+
+    # ask the writer thread to write what is recorded so far, and wait for it if timeout is given
+    def flush(self, timeout=None):
+        _target = self.recorded
+        self._wakeup.set()
+        if timeout is not None:
+            _deadline = time.monotonic() + timeout
+            while self.flushed < _target and time.monotonic() < _deadline:
+                time.sleep(0.001)
+
+    def close(self):
+        self._running = False
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+
+    def _run(self):
+        _connection = sqlite3.connect(self._path)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            while self._running:
+                self._wakeup.wait(self._flush_interval)
+                self._wakeup.clear()
+                self._write(_connection)
+            self._write(_connection)
+        finally:
+            _connection.close()
+
+    def _write(self, connection):
+        with self._lock:
+            if not len(self._columns):
+                return
+            _columns, self._columns = self._columns, _Columns()
+        try:
+            with connection:
+                connection.executemany(_INSERT, _columns.rows())
+            self.flushed += len(_columns)
+        except Exception as e:
+            logging.info(f"[Error] Execution journal write error, {len(_columns)} rows lost: {e}..")
+
+
+# Fill analytics over a journal file
+class JournalQuery:
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path)
+
+    def close(self):
+        self._connection.close()
+
+    @staticmethod
+    def _filter(symbol, start, end, execution_type=ExecutionType.TRADE) -> (str, list):
+        _clauses = ["execution_type = ?"]
+        _args = [execution_type.name]
+        if symbol:
+            _clauses.append("symbol = ?")
+            _args.append(symbol)
+        if start is not None:
+            _clauses.append("recv_time >= ?")
+            _args.append(start)
+        if end is not None:
+            _clauses.append("recv_time < ?")
+            _args.append(end)
+        return " AND ".join(_clauses), _args
+
+    # every event of an order, oldest first
+    def order_history(self, order_id: str) -> list:
+        return self._connection.execute(
+            "SELECT * FROM executions WHERE order_id = ? ORDER BY recv_time", (order_id,)
+        ).fetchall()
+
+    # fills as (recv_time, exchange_time, symbol, order_id, side, fill_price, fill_qty), oldest first
+    def fills(self, symbol=None, start=None, end=None) -> list:
+        _where, _args = self._filter(symbol, start, end)
+        return self._connection.execute(
+            "SELECT recv_time, exchange_time, symbol, order_id, side, fill_price, fill_qty"
+            f" FROM executions WHERE {_where} ORDER BY recv_time",
+            _args,
+        ).fetchall()
+
+    # per symbol and side: fill count, filled orders, quantity, notional and average price
+    def fill_summary(self, symbol=None, start=None, end=None) -> dict:
+        _where, _args = self._filter(symbol, start, end)
+        _summary = {}
+        for (_symbol, _side, _fills, _orders, _quantity, _notional) in self._connection.execute(
+            "SELECT symbol, side, COUNT(*), COUNT(DISTINCT order_id), SUM(fill_qty),"
+            f" SUM(fill_price * fill_qty) FROM executions WHERE {_where} GROUP BY symbol, side",
+            _args,
+        ):
+            _summary.setdefault(_symbol, {})[_side] = {
+                "fills": _fills,
+                "orders": _orders,
+                "quantity": _quantity,
+                "notional": _notional,
+                "avg_price": _notional / _quantity if _quantity else 0.0,
+            }
+        return _summary
+
+    # share of the orders acknowledged by the exchange with at least one fill, per symbol
+    def fill_ratio(self, symbol=None, start=None, end=None) -> dict:
+        _filled = dict(self._count_orders(self._filter(symbol, start, end)))
+        _acked = self._count_orders(self._filter(symbol, start, end, ExecutionType.NEW))
+        return {s: _filled.get(s, 0) / n for (s, n) in _acked if n}
+
+    def _count_orders(self, condition) -> list:
+        _where, _args = condition
+        return self._connection.execute(
+            f"SELECT symbol, COUNT(DISTINCT order_id) FROM executions WHERE {_where} GROUP BY symbol",
+            _args,
+        ).fetchall()
+
+
+# Print the fill summary of a journal file
+if __name__ == "__main__":
+    import sys
+
+    query = JournalQuery(sys.argv[1])
+    for (_symbol, _sides) in query.fill_summary(sys.argv[2] if len(sys.argv) > 2 else None).items():
+        for (_side, _stats) in _sides.items():
+            print(_symbol, _side, _stats)
+    print("fill ratio", query.fill_ratio())
+    query.close()
@@ -1,5 +1,11 @@
+from array import array
+from typing import NamedTuple
+
+
 # A price tier in the order book
 class PriceLevel:
+    __slots__ = ("price", "size", "quote_id")
+
     def __init__(self, price: float, size: float, quote_id: str = None):
         self.price = price
         self.size = size
@@ -9,13 +15,111 @@ class PriceLevel:
         return '[' + str(self.price) + " | " + str(self.size) + ']'
 
 
+# Read-only view over one side of an OrderBook, indexable and sliceable like a list of PriceLevel
+class BookSideView:
+    __slots__ = ("_prices", "_sizes", "_book", "_is_bid")
+
+    def __init__(self, book, prices: array, sizes: array, is_bid: bool):
+        self._book = book
+        self._prices = prices
+        self._sizes = sizes
+        self._is_bid = is_bid
+
+    def __len__(self):
+        return self._book.bid_depth if self._is_bid else self._book.ask_depth
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        _depth = len(self)
+        if index < 0:
+            index += _depth
+        if not 0 <= index < _depth:
+            raise IndexError("book level out of range")
+        return PriceLevel(self._prices[index], self._sizes[index])
+
+    def __iter__(self):
+        for _i in range(len(self)):
+            yield PriceLevel(self._prices[_i], self._sizes[_i])
+
+    # zero copy read-only views of the populated levels, best first
+    def prices(self) -> memoryview:
+        return memoryview(self._prices).toreadonly()[:len(self)]
+
+    def sizes(self) -> memoryview:
+        return memoryview(self._sizes).toreadonly()[:len(self)]
+
+
 # An order book with bid and ask sides
+# Levels live in preallocated float arrays, best first, that are overwritten in place on every update.
+# bid_prices/bid_sizes/ask_prices/ask_sizes are the writable buffers, bids/asks are read-only views.
 class OrderBook:
-    def __init__(self, timestamp: float, contract_name: str, bids: [PriceLevel], asks: [PriceLevel]):
+    __slots__ = (
+        "contract_name",
+        "timestamp",
+        "bid_prices",
+        "bid_sizes",
+        "ask_prices",
+        "ask_sizes",
+        "bid_depth",
+        "ask_depth",
+        "bids",
+        "asks",
+    )
+
+    def __init__(self, timestamp: float, contract_name: str, bids: [PriceLevel], asks: [PriceLevel], depth: int = 0):
         self.contract_name = contract_name
         self.timestamp = timestamp
-        self.bids = bids
-        self.asks = asks
+        _capacity = max(depth, len(bids), len(asks))
+        self.bid_prices = array('d', bytes(8 * _capacity))
+        self.bid_sizes = array('d', bytes(8 * _capacity))
+        self.ask_prices = array('d', bytes(8 * _capacity))
+        self.ask_sizes = array('d', bytes(8 * _capacity))
+        self.bid_depth = 0
+        self.ask_depth = 0
+        self.bids = BookSideView(self, self.bid_prices, self.bid_sizes, True)
+        self.asks = BookSideView(self, self.ask_prices, self.ask_sizes, False)
+        self.update(timestamp, [(l.price, l.size) for l in bids], [(l.price, l.size) for l in asks])
+
+    # an empty book able to hold depth levels per side
+    @classmethod
+    def with_depth(cls, contract_name: str, depth: int):
+        return cls(None, contract_name, [], [], depth)
+
+    def capacity(self) -> int:
+        return len(self.bid_prices)
+
+    # overwrite the book in place from best first (price, size) pairs, extra levels are ignored
+    def update(self, timestamp, bids, asks):
+        self.timestamp = timestamp
+        _capacity = len(self.bid_prices)
+        _i = 0
+        for (p, s) in bids:
+            if _i == _capacity:
+                break
+            self.bid_prices[_i] = p
+            self.bid_sizes[_i] = s
+            _i += 1
+        self.bid_depth = _i
+        _i = 0
+        for (p, s) in asks:
+            if _i == _capacity:
+                break
+            self.ask_prices[_i] = p
+            self.ask_sizes[_i] = s
+            _i += 1
+        self.ask_depth = _i
+
+    # copy another book of the same capacity into this one's buffers
+    def copy_from(self, other):
+        self.contract_name = other.contract_name
+        self.timestamp = other.timestamp
+        self.bid_prices[:] = other.bid_prices
+        self.bid_sizes[:] = other.bid_sizes
+        self.ask_prices[:] = other.ask_prices
+        self.ask_sizes[:] = other.ask_sizes
+        self.bid_depth = other.bid_depth
+        self.ask_depth = other.ask_depth
 
     def __str__(self):
         string = ' Bids:'
@@ -29,14 +133,20 @@ class OrderBook:
         return string
 
     def get_best_bid(self):
-        return self.bids[0].price
+        if not self.bid_depth:
+            raise IndexError("empty bid side")
+        return self.bid_prices[0]
 
     def get_best_ask(self):
-        return self.asks[0].price
+        if not self.ask_depth:
+            raise IndexError("empty ask side")
+        return self.ask_prices[0]
 
 
 # A venue order book telling us the exchange that provides the order book
 class VenueOrderBook:
+    __slots__ = ("exchange_name", "book")
+
     def __init__(self, exchange_name: str, book: OrderBook):
         self.exchange_name = exchange_name
         self.book = book
@@ -44,5 +154,30 @@ class VenueOrderBook:
     def get_book(self):
         return self.book
 
+    def copy_from(self, other):
+        self.exchange_name = other.exchange_name
+        self.book.copy_from(other.book)
+
     def __str__(self):
         return '{}={}'.format(self.exchange_name, self.book)
+
+
+# Best bid and offer of a symbol from the bookTicker stream, for strategies that only need the top
+# of the book. Quacks like VenueOrderBook and OrderBook for get_book().get_best_bid()/get_best_ask().
+class BestBidOffer(NamedTuple):
+    symbol: str
+    update_id: int
+    event_time: int
+    bid_price: float
+    bid_size: float
+    ask_price: float
+    ask_size: float
+
+    def get_book(self):
+        return self
+
+    def get_best_bid(self):
+        return self.bid_price
+
+    def get_best_ask(self):
+        return self.ask_price
@@ -1 +1,244 @@
-from enum import Enum# Side of an order or tradeclass Side(Enum):    BUY = 0    SELL = 1# Order type indicates execution strategyclass OrderType(Enum):    Limit = 0    Market = 1    StopLimit = 2    StopMarket = 3    PostOnly = 4# Time in force indicates how long an order will remain active before it is executed or expired.class TimeInForce(Enum):    IOC = 1    GTC = 2# New order request# Note: post_only = True means the order will only make liquidity not take; False means it can make or take.class NewOrderSingle:    def __init__(        self,        symbol: str,        side: Side,        quantity: float,        order_type: OrderType,        price: float = None,        post_only=False,    ):        self.symbol = symbol        self.side = side        self.price = price        self.quantity = quantity        self.type = order_type        self.post_only = post_only    def __str__(self):        return (            "symbol="            + self.symbol            + ", side="            + str(self.side)            + ", price="            + str(self.price)            + ", quantity="            + str(self.quantity)            + ", type="            + str(self.type)            + ", post_only="            + str(self.post_only)        )# Execution Typeclass ExecutionType(Enum):    NEW = 0    CANCELED = 1    CALCULATED = 2    EXPIRED = 3    TRADE = 4# Order statusclass OrderStatus(Enum):    PENDING_NEW = 0  # sent to exchange but has not received any status    NEW = 1  # order accepted by exchange but not processed yet by the matching engine    OPEN = 2  # order accepted by exchange and is active on order book    CANCELED = 3  # order is cancelled    PARTIALLY_FILLED = 4  # order is partially filled    FILLED = 5  # order is fully filled and closed (i.e. not expecting any more fills)    PENDING_CANCEL = 6  # cancellation sent to exchange but has not received any status    FAILED = 7  # order failed# An executing orderclass Order:    def __init__(        self,        order_id: str,        side: Side,        leaves_qty: float,        symbol: str,        timestamp: float,        order_type: OrderType,        price: float = None,        order_status: OrderStatus = OrderStatus.NEW,    ):        self.order_id = order_id        self.side = side        self.leaves_qty = leaves_qty        self.symbol = symbol        self.timestamp = timestamp        self.price = price        self.type = order_type        self.order_status = order_status    def __str__(self):        return (            "OrderID="            + str(self.order_id)            + ", Symbol="            + self.symbol            + ", Side="            + str(self.side)            + ", Price="            + str(self.price)            + ", LeavesQty="            + str(self.leaves_qty)            + ", Timestamp="            + str(self.timestamp)            + ", Type="            + str(self.type)            + ", Status"            + self.order_status.name        )# Instrument trading rulesclass InstrumentDetails:    def __init__(self, contract_name, tick_size, quantity_size=0):        self.contract_name = contract_name        self.tick_size = tick_size        self.quantity_size = quantity_size    def __str__(self):        return (            "Symbol="            + self.contract_name            + ", Tick Size="            + str(self.tick_size)            + ", Quantity Size="            + str(self.quantity_size)        )# Order eventclass OrderEvent:    def __init__(        self,        contract_name: str,        order_id: str,        execution_type: ExecutionType,        side: Side,        status: OrderStatus,        canceled_reason=None,        client_id=None,    ):        self.contract_name = contract_name        self.order_id = order_id        self.client_id = client_id        self.execution_type = execution_type        self.side = side        self.status = status        self.canceled_reason = canceled_reason        # the following fields will be populated if matched        self.fill_time = None        self.fill_price = None        self.fill_quantity = None        self.fill_id = None        self.fill_type = None        self.last_filled_quantity = 0        self.last_filled_price = 0    def __str__(self):        return "Order events [contract={}, order_id={}, status={}, canceled_reason={}]".format(            self.contract_name, self.order_id, self.status, self.canceled_reason        )    def __repr__(self):        return str(self)# A trade is an execution/fill by an exchangeclass Trade:    def __init__(        self,        received_time: float,        contract_name: str,        price: float,        size: float,        side: Side,        liquidation: False,    ):        self.received_time = received_time        self.contract_name = contract_name        self.price = price        self.size = size        self.side = side        self.liquidation = liquidation    def is_buy(self):        return self.side == Side.BUY
\ No newline at end of file
+from array import array
+from enum import Enum
+
+
+# Side of an order or trade
+class Side(Enum):
+    BUY = 0
+    SELL = 1
+
+
+# Order type indicates execution strategy
+class OrderType(Enum):
+    Limit = 0
+    Market = 1
+    StopLimit = 2
+    StopMarket = 3
+    PostOnly = 4
+
+
+# Time in force indicates how long an order will remain active before it is executed or expired.
+class TimeInForce(Enum):
+    IOC = 1
+    GTC = 2
+
+
+# New order request
+# Note: post_only = True means the order will only make liquidity not take; False means it can make or take.
+class NewOrderSingle:
+    def __init__(
+        self,
+        symbol: str,
+        side: Side,
+        quantity: float,
+        order_type: OrderType,
+        price: float = None,
+        post_only=False,
+        client_order_id: str = None,
+    ):
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.type = order_type
+        self.post_only = post_only
+        # assigned by the gateway when not set
+        self.client_order_id = client_order_id
+
+    def __str__(self):
+        return (
+            "symbol="
+            + self.symbol
+            + ", side="
+            + str(self.side)
+            + ", price="
+            + str(self.price)
+            + ", quantity="
+            + str(self.quantity)
+            + ", type="
+            + str(self.type)
+            + ", post_only="
+            + str(self.post_only)
+        )
+
+
+# Execution Type
+class ExecutionType(Enum):
+    NEW = 0
+    CANCELED = 1
+    CALCULATED = 2
+    EXPIRED = 3
+    TRADE = 4
+
+
+# Order status
+class OrderStatus(Enum):
+    PENDING_NEW = 0  # sent to exchange but has not received any status
+    NEW = 1  # order accepted by exchange but not processed yet by the matching engine
+    OPEN = 2  # order accepted by exchange and is active on order book
+    CANCELED = 3  # order is cancelled
+    PARTIALLY_FILLED = 4  # order is partially filled
+    FILLED = 5  # order is fully filled and closed (i.e. not expecting any more fills)
+    PENDING_CANCEL = 6  # cancellation sent to exchange but has not received any status
+    FAILED = 7  # order failed
+
+
+# An executing order
+class Order:
+    def __init__(
+        self,
+        order_id: str,
+        side: Side,
+        leaves_qty: float,
+        symbol: str,
+        timestamp: float,
+        order_type: OrderType,
+        price: float = None,
+        order_status: OrderStatus = OrderStatus.NEW,
+    ):
+        self.order_id = order_id
+        self.side = side
+        self.leaves_qty = leaves_qty
+        self.symbol = symbol
+        self.timestamp = timestamp
+        self.price = price
+        self.type = order_type
+        self.order_status = order_status
+
+    def __str__(self):
+        return (
+            "OrderID="
+            + str(self.order_id)
+            + ", Symbol="
+            + self.symbol
+            + ", Side="
+            + str(self.side)
+            + ", Price="
+            + str(self.price)
+            + ", LeavesQty="
+            + str(self.leaves_qty)
+            + ", Timestamp="
+            + str(self.timestamp)
+            + ", Type="
+            + str(self.type)
+            + ", Status"
+            + self.order_status.name
+        )
+
+
+# Instrument trading rules
+class InstrumentDetails:
+    def __init__(self, contract_name, tick_size, quantity_size=0, min_quantity=0, min_notional=0):
+        self.contract_name = contract_name
+        self.tick_size = tick_size
+        self.quantity_size = quantity_size
+        self.min_quantity = min_quantity
+        self.min_notional = min_notional
+
+    def __str__(self):
+        return (
+            "Symbol="
+            + self.contract_name
+            + ", Tick Size="
+            + str(self.tick_size)
+            + ", Quantity Size="
+            + str(self.quantity_size)
+        )
+
+
+# Order event
+class OrderEvent:
+    def __init__(
+        self,
+        contract_name: str,
+        order_id: str,
+        execution_type: ExecutionType,
+        side: Side,
+        status: OrderStatus,
+        canceled_reason=None,
+        client_id=None,
+    ):
+        self.contract_name = contract_name
+        self.order_id = order_id
+        self.client_id = client_id
+        self.execution_type = execution_type
+        self.side = side
+        self.status = status
+        self.canceled_reason = canceled_reason
+        # exchange time of the event in ms, when known
+        self.event_time = None
+
+        # the following fields will be populated if matched
+        self.fill_time = None
+        self.fill_price = None
+        self.fill_quantity = None
+        self.fill_id = None
+        self.fill_type = None
+        self.last_filled_quantity = 0
+        self.last_filled_price = 0
+
+    def __str__(self):
+        return "Order events [contract={}, order_id={}, status={}, canceled_reason={}]".format(
+            self.contract_name, self.order_id, self.status, self.canceled_reason
+        )
+
+    def __repr__(self):
+        return str(self)
+
+
+# A trade is an execution/fill by an exchange
+class Trade:
+    def __init__(
+        self,
+        received_time: float,
+        contract_name: str,
+        price: float,
+        size: float,
+        side: Side,
+        liquidation: False,
+    ):
+        self.received_time = received_time
+        self.contract_name = contract_name
+        self.price = price
+        self.size = size
+        self.side = side
+        self.liquidation = liquidation
+
+    def is_buy(self):
+        return self.side == Side.BUY
+
+
+# Trades of one symbol received in one burst, one array per field, so heavy trade flow
+# is handed over in a single call. The arrays are reused for the next batch, copy them to keep them.
+class TradeBatch:
+    def __init__(self, contract_name: str):
+        self.contract_name = contract_name
+        self.received_time = 0.0
+        # exchange trade times in ms
+        self.trade_times = array("q")
+        self.prices = array("d")
+        self.sizes = array("d")
+        # 1 if the aggressor bought
+        self.is_buy = array("b")
+
+    def __len__(self):
+        return len(self.prices)
+
+    def append(self, trade_time: int, price: float, size: float, is_buy: bool):
+        self.trade_times.append(trade_time)
+        self.prices.append(price)
+        self.sizes.append(size)
+        self.is_buy.append(is_buy)
+
+    def clear(self):
+        del self.trade_times[:]
+        del self.prices[:]
+        del self.sizes[:]
+        del self.is_buy[:]
+
+    # the batch as Trade objects
+    def trades(self) -> [Trade]:
+        return [
+            Trade(self.received_time, self.contract_name, p, s, Side.BUY if b else Side.SELL, False)
+            for (p, s, b) in zip(self.prices, self.sizes, self.is_buy)
+        ]
@@ -0,0 +1,114 @@
+from array import array
+
+
+# HDR style log-linear histogram of non-negative integer latencies (nanoseconds).
+# Values are bucketed by power of two and then linearly into 2^sub_bucket_bits sub buckets,
+# so recording is a couple of shifts and an array increment, with a relative error of at most
+# 2^(1 - sub_bucket_bits) (about 3% by default) over the whole range up to 2^max_bits ns.
+class LatencyHistogram:
+    def __init__(self, sub_bucket_bits: int = 6, max_bits: int = 44):
+        self._sub_bits = sub_bucket_bits
+        self._sub_mask = (1 << sub_bucket_bits) - 1
+        self._max_value = (1 << max_bits) - 1
+        self._counts = array('Q', bytes(8 * ((max_bits - sub_bucket_bits + 2) << sub_bucket_bits)))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        elif value > self._max_value:
+            value = self._max_value
+        _exp = value.bit_length() - self._sub_bits
+        if _exp < 0:
+            _exp = 0
+        self._counts[(_exp << self._sub_bits) + (value >> _exp)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    # highest value represented by a bucket
+    def _bucket_value(self, index: int) -> int:
+        _exp = index >> self._sub_bits
+        return (((index & self._sub_mask) + 1) << _exp) - 1
+
+    def percentile(self, percentile: float) -> int:
+        if not self.count:
+            return 0
+        _target = max(1, int(self.count * percentile / 100.0 + 0.5))
+        _seen = 0
+        for _index, _count in enumerate(self._counts):
+            if _count:
+                _seen += _count
+                if _seen >= _target:
+                    return min(self._bucket_value(_index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self):
+        for _i in range(len(self._counts)):
+            self._counts[_i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+
+# Latency histograms per symbol and per stage of the tick-to-trade path.
+# Stages are free-form names, e.g. feed, book, callback, tick_to_send, send_to_response, send_to_ack.
+class LatencyTracker:
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        self._histograms = {}
+
+    def record(self, symbol: str, stage: str, latency_ns: int):
+        _histogram = self._histograms.get((symbol, stage))
+        if _histogram is None:
+            _histogram = LatencyHistogram()
+            self._histograms[(symbol, stage)] = _histogram
+        _histogram.record(latency_ns)
+
+    def histogram(self, symbol: str, stage: str) -> LatencyHistogram:
+        return self._histograms.get((symbol, stage))
+
+    def reset(self):
+        for _histogram in self._histograms.values():
+            _histogram.reset()
+
+    # {symbol: {stage: {count, mean, min, p50, .., max}}} in microseconds
+    def percentiles(self, percentiles=PERCENTILES) -> dict:
+        _result = {}
+        for (_symbol, _stage), _histogram in sorted(self._histograms.items()):
+            if not _histogram.count:
+                continue
+            _stats = {
+                "count": _histogram.count,
+                "mean": _histogram.mean() / 1e3,
+                "min": _histogram.min / 1e3,
+            }
+            for _p in percentiles:
+                _stats["p{:g}".format(_p)] = _histogram.percentile(_p) / 1e3
+            _stats["max"] = _histogram.max / 1e3
+            _result.setdefault(_symbol, {})[_stage] = _stats
+        return _result
+
+    # percentiles as a text table, one row per symbol and stage
+    def dump(self, percentiles=PERCENTILES) -> str:
+        _columns = ["count", "mean", "min"] + ["p{:g}".format(p) for p in percentiles] + ["max"]
+        _lines = ["{:<12} {:<18}".format("symbol", "stage (us)") + "".join("{:>12}".format(c) for c in _columns)]
+        for _symbol, _stages in self.percentiles(percentiles).items():
+            for _stage, _stats in _stages.items():
+                _lines.append(
+                    "{:<12} {:<18}".format(_symbol, _stage)
+                    + "{:>12}".format(_stats["count"])
+                    + "".join("{:>12.1f}".format(_stats[c]) for c in _columns[1:])
+                )
+        return "\n".join(_lines)
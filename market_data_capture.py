@@ -0,0 +1,142 @@
+import json
+import mmap
+import os
+import struct
+import time
+
+# orjson is optional, it encodes messages several times faster than the json module
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+except ImportError:
+    orjson = None
+
+    def _dumps(message) -> bytes:
+        return json.dumps(message, separators=(",", ":")).encode()
+
+
+# record channels
+CHANNEL_DEPTH = 0  # depthUpdate payloads
+CHANNEL_USER = 1  # user data stream payloads
+CHANNEL_SNAPSHOT = 2  # REST depth snapshots, with the symbol added as "s"
+CHANNEL_TRADE = 3  # aggTrade payloads
+CHANNEL_MARK_PRICE = 4  # markPriceUpdate payloads
+CHANNEL_BOOK_TICKER = 5  # bookTicker payloads
+
+FILE_MAGIC = b"BNCAP001"
+# record header: receive time (ns since epoch), channel, payload length, followed by the JSON payload
+RECORD_HEADER = struct.Struct("<qBI")
+
+
+# Append-only binary log of stream messages with their receive time.
+# python-binance hands out parsed messages only, so write() re-encodes them; frames are not the exact
+# bytes received. Pass recv_ns, taken when the frame arrived, to record the true receive time.
+# Files are named <prefix>-<start time>-<sequence>.bin and rotated once they exceed max_bytes,
+# so a directory read in name order is the capture in time order.
+class CaptureWriter:
+    def __init__(self, directory: str, prefix="capture", max_bytes=256 * 1024 * 1024, buffer_size=1 << 20):
+        self._directory = directory
+        self._prefix = prefix
+        self._max_bytes = max_bytes
+        self._buffer_size = buffer_size
+        self._file = None
+        self._size = 0
+        self._sequence = 0
+        self.paths = []
+        self.records = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, channel: int, message, recv_ns: int = None):
+        self.write_frame(channel, _dumps(message), recv_ns or time.time_ns())
+
+    def write_frame(self, channel: int, frame: bytes, recv_ns: int):
+        if self._file is None or self._size >= self._max_bytes:
+            self._rotate()
+        self._file.write(RECORD_HEADER.pack(recv_ns, channel, len(frame)))
+        self._file.write(frame)
+        self._size += RECORD_HEADER.size + len(frame)
+        self.records += 1
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        self._sequence += 1
+        _path = os.path.join(
+            self._directory,
+            "{}-{}-{:04d}.bin".format(self._prefix, time.strftime("%Y%m%d-%H%M%S"), self._sequence),
+        )
+        self._file = open(_path, "wb", buffering=self._buffer_size)
+        self._file.write(FILE_MAGIC)
+        self._size = len(FILE_MAGIC)
+        self.paths.append(_path)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Iterates (recv_ns, channel, frame) records of capture files, or of every capture file of a
+# directory in name order. Files are memory mapped, a truncated last record is ignored.
+class CaptureReader:
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            if os.path.isdir(paths):
+                paths = [
+                    os.path.join(paths, f) for f in sorted(os.listdir(paths)) if f.endswith(".bin")
+                ]
+            else:
+                paths = [paths]
+        self.paths = list(paths)
+
+    def __iter__(self):
+        _unpack = RECORD_HEADER.unpack_from
+        _header_size = RECORD_HEADER.size
+        for _path in self.paths:
+            with open(_path, "rb") as _file:
+                if os.fstat(_file.fileno()).st_size <= len(FILE_MAGIC):
+                    continue
+                with mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ) as _data:
+                    if _data[: len(FILE_MAGIC)] != FILE_MAGIC:
+                        raise ValueError(f"{_path} is not a capture file")
+                    _end = len(_data)
+                    _offset = len(FILE_MAGIC)
+                    while _offset + _header_size <= _end:
+                        _recv_ns, _channel, _length = _unpack(_data, _offset)
+                        _offset += _header_size
+                        if _offset + _length > _end:
+                            break
+                        yield _recv_ns, _channel, _data[_offset: _offset + _length]
+                        _offset += _length
+
+
+# Replays a capture directory through a gateway as fast as possible and reports the message rate
+if __name__ == "__main__":
+    import sys
+
+    from binance_gateway import BinanceFutureGateway
+
+    _reader = CaptureReader(sys.argv[1])
+    _symbols = sorted(
+        {
+            json.loads(f)["s"]
+            for (_, c, f) in _reader
+            if c in (CHANNEL_DEPTH, CHANNEL_SNAPSHOT)
+        }
+    )
+    _gateway = BinanceFutureGateway(_symbols, trace_latency=False)
+    for _symbol in _symbols:
+        _gateway.register_depth_callback(lambda book: None, _symbol)
+    _start = time.perf_counter()
+    _count = _gateway.replay(_reader)
+    _elapsed = time.perf_counter() - _start
+    print(
+        "replayed {:,} messages in {:.2f}s, {:,.0f} messages/minute".format(
+            _count, _elapsed, _count / _elapsed * 60
+        )
+    )
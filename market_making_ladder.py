@@ -0,0 +1,115 @@
+import os
+import time
+from dotenv import load_dotenv
+from interface_book import VenueOrderBook
+from interface_order import Order, OrderEvent, OrderStatus, Side
+from binance_gateway import BinanceFutureGateway
+from order_manager import OrderManager
+import logging
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+
+# Laddered pricing strategy: `levels` post only orders per side, `spacing` apart from the best
+# bid and ask outwards. On every book update the target ladder is diffed against the live orders
+# by price: orders no longer on a target level are cancelled and only the missing levels are sent,
+# both through the batch endpoints. A one tick move of the book with a one tick spacing costs one
+# cancel and one new order per side whatever the ladder depth. Filled levels come back on the next
+# update. spacing should be a multiple of the tick size so prices match the ones on the exchange.
+class LadderStrategy:
+    def __init__(
+        self,
+        symbol: str,
+        order_size,
+        levels,
+        spacing,
+        binance_gateway: BinanceFutureGateway,
+        order_manager: OrderManager = None,
+    ):
+        self._symbol = symbol
+        self._order_size = order_size
+        self._levels = levels
+        self._spacing = spacing
+        self._binance_gateway = binance_gateway
+        # order state is kept locally from the moment a request is sent, see OrderManager
+        self._order_manager = order_manager or OrderManager(binance_gateway, symbol)
+        self.stats = {"updates": 0, "orders_sent": 0, "cancels_sent": 0}
+
+    def start(self):
+        logging.info(f"Start ladder strategy for {self._symbol}, {self._levels} levels per side..")
+
+    # callback on order book update
+    def on_orderbook(self, order_book: VenueOrderBook):
+        _book = order_book.get_book()
+        if not _book.bid_depth or not _book.ask_depth:
+            return
+        _best_bid = _book.get_best_bid()
+        _best_ask = _book.get_best_ask()
+        self.stats["updates"] += 1
+        _cancels = []
+        _quotes = []
+        for (_side, _best, _direction) in ((Side.BUY, _best_bid, -1), (Side.SELL, _best_ask, 1)):
+            _targets = self._target_prices(_best, _direction)
+            self._diff(_side, _targets, _cancels, _quotes)
+
+        # cancels first, they release the levels the new orders may be replacing
+        if _cancels:
+            self.stats["cancels_sent"] += self._order_manager.cancel_orders(_cancels)
+        if _quotes:
+            self._order_manager.send_limit_orders(self._symbol, _quotes, "GTX", self.on_execution)
+            self.stats["orders_sent"] += len(_quotes)
+
+    # ladder prices from the best price outwards, rounded so they compare equal across updates
+    def _target_prices(self, best, direction) -> set:
+        return {round(best + direction * i * self._spacing, 8) for i in range(self._levels)}
+
+    # orders off the target prices to cancel, and target prices without an order to quote
+    def _diff(self, side: Side, targets: set, cancels: list, quotes: list):
+        _quoted = set()
+        for (_client_order_id, _order) in self._order_manager.live_orders(self._symbol, side).items():
+            if _order.order_status == OrderStatus.PENDING_CANCEL:
+                continue
+            if _order.price in targets and _order.price not in _quoted:
+                _quoted.add(_order.price)
+            else:
+                cancels.append(_client_order_id)
+        for _price in targets - _quoted:
+            quotes.append((side, _price, self._order_size))
+
+    # callback on execution update of one of our orders, routed by the order manager
+    def on_execution(self, order: Order, order_event: OrderEvent):
+        logging.info("Receive execution: {}".format(order_event))
+
+
+if __name__ == "__main__":
+    # get api key and secret
+    dotenv_path = r"Z:\vault\.my_secret"
+    load_dotenv(dotenv_path=dotenv_path)
+    api_key = os.getenv("BINANCE_KEY")
+    api_secret = os.getenv("BINANCE_SECRET")
+
+    # strategy parameters
+    symbol = "BTCUSDT"
+    order_size = 0.01
+    levels = 5
+    spacing = 0.1
+
+    # create a binance gateway object
+    binance_gateway = BinanceFutureGateway(symbol, api_key, api_secret)
+
+    # create a strategy a register callbacks with gateway, executions come through its order manager
+    strategy = LadderStrategy(symbol, order_size, levels, spacing, binance_gateway)
+    binance_gateway.register_depth_callback(strategy.on_orderbook)
+
+    # start
+    binance_gateway.connect()
+    strategy.start()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        binance_gateway.stop()
@@ -1,8 +1,10 @@
 import os
+import time
 from dotenv import load_dotenv
 from interface_book import OrderBook, VenueOrderBook
-from interface_order import OrderEvent, Side, OrderStatus
+from interface_order import Order, OrderEvent, Side, OrderStatus, ExecutionType
 from binance_gateway import BinanceFutureGateway
+from order_manager import OrderManager, DONE_STATUSES
 import logging
 
 logging.basicConfig(
@@ -11,18 +13,6 @@ logging.basicConfig(
 )
 
 
-# An order class with status information
-class Order:
-    def __init__(self, symbol: str, side: Side, price, quantity, tif="IOC"):
-        self.symbol = symbol
-        self.side = side
-        self.price = price
-        self.quantity = quantity
-        self.tif = tif
-        self.last_order_event = None
-        self.cancelling = False
-
-
 # Pricing strategy class
 class PricingStrategy:
     def __init__(
@@ -31,164 +21,96 @@ class PricingStrategy:
         order_size,
         sensitivity,
         binance_gateway: BinanceFutureGateway,
+        skew=0.1,
+        order_manager: OrderManager = None,
     ):
         self._symbol = symbol
         self._order_size = order_size
         self._sensitivity = sensitivity
         self._binance_gateway = binance_gateway
-        self._position = 0
+        # price improvement of the exit order after a fill
+        self._skew = skew
+        # order state is kept locally from the moment a request is sent, see OrderManager
+        self._order_manager = order_manager or OrderManager(binance_gateway, symbol)
         self._live_buy_order = None
         self._live_sell_order = None
         self.limit_buy_price = None
         self.limit_sell_price = None
 
-
     def start(self):
         logging.info(f"Start strategy for {self._symbol}..")
 
     # callback on order book update
     def on_orderbook(self, order_book: VenueOrderBook):
         # raise a buy order if there is currently none
+        _limit_buy_price = order_book.get_book().get_best_bid()
         if self._live_buy_order is None:
-            _limit_buy_price = order_book.get_book().get_best_bid()
             self.limit_buy_price = _limit_buy_price
-            _order = Order(
-                self._symbol,
-                Side.BUY,
-                _limit_buy_price,
-                self._order_size,
-            )
-            self._post_only_limit_order(_order)
-        else:
-            # should we refresh our price?
-            if (
-                abs(order_book.get_book().get_best_bid() - self._live_buy_order.price)
-                > self._sensitivity
-            ):
-                # cancel live order
-                self._cancel_order(self._live_buy_order)
+            self._live_buy_order = self._post_only_limit_order(Side.BUY, _limit_buy_price)
+        # should we refresh our price? re-quote right away, even before the exchange acked it
+        elif abs(_limit_buy_price - self._live_buy_order.price) > self._sensitivity:
+            self.limit_buy_price = _limit_buy_price
+            self._requote(Side.BUY, _limit_buy_price)
 
         # raise a sell order if there is currently none
+        _limit_sell_price = order_book.get_book().get_best_ask()
         if self._live_sell_order is None:
-            _limit_sell_price = order_book.get_book().get_best_ask()
             self.limit_sell_price = _limit_sell_price
-            _order = Order(
-                self._symbol,
-                Side.SELL,
-                _limit_sell_price,
-                self._order_size,
-            )
-            self._post_only_limit_order(_order)
-        else:
-            # should we refresh our price?
-            if (
-                abs(order_book.get_book().get_best_ask() - self._live_sell_order.price)
-                > self._sensitivity
-            ):
-                # cancel live order
-                self._cancel_order(self._live_sell_order)
+            self._live_sell_order = self._post_only_limit_order(Side.SELL, _limit_sell_price)
+        elif abs(_limit_sell_price - self._live_sell_order.price) > self._sensitivity:
+            self.limit_sell_price = _limit_sell_price
+            self._requote(Side.SELL, _limit_sell_price)
 
-    # callback on execution update
-    def on_execution(self, order_event: OrderEvent):
+    # callback on execution update of one of our orders, routed by the order manager
+    def on_execution(self, order: Order, order_event: OrderEvent):
         logging.info("Received execution: {}".format(order_event))
         self._update_position(order_event)
+        if not self._is_complete(order):
+            return
 
-        if order_event.side == Side.BUY:
-            if self._live_buy_order:
-                self._live_buy_order.last_order_event = order_event
-                if self._is_complete(order_event):
-                    # buy order is filled, skew sell order price to increase probability of exiting in order not to hold risk
-                    self._cancel_order(self._live_sell_order)
-                    # self._live_sell_order = None
-                    _skewed_limit_sell_price = self.limit_sell_price - 0.1
-                    _order = Order(
-                        self._symbol,
-                        Side.SELL,
-                        _skewed_limit_sell_price,
-                        self._order_size,
-                    )
-                    self._post_only_limit_order(_order)
-                    # buy order is done, we can create new one
-                    self._live_buy_order = None
-        else:
-            if self._live_sell_order:
-                self._live_sell_order.last_order_event = order_event
-                if self._is_complete(order_event):
-                    # sell order is filled, skew buy order price to increase probability of exiting in order not to hold risk
-                    self._cancel_order(self._live_buy_order)
-                    # self._live_buy_order = None
-                    _skewed_limit_buy_price = self.limit_buy_price + 0.1
-                    _order = Order(
-                        self._symbol,
-                        Side.SELL,
-                        _skewed_limit_buy_price,
-                        self._order_size,
-                    )
-                    self._post_only_limit_order(_order)
-                    # sell order is done, we can create new one
-                    self._live_sell_order = None
-
-    def _post_only_limit_order(self, order: Order):
-        if order.side == Side.BUY:
-            # ensure there's no existing buy order
-            if self._live_buy_order is None:
-                success = self._binance_gateway.place_limit_order(
-                    order.side,
-                    order.price,
-                    order.quantity,
-                    "GTX",
-                )
-                if success:
-                    self._live_buy_order = order
-            else:
-                raise Exception(
-                    "Logic error - attempt to raise buy order when there is already one"
-                )
+        if order is self._live_buy_order:
+            # buy order is done, we can create new one
+            self._live_buy_order = None
+            if order.order_status == OrderStatus.FILLED and self.limit_sell_price is not None:
+                # buy order is filled, skew sell order price to increase probability of exiting in order not to hold risk
+                self._requote(Side.SELL, self.limit_sell_price - self._skew)
+        elif order is self._live_sell_order:
+            # sell order is done, we can create new one
+            self._live_sell_order = None
+            if order.order_status == OrderStatus.FILLED and self.limit_buy_price is not None:
+                # sell order is filled, skew buy order price to increase probability of exiting in order not to hold risk
+                self._requote(Side.BUY, self.limit_buy_price + self._skew)
+
+    # replace the live order of a side, the new order goes out without waiting for the cancel
+    def _requote(self, side: Side, price):
+        if side == Side.BUY:
+            if self._live_buy_order is not None:
+                self._cancel_order(self._live_buy_order)
+            self._live_buy_order = self._post_only_limit_order(side, price)
         else:
-            # ensure there's no existing sell order
-            if self._live_sell_order is None:
-                success = self._binance_gateway.place_limit_order(
-                    order.side,
-                    order.price,
-                    order.quantity,
-                    "GTX",
-                )
-                if success:
-                    self._live_sell_order = order
-
-    # cancel the given order if not cancel request not previously sent
+            if self._live_sell_order is not None:
+                self._cancel_order(self._live_sell_order)
+            self._live_sell_order = self._post_only_limit_order(side, price)
+
+    def _post_only_limit_order(self, side: Side, price) -> Order:
+        return self._order_manager.send_limit_order(
+            self._symbol, side, price, self._order_size, "GTX", self.on_execution
+        )
+
+    # cancel the given order, queued by the order manager if it is not acknowledged yet
     def _cancel_order(self, order: Order):
-        if not self._ready_to_cancel(order):
-            # not ready to cancel yet, wait
-            return
-        if not order.cancelling:
-            _order_id = order.last_order_event.order_id
-            logging.info("Sending cancel request for order id: {}".format(_order_id))
-            order.cancelling = self._binance_gateway.cancel_order(
-                order.symbol,
-                order.last_order_event.order_id,
-            )
-
-    # update current position
+        if self._order_manager.cancel_order(order.order_id):
+            logging.info("Sending cancel request for order id: {}".format(order.order_id))
+
+    # current position, tracked by the gateway from fills and reconciled with the exchange
     def _update_position(self, order_event: OrderEvent):
-        _sign = 1 if order_event.side == Side.BUY else -1
-        self._position += _sign * order_event.last_filled_quantity
-        logging.info("Net position: {:.3f}".format(self._position))
-
-    # check if order has completed
-    def _is_complete(self, order_event: OrderEvent):
-        return (
-            order_event.status == OrderStatus.FILLED
-            or order_event.status == OrderStatus.PARTIALLY_FILLED
-            or order_event.status == OrderStatus.CANCELED
-            or order_event.status == OrderStatus.FAILED
-        )
+        if order_event.execution_type == ExecutionType.TRADE:
+            _position = self._binance_gateway.get_position(self._symbol)
+            logging.info("Net position: {:.3f}".format(_position.amount))
 
-    # check if order is ready to cancel
-    def _ready_to_cancel(self, order: Order):
-        return order.last_order_event is not None and not self._is_complete(
-            order.last_order_event
-        )
+    # check if order has completed, a partially filled order is still working
+    def _is_complete(self, order: Order):
+        return order.order_status in DONE_STATUSES
 
 
 if __name__ == "__main__":
@@ -202,16 +124,23 @@ if __name__ == "__main__":
     symbol = "BTCUSDT"
     order_size = 0.01
     sensitivity = 0.1
+    skew = 0.1
 
     # create a binance gateway object
     binance_gateway = BinanceFutureGateway(symbol, api_key, api_secret)
 
     # create a strategy a register callbacks with gateway
 
-    strategy = PricingStrategy(symbol, order_size, sensitivity, binance_gateway)
-    binance_gateway.register_execution_callback(strategy.on_execution)
-    binance_gateway.register_depth_callback(strategy.on_orderbook)
+    strategy = PricingStrategy(symbol, order_size, sensitivity, binance_gateway, skew)
+    # only the best prices are used, they come fastest from the bookTicker stream
+    binance_gateway.register_bbo_callback(strategy.on_orderbook)
 
     # start
     binance_gateway.connect()
     strategy.start()
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        binance_gateway.stop()
@@ -0,0 +1,247 @@
+from bisect import bisect_left
+from collections import deque
+from itertools import count
+
+
+# An order resting in or sent to the simulated exchange
+class SimOrder:
+    __slots__ = (
+        "order_id",
+        "client_order_id",
+        "symbol",
+        "side",
+        "price",
+        "quantity",
+        "filled",
+        "tif",
+        "owner",
+        "status",
+        "update_time",
+    )
+
+    def __init__(self, client_order_id: str, symbol: str, side: str, price: float, quantity: float, tif="GTC", owner=None):
+        self.order_id = None
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled = 0.0
+        self.tif = tif
+        # None for the simulator's own background liquidity
+        self.owner = owner
+        self.status = "NEW"
+        self.update_time = 0
+
+    def leaves_qty(self) -> float:
+        return round(self.quantity - self.filled, 8)
+
+    def __str__(self):
+        return "SimOrder [id={}, client_id={}, {} {}@{}, filled={}, status={}]".format(
+            self.order_id, self.client_order_id, self.side, self.quantity, self.price, self.filled, self.status
+        )
+
+
+# A fill between a resting maker order and an incoming taker order
+class SimFill:
+    __slots__ = ("trade_id", "maker", "taker", "price", "quantity")
+
+    def __init__(self, trade_id: int, maker: SimOrder, taker: SimOrder, price: float, quantity: float):
+        self.trade_id = trade_id
+        self.maker = maker
+        self.taker = taker
+        self.price = price
+        self.quantity = quantity
+
+
+# Price-time priority limit order book of one symbol.
+# Like depth_book.LocalOrderBook, each side keeps ascending price keys (asks negated) with the best
+# level last; every level holds a FIFO queue of orders. Level size changes are accumulated and
+# handed out as Binance style depth diffs with U/u/pu update ids.
+class MatchingEngine:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self._bid_keys = []
+        self._ask_keys = []
+        # price -> deque of resting orders
+        self._bid_levels = {}
+        self._ask_levels = {}
+        # price -> total resting size
+        self._bid_sizes = {}
+        self._ask_sizes = {}
+        # (owner, client order id) -> resting order
+        self._orders = {}
+
+        self._order_ids = count(1)
+        self._trade_ids = count(1)
+
+        self.update_id = 0
+        self._last_diff_id = 0
+        self._changed_bids = {}
+        self._changed_asks = {}
+
+    def best_bid(self):
+        return self._bid_keys[-1] if self._bid_keys else None
+
+    def best_ask(self):
+        return -self._ask_keys[-1] if self._ask_keys else None
+
+    def get_order(self, owner, client_order_id: str) -> SimOrder:
+        return self._orders.get((owner, client_order_id))
+
+    # True if a new order at price would take liquidity
+    def would_cross(self, side: str, price: float) -> bool:
+        if side == "BUY":
+            return bool(self._ask_keys) and price >= -self._ask_keys[-1]
+        return bool(self._bid_keys) and price <= self._bid_keys[-1]
+
+    # True if the opposite side holds at least quantity at prices order would trade at
+    def can_fill(self, side: str, price: float, quantity: float) -> bool:
+        if side == "BUY":
+            _keys, _sizes, _sign = self._ask_keys, self._ask_sizes, -1
+        else:
+            _keys, _sizes, _sign = self._bid_keys, self._bid_sizes, 1
+        _remaining = quantity
+        for _key in reversed(_keys):
+            _price = _sign * _key
+            if (side == "BUY" and _price > price) or (side == "SELL" and _price < price):
+                break
+            _remaining = round(_remaining - _sizes[_price], 8)
+            if _remaining <= 0:
+                return True
+        return False
+
+    """
+        Match an incoming limit order and rest the remainder according to its time in force.
+        Returns the fills, or None if a post only (GTX) order was rejected for crossing.
+        A fill or kill (FOK) order that cannot fill completely expires without any fill.
+    """
+
+    def submit(self, order: SimOrder, timestamp: int = 0) -> list:
+        if order.tif == "GTX" and self.would_cross(order.side, order.price):
+            order.status = "EXPIRED"
+            return None
+
+        order.order_id = next(self._order_ids)
+        order.update_time = timestamp
+        if order.tif == "FOK" and not self.can_fill(order.side, order.price, order.leaves_qty()):
+            order.status = "EXPIRED"
+            return []
+        _fills = self._match(order, timestamp)
+
+        if order.leaves_qty() > 0:
+            if order.tif == "IOC":
+                order.status = "EXPIRED"
+            else:
+                self._rest(order)
+        return _fills
+
+    def cancel(self, owner, client_order_id: str, timestamp: int = 0) -> SimOrder:
+        _order = self._orders.pop((owner, client_order_id), None)
+        if _order is None:
+            return None
+        if _order.side == "BUY":
+            _queue = self._bid_levels[_order.price]
+            _queue.remove(_order)
+            self._change_level(self._bid_keys, self._bid_levels, self._bid_sizes, self._changed_bids, _order.price, _order.price, -_order.leaves_qty())
+        else:
+            _queue = self._ask_levels[_order.price]
+            _queue.remove(_order)
+            self._change_level(self._ask_keys, self._ask_levels, self._ask_sizes, self._changed_asks, _order.price, -_order.price, -_order.leaves_qty())
+        _order.status = "CANCELED"
+        _order.update_time = timestamp
+        return _order
+
+    def _match(self, taker: SimOrder, timestamp: int) -> list:
+        _fills = []
+        if taker.side == "BUY":
+            _keys, _levels, _sizes, _changed, _sign = self._ask_keys, self._ask_levels, self._ask_sizes, self._changed_asks, -1
+        else:
+            _keys, _levels, _sizes, _changed, _sign = self._bid_keys, self._bid_levels, self._bid_sizes, self._changed_bids, 1
+
+        while _keys and taker.leaves_qty() > 0:
+            _price = _sign * _keys[-1]
+            if (taker.side == "BUY" and _price > taker.price) or (taker.side == "SELL" and _price < taker.price):
+                break
+            _queue = _levels[_price]
+            while _queue and taker.leaves_qty() > 0:
+                _maker = _queue[0]
+                _qty = min(_maker.leaves_qty(), taker.leaves_qty())
+                _maker.filled = round(_maker.filled + _qty, 8)
+                taker.filled = round(taker.filled + _qty, 8)
+                _maker.update_time = timestamp
+                _fills.append(SimFill(next(self._trade_ids), _maker, taker, _price, _qty))
+                if _maker.leaves_qty() <= 0:
+                    _maker.status = "FILLED"
+                    _queue.popleft()
+                    self._orders.pop((_maker.owner, _maker.client_order_id), None)
+                else:
+                    _maker.status = "PARTIALLY_FILLED"
+                self._change_level(_keys, _levels, _sizes, _changed, _price, _sign * _price, -_qty)
+
+        if taker.filled > 0:
+            taker.status = "FILLED" if taker.leaves_qty() <= 0 else "PARTIALLY_FILLED"
+        return _fills
+
+    def _rest(self, order: SimOrder):
+        self._orders[(order.owner, order.client_order_id)] = order
+        if order.side == "BUY":
+            self._bid_levels.setdefault(order.price, deque()).append(order)
+            self._change_level(self._bid_keys, self._bid_levels, self._bid_sizes, self._changed_bids, order.price, order.price, order.leaves_qty())
+        else:
+            self._ask_levels.setdefault(order.price, deque()).append(order)
+            self._change_level(self._ask_keys, self._ask_levels, self._ask_sizes, self._changed_asks, order.price, -order.price, order.leaves_qty())
+
+    def _change_level(self, keys, levels, sizes, changed, price, key, delta):
+        _size = round(sizes.get(price, 0.0) + delta, 8)
+        if not levels.get(price):
+            _size = 0.0
+            sizes.pop(price, None)
+            levels.pop(price, None)
+            _i = bisect_left(keys, key)
+            if _i < len(keys) and keys[_i] == key:
+                del keys[_i]
+        else:
+            if price not in sizes:
+                _i = bisect_left(keys, key)
+                keys.insert(_i, key)
+            sizes[price] = _size
+        changed[price] = _size
+        self.update_id += 1
+
+    """
+        Level changes since the previous call as a depthUpdate payload, or None if nothing changed
+    """
+
+    def take_depth_update(self, event_time: int) -> dict:
+        if not self._changed_bids and not self._changed_asks:
+            return None
+        _update = {
+            "e": "depthUpdate",
+            "E": event_time,
+            "T": event_time,
+            "s": self.symbol,
+            "U": self._last_diff_id + 1,
+            "u": self.update_id,
+            "pu": self._last_diff_id,
+            "b": [[str(p), str(s)] for (p, s) in self._changed_bids.items()],
+            "a": [[str(p), str(s)] for (p, s) in self._changed_asks.items()],
+        }
+        self._last_diff_id = self.update_id
+        self._changed_bids = {}
+        self._changed_asks = {}
+        return _update
+
+    # REST depth snapshot payload
+    def snapshot(self, limit: int, event_time: int) -> dict:
+        return {
+            "lastUpdateId": self.update_id,
+            "E": event_time,
+            "T": event_time,
+            "bids": [[str(k), str(self._bid_sizes[k])] for k in self._bid_keys[-1:-limit - 1:-1]],
+            "asks": [[str(-k), str(self._ask_sizes[-k])] for k in self._ask_keys[-1:-limit - 1:-1]],
+        }
+
+    # resting orders not owned by anyone, i.e. background liquidity
+    def background_orders(self) -> list:
+        return [o for (owner, _), o in self._orders.items() if owner is None]
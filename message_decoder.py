@@ -0,0 +1,289 @@
+import json
+
+from typing import NamedTuple
+
+from interface_book import BestBidOffer
+from interface_order import OrderEvent, OrderStatus, ExecutionType, Side, Trade
+
+# orjson is optional, it decodes raw frames several times faster than the json module
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+
+# precomputed lookups from Binance wire strings to the interface enums, in place of Enum[name]
+SIDES = {s.name: s for s in Side}
+EXECUTION_TYPES = {e.name: e for e in ExecutionType}
+ORDER_STATUSES = {s.name: s for s in OrderStatus}
+# GTX orders that would cross come back EXPIRED, the order is done just like a cancel
+ORDER_STATUSES["EXPIRED"] = OrderStatus.CANCELED
+ORDER_STATUSES["EXPIRED_IN_MATCH"] = OrderStatus.CANCELED
+
+
+# ORDER_TRADE_UPDATE user data event
+class OrderTradeUpdate(NamedTuple):
+    event_time: int
+    transaction_time: int
+    symbol: str
+    client_order_id: str
+    order_id: int
+    side: Side
+    price: float
+    quantity: float
+    execution_type: ExecutionType
+    order_status: OrderStatus
+    last_filled_price: float
+    last_filled_quantity: float
+    cumulative_filled_quantity: float
+    trade_id: int
+    commission: float
+    commission_asset: str
+    realized_profit: float
+    is_maker: bool
+
+    def to_order_event(self) -> OrderEvent:
+        _order_event = OrderEvent(
+            self.symbol,
+            self.client_order_id,
+            self.execution_type,
+            self.side,
+            self.order_status,
+        )
+        _order_event.event_time = self.transaction_time
+        if self.execution_type is ExecutionType.TRADE:
+            _order_event.fill_time = self.transaction_time
+            _order_event.last_filled_price = self.last_filled_price
+            _order_event.last_filled_quantity = self.last_filled_quantity
+        return _order_event
+
+
+# A balance entry of an ACCOUNT_UPDATE event
+class BalanceUpdate(NamedTuple):
+    asset: str
+    wallet_balance: float
+    cross_wallet_balance: float
+    balance_change: float
+
+
+# A position entry of an ACCOUNT_UPDATE event
+class PositionUpdate(NamedTuple):
+    symbol: str
+    position_amount: float
+    entry_price: float
+    accumulated_realized: float
+    unrealized_pnl: float
+    position_side: str
+
+
+# ACCOUNT_UPDATE user data event
+class AccountUpdate(NamedTuple):
+    event_time: int
+    transaction_time: int
+    reason: str
+    balances: list
+    positions: list
+
+
+# depthUpdate diff event, levels as (price, size) floats
+class DepthUpdate(NamedTuple):
+    event_time: int
+    transaction_time: int
+    symbol: str
+    first_update_id: int
+    final_update_id: int
+    prev_final_update_id: int
+    bids: list
+    asks: list
+
+
+# kline event, the candle currently building
+class KlineUpdate(NamedTuple):
+    event_time: int
+    symbol: str
+    interval: str
+    start_time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    closed: bool
+
+
+# aggTrade event, is_buyer_maker means the aggressor sold
+class AggTradeUpdate(NamedTuple):
+    event_time: int
+    trade_time: int
+    symbol: str
+    agg_trade_id: int
+    price: float
+    quantity: float
+    is_buyer_maker: bool
+
+    def to_trade(self, received_time: float) -> Trade:
+        return Trade(
+            received_time,
+            self.symbol,
+            self.price,
+            self.quantity,
+            Side.SELL if self.is_buyer_maker else Side.BUY,
+            False,
+        )
+
+
+# markPriceUpdate event
+class MarkPriceUpdate(NamedTuple):
+    event_time: int
+    symbol: str
+    mark_price: float
+    index_price: float
+    funding_rate: float
+    next_funding_time: int
+
+
+_new = tuple.__new__
+
+
+# Decodes Binance futures stream payloads (the parsed dict, unwrapped from any combined stream
+# envelope) into the typed structs above, each built as a tuple in a single C level call.
+# Raw str/bytes frames go through loads() first, which uses orjson when available. Subclass and
+# override to plug in a different decoding strategy.
+class MessageDecoder:
+    def __init__(self, loads=None):
+        self.loads = loads or _loads
+
+    def decode_order_trade_update(self, message: dict) -> OrderTradeUpdate:
+        _o = message["o"]
+        return _new(
+            OrderTradeUpdate,
+            (
+                message["E"],
+                message["T"],
+                _o["s"],
+                _o["c"],
+                _o["i"],
+                SIDES[_o["S"]],
+                float(_o["p"]),
+                float(_o["q"]),
+                EXECUTION_TYPES[_o["x"]],
+                ORDER_STATUSES[_o["X"]],
+                float(_o["L"]),
+                float(_o["l"]),
+                float(_o["z"]),
+                _o.get("t"),
+                float(_o.get("n", 0)),
+                _o.get("N"),
+                float(_o.get("rp", 0)),
+                _o.get("m", False),
+            ),
+        )
+
+    def decode_account_update(self, message: dict) -> AccountUpdate:
+        _a = message["a"]
+        return _new(
+            AccountUpdate,
+            (
+                message["E"],
+                message["T"],
+                _a.get("m"),
+                [
+                    _new(
+                        BalanceUpdate,
+                        (b["a"], float(b["wb"]), float(b["cw"]), float(b.get("bc", 0))),
+                    )
+                    for b in _a.get("B", ())
+                ],
+                [
+                    _new(
+                        PositionUpdate,
+                        (
+                            p["s"],
+                            float(p["pa"]),
+                            float(p["ep"]),
+                            float(p["cr"]),
+                            float(p["up"]),
+                            p["ps"],
+                        ),
+                    )
+                    for p in _a.get("P", ())
+                ],
+            ),
+        )
+
+    def decode_depth_update(self, message: dict) -> DepthUpdate:
+        return _new(
+            DepthUpdate,
+            (
+                message["E"],
+                message.get("T"),
+                message["s"],
+                message["U"],
+                message["u"],
+                message.get("pu"),
+                [(float(p), float(s)) for (p, s) in message["b"]],
+                [(float(p), float(s)) for (p, s) in message["a"]],
+            ),
+        )
+
+    def decode_kline(self, message: dict) -> KlineUpdate:
+        _k = message["k"]
+        return _new(
+            KlineUpdate,
+            (
+                message["E"],
+                message["s"],
+                _k["i"],
+                _k["t"],
+                float(_k["o"]),
+                float(_k["h"]),
+                float(_k["l"]),
+                float(_k["c"]),
+                float(_k["v"]),
+                _k["x"],
+            ),
+        )
+
+    def decode_agg_trade(self, message: dict) -> AggTradeUpdate:
+        return _new(
+            AggTradeUpdate,
+            (
+                message["E"],
+                message["T"],
+                message["s"],
+                message["a"],
+                float(message["p"]),
+                float(message["q"]),
+                message["m"],
+            ),
+        )
+
+    def decode_mark_price(self, message: dict) -> MarkPriceUpdate:
+        return _new(
+            MarkPriceUpdate,
+            (
+                message["E"],
+                message["s"],
+                float(message["p"]),
+                float(message["i"]),
+                float(message["r"]),
+                message["T"],
+            ),
+        )
+
+    def decode_book_ticker(self, message: dict) -> BestBidOffer:
+        return _new(
+            BestBidOffer,
+            (
+                message["s"],
+                message["u"],
+                message["E"],
+                float(message["b"]),
+                float(message["B"]),
+                float(message["a"]),
+                float(message["A"]),
+            ),
+        )
@@ -0,0 +1,235 @@
+import logging
+import time
+
+from functools import partial
+from itertools import count
+
+from interface_order import Order, OrderEvent, OrderStatus, ExecutionType, OrderType, Side, NewOrderSingle
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+# order states after which no more events are expected
+DONE_STATUSES = frozenset((OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.FAILED))
+
+
+# Order manager between the strategies and a gateway.
+# It assigns the client order ids, keeps every live interface_order.Order in a hash map by id and
+# applies each execution event to its order: status, and leaves quantity across partial fills.
+# Events are routed to the callback the order was sent with, callback(order, order_event), so any
+# number of orders per side and per strategy can be live and events are never matched by side.
+# Runs on the gateway loop thread, like the execution callbacks that feed it.
+#
+# Order state is optimistic: an order is PENDING_NEW from the moment it is sent and PENDING_CANCEL
+# from the moment its cancel is requested, so strategies can re-quote without waiting for the
+# exchange. A cancel of an order not acknowledged yet is queued and sent with the ack. A cancel
+# refused because the exchange no longer has the order puts it back in the state last reported by
+# the exchange. A cancel that failed otherwise (None result: network error, rate limit, timeout)
+# is sent again up to max_cancel_retries times, as the order may still be live.
+class OrderManager:
+    def __init__(self, gateway, symbols, prefix=None, max_cancel_retries=3):
+        self._gateway = gateway
+        self._prefix = prefix or "om{}-".format(int(time.time()))
+        self._order_ids = count(1)
+
+        # client order id -> live order and its owner callback
+        self._orders = {}
+        self._owners = {}
+        # client order id -> last status reported by the exchange, absent until acknowledged
+        self._exchange_statuses = {}
+        # orders with a cancel requested, and the subset waiting for their ack to send it
+        self._pending_cancels = set()
+        self._queued_cancels = set()
+        # client order id -> cancels sent again after a failure
+        self._cancel_retries = {}
+        self._max_cancel_retries = max_cancel_retries
+        # (symbol, side) -> {client order id: live order}
+        self._live = {}
+
+        # events of orders this manager did not send, or already done
+        self.unknown_events = 0
+        # cancels that failed every retry, their order may still be live on the exchange
+        self.failed_cancels = 0
+
+        for _symbol in [symbols] if isinstance(symbols, str) else symbols:
+            gateway.register_execution_callback(self.on_execution, _symbol)
+
+    def get_order(self, client_order_id: str) -> Order:
+        return self._orders.get(client_order_id)
+
+    # live orders of a symbol and side, by client order id
+    def live_orders(self, symbol: str, side: Side) -> dict:
+        return self._live.get((symbol, side), {})
+
+    def send_limit_order(self, symbol: str, side: Side, price, quantity, tif="GTX", on_event=None) -> Order:
+        _order = self._new_order(symbol, side, price, quantity, tif, on_event)
+        self._gateway.submit_limit_order(
+            side, price, quantity, tif, symbol, client_order_id=_order.order_id
+        ).add_done_callback(partial(self._on_order_sent, _order))
+        return _order
+
+    # (side, price, quantity) quotes of a symbol sent through the batch endpoint
+    def send_limit_orders(self, symbol: str, quotes: list, tif="GTX", on_event=None) -> [Order]:
+        _orders = [self._new_order(symbol, s, p, q, tif, on_event) for (s, p, q) in quotes]
+        if not _orders:
+            return _orders
+        self._gateway.submit_batch_orders(
+            [
+                NewOrderSingle(symbol, o.side, o.leaves_qty, o.type, o.price, client_order_id=o.order_id)
+                for o in _orders
+            ],
+            tif,
+        ).add_done_callback(partial(self._on_batch_sent, _orders))
+        return _orders
+
+    def _new_order(self, symbol, side, price, quantity, tif, on_event) -> Order:
+        _client_order_id = self._prefix + str(next(self._order_ids))
+        _order = Order(
+            _client_order_id,
+            side,
+            quantity,
+            symbol,
+            time.time(),
+            OrderType.PostOnly if tif == "GTX" else OrderType.Limit,
+            price,
+            OrderStatus.PENDING_NEW,
+        )
+        self._orders[_client_order_id] = _order
+        self._owners[_client_order_id] = on_event
+        self._live.setdefault((symbol, side), {})[_client_order_id] = _order
+        return _order
+
+    # False if the order is not live or already being cancelled
+    def cancel_order(self, client_order_id: str) -> bool:
+        if not self._request_cancel(client_order_id):
+            return False
+        if client_order_id not in self._queued_cancels:
+            self._send_cancel(self._orders[client_order_id])
+        return True
+
+    # cancels of acknowledged orders go out through the batch endpoint, one request per symbol.
+    # Returns the number of orders being cancelled.
+    def cancel_orders(self, client_order_ids) -> int:
+        _by_symbol = {}
+        _count = 0
+        for _client_order_id in client_order_ids:
+            if not self._request_cancel(_client_order_id):
+                continue
+            _count += 1
+            if _client_order_id not in self._queued_cancels:
+                _order = self._orders[_client_order_id]
+                _by_symbol.setdefault(_order.symbol, []).append(_order)
+        for _symbol, _orders in _by_symbol.items():
+            if len(_orders) == 1:
+                self._send_cancel(_orders[0])
+                continue
+            self._gateway.submit_cancel_batch_orders(
+                _symbol, [o.order_id for o in _orders]
+            ).add_done_callback(partial(self._on_cancel_batch_sent, _orders))
+        return _count
+
+    # marks the order PENDING_CANCEL, queued if the exchange would not know the order yet
+    def _request_cancel(self, client_order_id) -> bool:
+        _order = self._orders.get(client_order_id)
+        if _order is None or client_order_id in self._pending_cancels:
+            return False
+        _order.order_status = OrderStatus.PENDING_CANCEL
+        self._pending_cancels.add(client_order_id)
+        if client_order_id not in self._exchange_statuses:
+            self._queued_cancels.add(client_order_id)
+        return True
+
+    def _send_cancel(self, order: Order):
+        self._gateway.submit_cancel_order(order.symbol, order.order_id).add_done_callback(
+            partial(self._on_cancel_sent, order)
+        )
+
+    def _on_cancel_sent(self, order: Order, future):
+        self._on_cancel_result(order, future.result())
+
+    def _on_cancel_batch_sent(self, orders: [Order], future):
+        for (_order, _cancelled) in zip(orders, future.result()):
+            self._on_cancel_result(_order, _cancelled)
+
+    # a refused cancel, e.g. the order filled meanwhile, goes back to the exchange state.
+    # A failed one is retried while the order is not done.
+    def _on_cancel_result(self, order: Order, cancelled: bool):
+        _client_order_id = order.order_id
+        if cancelled or _client_order_id not in self._orders:
+            self._cancel_retries.pop(_client_order_id, None)
+            return
+        if cancelled is None:
+            _retries = self._cancel_retries.get(_client_order_id, 0)
+            if _retries < self._max_cancel_retries:
+                self._cancel_retries[_client_order_id] = _retries + 1
+                logging.info(f"Retrying cancel of {_client_order_id}, attempt {_retries + 1}..")
+                self._send_cancel(order)
+                return
+            self.failed_cancels += 1
+            logging.info(
+                f"[Error] Cancel of {_client_order_id} failed {_retries + 1} times, order may be live.."
+            )
+        self._cancel_retries.pop(_client_order_id, None)
+        self._pending_cancels.discard(_client_order_id)
+        order.order_status = self._exchange_statuses[_client_order_id]
+
+    # the REST response acknowledges the order as well, whichever of it and the user data
+    # event comes first releases a queued cancel.
+    # If the exchange refused the order nothing will come on the user data stream.
+    def _on_order_sent(self, order: Order, future):
+        self._on_order_result(order, future.result())
+
+    def _on_batch_sent(self, orders: [Order], future):
+        for (_order, _placed) in zip(orders, future.result()):
+            self._on_order_result(_order, _placed)
+
+    def _on_order_result(self, order: Order, placed: bool):
+        _client_order_id = order.order_id
+        if _client_order_id not in self._orders:
+            return
+        if placed:
+            self._exchange_statuses.setdefault(_client_order_id, OrderStatus.NEW)
+            if order.order_status == OrderStatus.PENDING_NEW:
+                order.order_status = OrderStatus.NEW
+            if _client_order_id in self._queued_cancels:
+                self._queued_cancels.discard(_client_order_id)
+                self._send_cancel(order)
+            return
+        _order_event = OrderEvent(
+            order.symbol, order.order_id, ExecutionType.EXPIRED, order.side, OrderStatus.FAILED
+        )
+        self.on_execution(_order_event)
+
+    # execution callback registered with the gateway
+    def on_execution(self, order_event: OrderEvent):
+        _client_order_id = order_event.order_id
+        _order = self._orders.get(_client_order_id)
+        if _order is None:
+            self.unknown_events += 1
+            return
+        if order_event.execution_type == ExecutionType.TRADE:
+            _order.leaves_qty = round(_order.leaves_qty - order_event.last_filled_quantity, 8)
+        _status = order_event.status
+        self._exchange_statuses[_client_order_id] = _status
+
+        _on_event = self._owners[_client_order_id]
+        if _status in DONE_STATUSES:
+            _order.order_status = _status
+            del self._orders[_client_order_id]
+            del self._owners[_client_order_id]
+            del self._exchange_statuses[_client_order_id]
+            del self._live[(_order.symbol, _order.side)][_client_order_id]
+            self._pending_cancels.discard(_client_order_id)
+            self._queued_cancels.discard(_client_order_id)
+            self._cancel_retries.pop(_client_order_id, None)
+        elif _client_order_id in self._pending_cancels:
+            # stays PENDING_CANCEL until done, a queued cancel goes out with the ack
+            if _client_order_id in self._queued_cancels:
+                self._queued_cancels.discard(_client_order_id)
+                self._send_cancel(_order)
+        else:
+            _order.order_status = _status
+        if _on_event is not None:
+            _on_event(_order, order_event)
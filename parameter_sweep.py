@@ -0,0 +1,116 @@
+import logging
+import os
+import random
+import time
+
+from itertools import product
+from multiprocessing import Pool
+
+from backtester import Backtester
+from market_data_capture import CaptureReader
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+# dataset and backtest settings of a worker process, set once by the pool initializer
+_worker = {}
+
+
+# every combination of the given values, e.g. grid(order_size=[0.01, 0.02], sensitivity=[0.1, 0.5])
+def grid(**values) -> list:
+    _names = list(values)
+    return [dict(zip(_names, _combination)) for _combination in product(*values.values())]
+
+
+# n random parameter sets, from (low, high) ranges drawn uniformly or from lists of choices
+def random_search(n: int, seed=None, **ranges) -> list:
+    _random = random.Random(seed)
+    _params = []
+    for _ in range(n):
+        _set = {}
+        for _name, _range in ranges.items():
+            if isinstance(_range, tuple):
+                _set[_name] = _random.uniform(*_range)
+            else:
+                _set[_name] = _random.choice(_range)
+        _params.append(_set)
+    return _params
+
+
+def _init_worker(paths, symbol, latency_ms, maker_fee):
+    # strategies log every execution, which would dominate the backtest time
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker["reader"] = CaptureReader(paths)
+    _worker["settings"] = (symbol, latency_ms, maker_fee)
+
+
+def _run_one(task) -> dict:
+    _strategy_class, _params = task
+    _symbol, _latency_ms, _maker_fee = _worker["settings"]
+    _backtester = Backtester(_symbol, latency_ms=_latency_ms, maker_fee=_maker_fee)
+    _strategy = _strategy_class(symbol=_symbol, binance_gateway=_backtester, **_params)
+    _backtester.register_depth_callback(_strategy.on_orderbook)
+    _strategy.start()
+    return dict(_params, **_backtester.run(_worker["reader"]))
+
+
+# Backtest a strategy class once per parameter set, spread over a process pool.
+# Every worker memory maps the same capture files read only, so the dataset lives once in the page
+# cache whatever the number of processes, and runs are independent so throughput scales with cores.
+# Parameter names are the strategy constructor arguments, symbol and binance_gateway are provided.
+# Returns one result dict per parameter set, parameters included, in completion order.
+def run_sweep(
+    strategy_class,
+    paths,
+    params: list,
+    symbol="BTCUSDT",
+    processes=None,
+    latency_ms=5,
+    maker_fee=0.0002,
+) -> list:
+    _paths = CaptureReader(paths).paths
+    _processes = min(processes or os.cpu_count(), len(params)) or 1
+    logging.info(f"Running {len(params)} backtests on {_processes} processes..")
+    _start = time.perf_counter()
+    _results = []
+    with Pool(_processes, _init_worker, (_paths, symbol, latency_ms, maker_fee)) as _pool:
+        for _result in _pool.imap_unordered(_run_one, [(strategy_class, p) for p in params]):
+            _results.append(_result)
+    _elapsed = time.perf_counter() - _start
+    _messages = sum(r["messages"] for r in _results)
+    logging.info(
+        f"Swept {len(params)} parameter sets in {_elapsed:.1f}s, {_messages / _elapsed:,.0f} messages/s.."
+    )
+    return _results
+
+
+# results as a text table, one row per parameter set, best first
+def format_table(results: list, sort_by="pnl", columns=None) -> str:
+    if not results:
+        return ""
+    _columns = columns or [
+        c for c in results[0] if c not in ("messages", "callback_errors", "elapsed_s")
+    ]
+    _rows = sorted(results, key=lambda r: r[sort_by], reverse=True)
+    _lines = ["".join("{:>16}".format(c) for c in _columns)]
+    for _row in _rows:
+        _lines.append(
+            "".join(
+                "{:>16.4f}".format(_row[c]) if isinstance(_row[c], float) else "{:>16}".format(_row[c])
+                for c in _columns
+            )
+        )
+    return "\n".join(_lines)
+
+
+# Sweep the enhanced market making strategy over a market_data_capture directory
+if __name__ == "__main__":
+    import sys
+
+    from market_making_strat_enhanced import PricingStrategy
+
+    params = grid(order_size=[0.01, 0.02], sensitivity=[0.1, 0.5, 1.0], skew=[0.0, 0.1, 0.5])
+    results = run_sweep(PricingStrategy, sys.argv[1], params)
+    print(format_table(results, columns=list(params[0]) + ["pnl", "fill_rate", "fees", "position", "max_position", "min_position"]))
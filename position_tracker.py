@@ -0,0 +1,141 @@
+import logging
+import time
+
+from typing import NamedTuple
+
+from interface_order import Side
+
+
+# Position of one symbol. Immutable, the tracker publishes a new one on every change.
+class Position(NamedTuple):
+    symbol: str
+    amount: float
+    entry_price: float
+    mark_price: float
+    realized_pnl: float
+    unrealized_pnl: float
+    commission: float
+    update_time: float
+
+
+# Per symbol positions and per asset wallet balances, one-way position mode.
+# Fills and mark prices update them in O(1) on the gateway loop thread, ACCOUNT_UPDATE events and
+# the periodic REST reconciliation correct amount, entry price and balances to the exchange's view.
+# Every change replaces the symbol's Position tuple in a dict, a single atomic store, so any thread
+# can read positions without locks and always sees a consistent one.
+# realized_pnl and commission are accumulated since the tracker started, commission only counts
+# fees paid in the margin asset. Fees paid in another asset, e.g. BNB, come off that asset's balance.
+class PositionTracker:
+    def __init__(self, margin_asset="USDT"):
+        self._margin_asset = margin_asset
+        self._positions = {}
+        self._balances = {}
+        # symbol -> time of its last fill
+        self._fill_times = {}
+        # corrections by the exchange that disagreed with the locally tracked position
+        self.mismatches = 0
+
+    def get_position(self, symbol: str) -> Position:
+        _position = self._positions.get(symbol)
+        if _position is None:
+            return Position(symbol, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        return _position
+
+    def get_positions(self) -> dict:
+        return dict(self._positions)
+
+    def get_balance(self, asset=None) -> float:
+        return self._balances.get(asset or self._margin_asset, 0.0)
+
+    # commission_asset None is the margin asset
+    def on_fill(
+        self, symbol: str, side: Side, price: float, quantity: float, commission=0.0, commission_asset=None
+    ):
+        _p = self.get_position(symbol)
+        _amount = _p.amount
+        _entry = _p.entry_price
+        _signed = quantity if side == Side.BUY else -quantity
+        _new_amount = round(_amount + _signed, 8)
+        _realized = 0.0
+        if _amount == 0 or (_amount > 0) == (_signed > 0):
+            _entry = (_entry * abs(_amount) + price * quantity) / abs(_new_amount)
+        else:
+            _closed = min(quantity, abs(_amount))
+            _realized = _closed * (price - _entry) if _amount > 0 else _closed * (_entry - price)
+            if _new_amount == 0:
+                _entry = 0.0
+            elif (_new_amount > 0) != (_amount > 0):
+                # flipped, the remainder was opened at the fill price
+                _entry = price
+        _margin_commission = commission
+        if commission_asset is not None and commission_asset != self._margin_asset:
+            if commission_asset in self._balances:
+                self._balances[commission_asset] -= commission
+            _margin_commission = 0.0
+        _mark = _p.mark_price or price
+        _now = time.time()
+        self._fill_times[symbol] = _now
+        self._positions[symbol] = Position(
+            symbol,
+            _new_amount,
+            _entry,
+            _mark,
+            _p.realized_pnl + _realized,
+            _new_amount * (_mark - _entry),
+            _p.commission + _margin_commission,
+            _now,
+        )
+        self._balances[self._margin_asset] = self.get_balance() + _realized - _margin_commission
+
+    def on_mark_price(self, symbol: str, mark_price: float):
+        _p = self.get_position(symbol)
+        self._positions[symbol] = Position(
+            symbol,
+            _p.amount,
+            _p.entry_price,
+            mark_price,
+            _p.realized_pnl,
+            _p.amount * (mark_price - _p.entry_price),
+            _p.commission,
+            time.time(),
+        )
+
+    # ACCOUNT_UPDATE event, message_decoder.AccountUpdate
+    def on_account_update(self, account):
+        for _balance in account.balances:
+            self._balances[_balance.asset] = _balance.wallet_balance
+        for _position in account.positions:
+            if _position.position_side == "BOTH":
+                self._correct(_position.symbol, _position.position_amount, _position.entry_price)
+
+    # futures_position_information and futures_account_balance responses, requested at requested_at.
+    # Symbols filled since then are left alone, the response may predate those fills.
+    def reconcile(self, position_risk: list, balances: list, requested_at: float):
+        if max(self._fill_times.values(), default=0.0) < requested_at:
+            for _balance in balances:
+                self._balances[_balance["asset"]] = float(_balance["balance"])
+        for _position in position_risk:
+            if self._fill_times.get(_position["symbol"], 0.0) >= requested_at:
+                continue
+            if _position.get("positionSide", "BOTH") == "BOTH":
+                self._correct(
+                    _position["symbol"], float(_position["positionAmt"]), float(_position["entryPrice"])
+                )
+
+    def _correct(self, symbol, amount, entry_price):
+        _p = self.get_position(symbol)
+        if _p.amount == amount and (amount == 0 or abs(_p.entry_price - entry_price) <= 1e-6 * entry_price):
+            return
+        if symbol in self._positions:
+            self.mismatches += 1
+            logging.info(
+                f"Position of {symbol} corrected by the exchange: {_p.amount}@{_p.entry_price} -> {amount}@{entry_price}"
+            )
+        _mark = _p.mark_price or entry_price
+        self._positions[symbol] = _p._replace(
+            amount=amount,
+            entry_price=entry_price,
+            mark_price=_mark,
+            unrealized_pnl=amount * (_mark - entry_price),
+            update_time=time.time(),
+        )
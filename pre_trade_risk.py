@@ -0,0 +1,147 @@
+import math
+
+from interface_order import InstrumentDetails, Side
+
+
+# InstrumentDetails of the given symbols from a futures exchangeInfo response
+def instruments_from_exchange_info(exchange_info: dict, symbols=None) -> dict:
+    _instruments = {}
+    for _symbol_info in exchange_info["symbols"]:
+        _symbol = _symbol_info["symbol"]
+        if symbols is not None and _symbol not in symbols:
+            continue
+        _filters = {f["filterType"]: f for f in _symbol_info["filters"]}
+        _lot = _filters.get("LOT_SIZE", {})
+        _instruments[_symbol] = InstrumentDetails(
+            _symbol,
+            float(_filters["PRICE_FILTER"]["tickSize"]),
+            float(_lot.get("stepSize", 0)),
+            float(_lot.get("minQty", 0)),
+            float(_filters.get("MIN_NOTIONAL", {}).get("notional", 0)),
+        )
+    return _instruments
+
+
+def _decimals(increment: float) -> int:
+    return max(0, -int(math.floor(math.log10(increment) + 1e-9))) if increment else 8
+
+
+# An order refused by the pre-trade checks, never sent
+class PreTradeRejected(Exception):
+    pass
+
+
+# Rounding constants and risk limits of one instrument, precomputed so a check is a few float
+# operations. Limits left at None are not checked.
+class InstrumentRules:
+    __slots__ = (
+        "details",
+        "tick_size",
+        "step_size",
+        "min_quantity",
+        "min_notional",
+        "max_position",
+        "max_order_notional",
+        "price_band",
+        "_inv_tick",
+        "_inv_step",
+        "_price_decimals",
+        "_quantity_decimals",
+    )
+
+    def __init__(self, details: InstrumentDetails):
+        self.details = details
+        self.tick_size = details.tick_size
+        self.step_size = details.quantity_size
+        self.min_quantity = details.min_quantity
+        self.min_notional = details.min_notional
+        # max absolute position, in contracts
+        self.max_position = None
+        self.max_order_notional = None
+        # max distance of the order price from the book mid, as a fraction of the mid
+        self.price_band = None
+        self._inv_tick = 1.0 / details.tick_size
+        self._inv_step = 1.0 / details.quantity_size if details.quantity_size else 0.0
+        self._price_decimals = _decimals(details.tick_size)
+        self._quantity_decimals = _decimals(details.quantity_size)
+
+    # to the tick, away from the other side so a passive order stays passive
+    def round_price(self, side: Side, price: float) -> float:
+        if side == Side.BUY:
+            _ticks = math.floor(price * self._inv_tick + 1e-9)
+        else:
+            _ticks = math.ceil(price * self._inv_tick - 1e-9)
+        return round(_ticks * self.tick_size, self._price_decimals)
+
+    # down to the lot size step
+    def round_quantity(self, quantity: float) -> float:
+        if not self._inv_step:
+            return quantity
+        return round(math.floor(quantity * self._inv_step + 1e-9) * self.step_size, self._quantity_decimals)
+
+
+# Pre-trade checks run inline before an order is sent: rounding to the exchange rules, minimum
+# quantity and notional, max order notional, price band around the book mid and max position.
+# The position check assumes the order fills completely on top of the current position, other
+# open orders are not counted. check() returns the rounded (price, quantity) or raises
+# PreTradeRejected, in a few microseconds. Orders of symbols without loaded instruments are
+# rejected, limits can be set before the instruments are loaded.
+class PreTradeRisk:
+    def __init__(self, positions, instruments: dict = None):
+        self._positions = positions
+        self._rules = {}
+        # symbol -> (max_position, max_order_notional, price_band)
+        self._limits = {}
+        self.stats = {"checked": 0, "rejected": 0}
+        if instruments:
+            self.load_instruments(instruments)
+
+    # symbol -> InstrumentDetails, see instruments_from_exchange_info
+    def load_instruments(self, instruments: dict):
+        for _symbol, _details in instruments.items():
+            _rules = InstrumentRules(_details)
+            if _symbol in self._limits:
+                (_rules.max_position, _rules.max_order_notional, _rules.price_band) = self._limits[_symbol]
+            self._rules[_symbol] = _rules
+
+    def get_rules(self, symbol: str) -> InstrumentRules:
+        return self._rules.get(symbol)
+
+    def set_limits(self, symbol: str, max_position=None, max_order_notional=None, price_band=None):
+        self._limits[symbol] = (max_position, max_order_notional, price_band)
+        _rules = self._rules.get(symbol)
+        if _rules is not None:
+            _rules.max_position = max_position
+            _rules.max_order_notional = max_order_notional
+            _rules.price_band = price_band
+
+    def check(self, symbol: str, side: Side, price: float, quantity: float, mid: float = None):
+        self.stats["checked"] += 1
+        _rules = self._rules.get(symbol)
+        if _rules is None:
+            return self._reject(f"no instrument rules for {symbol}")
+        _price = _rules.round_price(side, price)
+        _quantity = _rules.round_quantity(quantity)
+        if _price <= 0:
+            return self._reject(f"price {price} not positive")
+        if _quantity < _rules.min_quantity or _quantity <= 0:
+            return self._reject(f"quantity {quantity} below the minimum of {_rules.min_quantity}")
+
+        _notional = _price * _quantity
+        if _notional < _rules.min_notional:
+            return self._reject(f"notional {_notional:.2f} below the minimum of {_rules.min_notional}")
+        if _rules.max_order_notional is not None and _notional > _rules.max_order_notional:
+            return self._reject(f"notional {_notional:.2f} above the limit of {_rules.max_order_notional}")
+        if _rules.price_band is not None and mid:
+            if abs(_price - mid) > _rules.price_band * mid:
+                return self._reject(f"price {_price} outside the band around mid {mid}")
+        if _rules.max_position is not None:
+            _position = self._positions.get_position(symbol).amount
+            _position += _quantity if side == Side.BUY else -_quantity
+            if abs(_position) > _rules.max_position:
+                return self._reject(f"position {_position} would exceed the limit of {_rules.max_position}")
+        return _price, _quantity
+
+    def _reject(self, reason):
+        self.stats["rejected"] += 1
+        raise PreTradeRejected(reason)
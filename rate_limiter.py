@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import logging
+import time
+
+from itertools import count
+
+# request priorities, lower goes first
+CANCEL = 0
+REQUEST = 1
+NEW_ORDER = 2
+
+# usage headers of the futures REST responses, by limit
+USED_WEIGHT_HEADER = "X-MBX-USED-WEIGHT-1M"
+ORDER_COUNT_1M_HEADER = "X-MBX-ORDER-COUNT-1M"
+ORDER_COUNT_10S_HEADER = "X-MBX-ORDER-COUNT-10S"
+
+
+# Token bucket spreading a limit of `limit` units per window evenly over the window,
+# capped at `headroom` of the limit so the server side count never reaches it.
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, limit: int, window_s: float, headroom=0.9):
+        self.capacity = limit * headroom
+        self.rate = self.capacity / window_s
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    # seconds until cost units are available, 0 if they are now
+    def wait_time(self, cost: float, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float):
+        self.tokens -= cost
+
+    # never assume more room than the server reports for its current window
+    def sync(self, used: float):
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+# Request scheduler for the Binance futures REST limits: request weight per minute and order count
+# per minute and per 10 seconds. Requests wait in acquire() until every bucket they draw from has
+# room, in priority order, so cancels overtake queued new orders and bursts are smoothed to the
+# sustainable rate. The buckets are corrected from the usage headers of every response, and a
+# 429/418 blocks all requests until its Retry-After has passed.
+class RateLimiter:
+    def __init__(self, weight_limit=2400, order_limit_1m=1200, order_limit_10s=300, headroom=0.9):
+        self._weight = TokenBucket(weight_limit, 60, headroom)
+        self._order_buckets = (
+            TokenBucket(order_limit_1m, 60, headroom),
+            TokenBucket(order_limit_10s, 10, headroom),
+        )
+        self._header_buckets = (
+            (USED_WEIGHT_HEADER, self._weight),
+            (ORDER_COUNT_1M_HEADER, self._order_buckets[0]),
+            (ORDER_COUNT_10S_HEADER, self._order_buckets[1]),
+        )
+        # (priority, sequence, future, weight, orders) of the waiting requests
+        self._waiting = []
+        self._sequence = count()
+        self._wakeup = None
+        self._banned_until = 0.0
+        self.stats = {"granted": 0, "delayed": 0, "bans": 0}
+
+    async def acquire(self, weight=1, orders=0, priority=REQUEST):
+        if not self._waiting and self._wait_time(weight, orders, time.monotonic()) == 0:
+            self._take(weight, orders)
+            return
+        _loop = asyncio.get_running_loop()
+        _future = _loop.create_future()
+        _entry = (priority, next(self._sequence), _future, weight, orders)
+        heapq.heappush(self._waiting, _entry)
+        self.stats["delayed"] += 1
+        if self._waiting[0] is _entry:
+            # a new head may not need the bucket the previous one waits for, e.g. a cancel queued
+            # behind a new order waiting on the order count, drain now rather than at its wakeup
+            if self._wakeup is not None:
+                self._wakeup.cancel()
+            self._wakeup = _loop.call_soon(self._drain)
+        elif self._wakeup is None:
+            self._wakeup = _loop.call_soon(self._drain)
+        await _future
+
+    def _wait_time(self, weight, orders, now) -> float:
+        _wait = max(self._banned_until - now, self._weight.wait_time(weight, now))
+        if orders:
+            for _bucket in self._order_buckets:
+                _wait = max(_wait, _bucket.wait_time(orders, now))
+        return _wait
+
+    def _take(self, weight, orders):
+        self._weight.take(weight)
+        if orders:
+            for _bucket in self._order_buckets:
+                _bucket.take(orders)
+        self.stats["granted"] += 1
+
+    # grant waiting requests in priority order, the first one without room holds the others back
+    def _drain(self):
+        self._wakeup = None
+        _waiting = self._waiting
+        while _waiting:
+            _, _, _future, _weight, _orders = _waiting[0]
+            if _future.cancelled():
+                heapq.heappop(_waiting)
+                continue
+            _wait = self._wait_time(_weight, _orders, time.monotonic())
+            if _wait > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(_wait, self._drain)
+                return
+            heapq.heappop(_waiting)
+            self._take(_weight, _orders)
+            _future.set_result(None)
+
+    # server reported usage from the response headers
+    def update(self, headers):
+        for (_header, _bucket) in self._header_buckets:
+            _used = headers.get(_header)
+            if _used is not None:
+                _bucket.sync(float(_used))
+
+    # rate limited (429) or banned (418) by the server
+    def ban(self, retry_after_s: float):
+        self._banned_until = max(self._banned_until, time.monotonic() + retry_after_s)
+        self.stats["bans"] += 1
+        logging.info(f"[Error] Rate limited by the exchange, holding requests for {retry_after_s}s..")
+
+    def get_stats(self) -> dict:
+        return dict(
+            self.stats,
+            waiting=len(self._waiting),
+            weight_available=self._weight.tokens,
+            orders_1m_available=self._order_buckets[0].tokens,
+            orders_10s_available=self._order_buckets[1].tokens,
+        )
@@ -1,6 +1,5 @@
 import logging
 import time
-import json
 import pandas as pd
 import asyncio
 import websockets
@@ -11,6 +10,7 @@ import matplotlib.animation as animation
 import matplotlib.ticker as ticker
 
 from threading import Thread
+from message_decoder import MessageDecoder
 
 timeseries = {
     "date": [],
@@ -35,6 +35,7 @@ class RealTimeCandlestickGraph:
         self.interval = interval
         self.width = width
         self.socket = "wss://fstream.binance.com/ws/"
+        self.decoder = MessageDecoder()
 
         self.fig, (self.ax, self.volume_ax) = plt.subplots(
             2, 1, gridspec_kw={"height_ratios": [4, 1]}, sharex=True, figsize=(10, 8)
@@ -56,35 +57,34 @@ class RealTimeCandlestickGraph:
             while ws.open:
                 _message = await ws.recv()
                 # print(_message)
-                _data = json.loads(_message)
-                _event = _data["e"]
-                _kdata = _data["k"]
-                if _event == "kline":
+                _data = self.decoder.loads(_message)
+                if _data["e"] == "kline":
+                    _kline = self.decoder.decode_kline(_data)
                     if (
                         not timeseries["date"]
-                        or int(_kdata["t"]) != timeseries["date"][-1]
+                        or _kline.start_time != timeseries["date"][-1]
                     ):
-                        timeseries["date"].append(int(_kdata["t"]))
+                        timeseries["date"].append(_kline.start_time)
 
-                        timeseries["open"].append(float(_kdata["o"]))
+                        timeseries["open"].append(_kline.open)
 
-                        timeseries["high"].append(float(_kdata["h"]))
+                        timeseries["high"].append(_kline.high)
 
-                        timeseries["low"].append(float(_kdata["l"]))
+                        timeseries["low"].append(_kline.low)
 
-                        timeseries["close"].append(float(_kdata["c"]))
+                        timeseries["close"].append(_kline.close)
 
-                        timeseries["volume"].append(float(_kdata["v"]))
+                        timeseries["volume"].append(_kline.volume)
                     else:
-                        timeseries["open"][-1] = float(_kdata["o"])
+                        timeseries["open"][-1] = _kline.open
 
-                        timeseries["high"][-1] = float(_kdata["h"])
+                        timeseries["high"][-1] = _kline.high
 
-                        timeseries["low"][-1] = float(_kdata["l"])
+                        timeseries["low"][-1] = _kline.low
 
-                        timeseries["close"][-1] = float(_kdata["c"])
+                        timeseries["close"][-1] = _kline.close
 
-                        timeseries["volume"][-1] = float(_kdata["v"])
+                        timeseries["volume"][-1] = _kline.volume
 
                 if len(timeseries["date"]) > self.width:
                     timeseries["date"] = timeseries["date"][-self.width :]
@@ -1,12 +1,13 @@
 import logging
 import asyncio
 import websockets
-import json
 import time
 
 import pandas as pd
 import numpy as np
 
+from message_decoder import MessageDecoder
+
 logging.basicConfig(
     format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
     level=logging.INFO,
@@ -20,15 +21,17 @@ n_trades = 0
 sum_price_size = 0
 sum_size = 0
 
+decoder = MessageDecoder()
+
 
 async def subscribe():
     async with websockets.connect(URL) as ws:
         global n_trades, sum_price_size, sum_size
         while ws.open:
             message = await ws.recv()
-            trade_data = json.loads(message)
-            _traded_price = float(trade_data["p"])
-            _traded_size = float(trade_data["q"])
+            trade_data = decoder.decode_agg_trade(decoder.loads(message))
+            _traded_price = trade_data.price
+            _traded_size = trade_data.quantity
             sum_price_size += _traded_price * _traded_size
             sum_size += _traded_size
             n_trades += 1
@@ -0,0 +1,235 @@
+import logging
+import struct
+import time
+
+from multiprocessing import shared_memory
+
+from interface_book import OrderBook, VenueOrderBook
+
+logging.basicConfig(
+    format="%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s] %(message)s",
+    level=logging.INFO,
+)
+
+SHM_MAGIC = b"BNSHM001"
+# magic, book depth, number of symbols, then one 16 bytes name per symbol
+SHM_HEADER = struct.Struct("<8sII")
+SYMBOL_NAME = struct.Struct("<16s")
+# words of a book slot ahead of its levels: sequence, timestamp, bid depth, ask depth
+SLOT_HEADER_WORDS = 4
+# slots start on their own cache line
+CACHE_LINE = 64
+
+
+def _layout(depth: int, n_symbols: int) -> (int, int, int):
+    _header = SHM_HEADER.size + SYMBOL_NAME.size * n_symbols
+    _first = -(-_header // CACHE_LINE) * CACHE_LINE
+    _slot = -(-(8 * (SLOT_HEADER_WORDS + 4 * depth)) // CACHE_LINE) * CACHE_LINE
+    return _first, _slot, _first + _slot * n_symbols
+
+
+# Shared memory region holding the latest book of each symbol, one writer and any number of
+# reader processes. Each symbol has a fixed slot of 8 bytes words: a sequence number, the book
+# timestamp, the bid and ask depths, then bid prices, bid sizes, ask prices and ask sizes.
+# Access is a seqlock: the writer makes the sequence odd, writes the book and makes it even again,
+# a reader copies the book between two reads of the sequence and retries if it was odd or moved.
+# The writer never waits on readers and readers never write. Ordering relies on the stores hitting
+# memory in program order, as they do on x86.
+class _BookRegion:
+    def __init__(self, shm: shared_memory.SharedMemory, depth: int, symbols: list):
+        self._shm = shm
+        self.depth = depth
+        self.symbols = symbols
+        _first, _slot, _ = _layout(depth, len(symbols))
+        self._words = shm.buf.cast("Q")
+        self._doubles = shm.buf.cast("d")
+        # symbol -> word index of its slot
+        self._slots = {s: (_first + _slot * i) // 8 for (i, s) in enumerate(symbols)}
+
+    def sequence(self, symbol: str) -> int:
+        return self._words[self._slots[symbol]]
+
+    def close(self):
+        self._words.release()
+        self._doubles.release()
+        self._shm.close()
+
+
+# Writes the books of one gateway into a new shared memory region, registered as its depth callback:
+#     publisher = ShmBookPublisher("binance-books", gateway_symbols)
+#     gateway.register_depth_callback(publisher.publish)
+class ShmBookPublisher(_BookRegion):
+    def __init__(self, name: str, symbols, depth=5):
+        _symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        _, _, _size = _layout(depth, len(_symbols))
+        _shm = shared_memory.SharedMemory(name, create=True, size=_size)
+        SHM_HEADER.pack_into(_shm.buf, 0, SHM_MAGIC, depth, len(_symbols))
+        for (_i, _symbol) in enumerate(_symbols):
+            SYMBOL_NAME.pack_into(
+                _shm.buf, SHM_HEADER.size + SYMBOL_NAME.size * _i, _symbol.encode()
+            )
+        super().__init__(_shm, depth, _symbols)
+        self.published = 0
+        # books of symbols without a slot
+        self.skipped = 0
+
+    # depth callback, levels beyond the region depth and symbols the region was not created with
+    # are left out
+    def publish(self, venue_book: VenueOrderBook):
+        _book = venue_book.book
+        _base = self._slots.get(_book.contract_name)
+        if _base is None:
+            self.skipped += 1
+            return
+        _depth = self.depth
+        _words = self._words
+        _doubles = self._doubles
+        _sequence = _words[_base] + 1
+        _words[_base] = _sequence
+        _doubles[_base + 1] = _book.timestamp or 0.0
+        _bid_depth = min(_book.bid_depth, _depth)
+        _ask_depth = min(_book.ask_depth, _depth)
+        _words[_base + 2] = _bid_depth
+        _words[_base + 3] = _ask_depth
+        _levels = _base + SLOT_HEADER_WORDS
+        _doubles[_levels:_levels + _bid_depth] = memoryview(_book.bid_prices)[:_bid_depth]
+        _levels += _depth
+        _doubles[_levels:_levels + _bid_depth] = memoryview(_book.bid_sizes)[:_bid_depth]
+        _levels += _depth
+        _doubles[_levels:_levels + _ask_depth] = memoryview(_book.ask_prices)[:_ask_depth]
+        _levels += _depth
+        _doubles[_levels:_levels + _ask_depth] = memoryview(_book.ask_sizes)[:_ask_depth]
+        _words[_base] = _sequence + 1
+        self.published += 1
+
+    # readers attached to the region keep their mapping until they close it
+    def close(self):
+        _shm = self._shm
+        super().close()
+        _shm.unlink()
+
+
+# Reads the books of a region written by a ShmBookPublisher in another process.
+# read() copies a symbol's book into a caller owned OrderBook, a few memcpys of the levels, and
+# returns quickly when the book did not change, so readers can poll without touching the socket,
+# the parser or the GIL of the publishing process.
+class ShmBookSubscriber(_BookRegion):
+    def __init__(self, name: str):
+        try:
+            # python 3.13+, the creating process owns the region's lifetime
+            _shm = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            _shm = shared_memory.SharedMemory(name)
+            # older versions would unlink the region when this process exits
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(_shm._name, "shared_memory")
+        (_magic, _depth, _n_symbols) = SHM_HEADER.unpack_from(_shm.buf, 0)
+        if _magic != SHM_MAGIC:
+            _shm.close()
+            raise ValueError(f"{name} is not a book region")
+        _symbols = [
+            SYMBOL_NAME.unpack_from(_shm.buf, SHM_HEADER.size + SYMBOL_NAME.size * i)[0]
+            .rstrip(b"\0")
+            .decode()
+            for i in range(_n_symbols)
+        ]
+        super().__init__(_shm, _depth, _symbols)
+        # symbol -> sequence of the last book read
+        self._read_sequences = {s: 0 for s in _symbols}
+        self.retries = 0
+
+    # an empty book to read() into
+    def new_book(self, symbol: str) -> OrderBook:
+        return OrderBook.with_depth(symbol, self.depth)
+
+    # copy the latest book of the symbol into book, False if there is none newer than the last read
+    def read(self, symbol: str, book: OrderBook) -> bool:
+        _base = self._slots[symbol]
+        _words = self._words
+        _doubles = self._doubles
+        _depth = self.depth
+        _last = self._read_sequences[symbol]
+        while True:
+            _sequence = _words[_base]
+            if _sequence == _last:
+                return False
+            if _sequence & 1:
+                # write in progress, let a descheduled writer finish when processes share cores
+                self.retries += 1
+                time.sleep(0)
+                continue
+            _bid_depth = _words[_base + 2]
+            _ask_depth = _words[_base + 3]
+            if _bid_depth > _depth or _ask_depth > _depth:
+                # torn read of the depths
+                self.retries += 1
+                continue
+            book.timestamp = _doubles[_base + 1]
+            _levels = _base + SLOT_HEADER_WORDS
+            memoryview(book.bid_prices)[:_bid_depth] = _doubles[_levels:_levels + _bid_depth]
+            _levels += _depth
+            memoryview(book.bid_sizes)[:_bid_depth] = _doubles[_levels:_levels + _bid_depth]
+            _levels += _depth
+            memoryview(book.ask_prices)[:_ask_depth] = _doubles[_levels:_levels + _ask_depth]
+            _levels += _depth
+            memoryview(book.ask_sizes)[:_ask_depth] = _doubles[_levels:_levels + _ask_depth]
+            if _words[_base] == _sequence:
+                book.bid_depth = _bid_depth
+                book.ask_depth = _ask_depth
+                self._read_sequences[symbol] = _sequence
+                return True
+            self.retries += 1
+
+    # poll the region and call callback(VenueOrderBook) with every new book of the given symbols,
+    # on the calling thread, until stop() is called. Intermediate books are skipped if the
+    # callback is slower than the publisher.
+    def run(self, callback, symbols=None, exchange_name="Binance", idle_sleep=0.0001):
+        _books = [
+            (s, VenueOrderBook(exchange_name, self.new_book(s))) for s in (symbols or self.symbols)
+        ]
+        self._running = True
+        while self._running:
+            _idle = True
+            for (_symbol, _venue_book) in _books:
+                if self.read(_symbol, _venue_book.book):
+                    _idle = False
+                    try:
+                        callback(_venue_book)
+                    except Exception as e:
+                        logging.info(f"[Error] Book callback error: {e}..")
+            if _idle:
+                time.sleep(idle_sleep)
+
+    def stop(self):
+        self._running = False
+
+
+# One process publishes the gateway books, any number of others read them:
+#     python shm_market_data.py publish BTCUSDT
+#     python shm_market_data.py subscribe BTCUSDT
+if __name__ == "__main__":
+    import sys
+
+    region_name = "binance-books"
+    mode, symbol = sys.argv[1], sys.argv[2]
+    if mode == "publish":
+        from binance_gateway import BinanceFutureGateway
+
+        binance_gateway = BinanceFutureGateway(symbol)
+        publisher = ShmBookPublisher(region_name, symbol)
+        binance_gateway.register_depth_callback(publisher.publish)
+        binance_gateway.connect()
+        try:
+            while True:
+                time.sleep(10)
+                logging.info(f"Published {publisher.published} books..")
+        except KeyboardInterrupt:
+            binance_gateway.stop()
+            publisher.close()
+    else:
+        subscriber = ShmBookSubscriber(region_name)
+        try:
+            subscriber.run(lambda venue_book: logging.info(f"Book: {venue_book}"), [symbol])
+        except KeyboardInterrupt:
+            subscriber.close()
@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+from binance_gateway import BinanceFutureGateway
+
+
+# Stands in for python-binance's ReconnectingWebsocket: frames wait in an asyncio queue and recv()
+# awaits it through wait_for, which yields to the loop even when frames are already queued.
+class QueuedSocket:
+    def __init__(self):
+        self._queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def recv(self):
+        return await asyncio.wait_for(self._queue.get(), timeout=10)
+
+    def put_trades(self, count, symbol="BTCUSDT"):
+        for _i in range(count):
+            self._queue.put_nowait(
+                {
+                    "stream": symbol.lower() + "@aggTrade",
+                    "data": {
+                        "e": "aggTrade",
+                        "E": 1700000000000 + _i,
+                        "T": 1700000000000 + _i,
+                        "s": symbol,
+                        "a": _i,
+                        "p": "30000.1",
+                        "q": "0.002",
+                        "m": _i % 2 == 0,
+                    },
+                }
+            )
+
+
+class TradeBatchingTest(unittest.TestCase):
+    def setUp(self):
+        self.gateway = BinanceFutureGateway("BTCUSDT", trace_latency=False)
+        self.batches = []
+        self.gateway.register_trade_callback(
+            lambda batch: self.batches.append(len(batch)), batched=True
+        )
+        self.socket = QueuedSocket()
+        self.gateway._dws = self.socket
+
+    # run the depth listener until the socket has been idle for a few loop iterations
+    def listen(self):
+        async def _run():
+            _task = asyncio.ensure_future(self.gateway._listen_depth_forever())
+            while not self.socket._queue.empty():
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.01)
+            _task.cancel()
+
+        asyncio.run(_run())
+
+    def test_queued_trades_come_in_one_batch(self):
+        self.socket.put_trades(10)
+        self.listen()
+        self.assertEqual(self.batches, [10])
+
+    def test_trades_split_by_idle_socket(self):
+        self.socket.put_trades(7)
+        self.listen()
+        self.socket.put_trades(3)
+        self.listen()
+        self.assertEqual(self.batches, [7, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()